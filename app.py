@@ -1,15 +1,43 @@
 import os
 import json
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Request, render_template, request, jsonify, send_from_directory, stream_with_context
 from werkzeug.utils import secure_filename
+from werkzeug.middleware.proxy_fix import ProxyFix
+import click
 import requests
 from bs4 import BeautifulSoup
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 from google.generativeai import types
 from daytona import Daytona, DaytonaConfig
 import PyPDF2
 from docx import Document
 import re
+import io
+import hashlib
+import time
+import math
+import uuid
+import zlib
+import gzip
+import base64
+from types import SimpleNamespace
+import threading
+import sqlite3
+import shutil
+import tempfile
+import struct
+import csv
+import random
+import bisect
+import heapq
+import contextlib
+import copy
+import datetime
+from collections import OrderedDict
+from requests.structures import CaseInsensitiveDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, as_completed
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -22,18 +50,81 @@ except ImportError:
     FIRECRAWL_AVAILABLE = False
     print("Firecrawl not available. Install with: pip install firecrawl-py")
 
+try:
+    from google.generativeai import caching
+    GEMINI_CACHING_AVAILABLE = True
+except ImportError:
+    GEMINI_CACHING_AVAILABLE = False
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    print("NumPy not available. Candidate search will be disabled. Install with: pip install numpy")
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    print("Pillow not available. Images will be sent to Gemini without downscaling. Install with: pip install Pillow")
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+    print("fcntl not available on this platform. Profile saves will only be locked within a single process")
+
+# Uploads up to this size stay in memory; larger ones spill to an anonymous temp file in UPLOAD_FOLDER
+UPLOAD_SPOOL_MAX_BYTES = int(os.getenv('UPLOAD_SPOOL_MAX_BYTES', str(2 * 1024 * 1024)))
+
+class SpoolingRequest(Request):
+    """Request that buffers uploaded files in a per-upload SpooledTemporaryFile, so concurrent uploads
+    with the same filename never share a path and small CVs never touch disk"""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_BYTES, dir=app.config['UPLOAD_FOLDER'])
+
 app = Flask(__name__)
+app.request_class = SpoolingRequest
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-app.config['SECRET_KEY'] = 'your-secret-key-here'
+app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
 
-# Ensure upload directory exists
+# Ensure upload directory exists (only used for spilled uploads)
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 # Data storage directory for saved profiles
 DATA_STORAGE_DIR = 'profile_data'
 os.makedirs(DATA_STORAGE_DIR, exist_ok=True)
 
+# Cache directory for reusable AI results (media analyses, etc.)
+CACHE_DIR = 'cache'
+MEDIA_CACHE_DIR = os.path.join(CACHE_DIR, 'media')
+os.makedirs(MEDIA_CACHE_DIR, exist_ok=True)
+JOB_DESCRIPTION_CACHE_DIR = os.path.join(CACHE_DIR, 'job_descriptions')
+os.makedirs(JOB_DESCRIPTION_CACHE_DIR, exist_ok=True)
+
 # Configure Gemini AI
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 if not GEMINI_API_KEY:
@@ -49,17 +140,26 @@ except:
     except:
         model = genai.GenerativeModel('gemini-pro')
 
+# Record/replay of LLM and HTTP traffic for offline benchmarks and regression runs
+CASSETTE_MODE = os.getenv('HIREGEM_CASSETTE_MODE', '').lower()  # '', 'record' or 'replay'
+CASSETTE_PATH = os.getenv('HIREGEM_CASSETTE', os.path.join('cassettes', 'session.jsonl'))
+
 # Initialize Daytona
 DAYTONA_API_KEY = os.getenv('DAYTONA_API_KEY')
-if DAYTONA_API_KEY:
+if DAYTONA_API_KEY and not CASSETTE_MODE:
     daytona_config = DaytonaConfig(api_key=DAYTONA_API_KEY)
     daytona = Daytona(daytona_config)
 else:
     daytona = None
-    print("Warning: DAYTONA_API_KEY not set. Daytona features will be disabled.")
+    if CASSETTE_MODE:
+        # Sandboxed runs can't be recorded - the direct GitHub API path is used instead
+        print(f"Cassette {CASSETTE_MODE} mode: Daytona features will be disabled.")
+    else:
+        print("Warning: DAYTONA_API_KEY not set. Daytona features will be disabled.")
 
 # Initialize Firecrawl
 FIRECRAWL_API_KEY = os.getenv('FIRECRAWL_API_KEY')
+FIRECRAWL_TIMEOUT_SECONDS = 45  # Per scrape, so a hung page can't outlive the agent's tool timeout
 if FIRECRAWL_AVAILABLE and FIRECRAWL_API_KEY:
     try:
         firecrawl = Firecrawl(api_key=FIRECRAWL_API_KEY)
@@ -71,16 +171,187 @@ else:
     if not FIRECRAWL_API_KEY:
         print("Warning: FIRECRAWL_API_KEY not set. Firecrawl features will be disabled.")
 
+cassette_state = {
+    'entries': {},  # interaction key -> recorded responses, in order
+    'cursors': {},  # interaction key -> next response index during replay
+    'stats': {'llm_calls': 0, 'prompt_tokens': 0, 'output_tokens': 0, 'http_calls': 0},
+    'lock': threading.Lock()
+}
+
+def get_cassette_key(kind, *parts):
+    """Stable key for an interaction; bytes (images, uploads) are represented by their hash"""
+    def encode(value):
+        if isinstance(value, (bytes, bytearray)):
+            return 'sha256:' + hashlib.sha256(value).hexdigest()
+        return str(value)
+    payload = json.dumps(parts, sort_keys=True, default=encode, ensure_ascii=False)
+    return f"{kind}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+def load_cassette():
+    """Read recorded interactions for replay"""
+    if not os.path.exists(CASSETTE_PATH):
+        raise ValueError(f"Cassette {CASSETTE_PATH} not found - record it first with HIREGEM_CASSETTE_MODE=record")
+    with open(CASSETTE_PATH, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                cassette_state['entries'].setdefault(entry['key'], []).append(entry['response'])
+
+def cassette_interaction(key, perform, serialize, deserialize):
+    """Record or replay one interaction (LLM call or HTTP exchange)"""
+    if CASSETTE_MODE == 'replay':
+        with cassette_state['lock']:
+            responses = cassette_state['entries'].get(key)
+            if not responses:
+                raise LookupError(f"No recorded interaction for {key} in {CASSETTE_PATH}")
+            # Identical requests replay in recorded order; the last one repeats
+            index = cassette_state['cursors'].get(key, 0)
+            cassette_state['cursors'][key] = index + 1
+            recorded = responses[min(index, len(responses) - 1)]
+        return deserialize(recorded)
+    
+    result = perform()
+    with cassette_state['lock']:
+        os.makedirs(os.path.dirname(CASSETTE_PATH) or '.', exist_ok=True)
+        with open(CASSETTE_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'key': key, 'response': serialize(result)}, ensure_ascii=False) + '\n')
+    return result
+
+def serialize_llm_response(response):
+    """Keep what the app reads from a Gemini response: text and usage metadata"""
+    try:
+        text = response.text
+    except Exception as e:
+        return {'error': str(e)}
+    usage = getattr(response, 'usage_metadata', None)
+    return {
+        'text': text,
+        'usage': {
+            field: getattr(usage, field, 0) or 0
+            for field in ('prompt_token_count', 'cached_content_token_count', 'candidates_token_count', 'total_token_count')
+        }
+    }
+
+def deserialize_llm_response(recorded):
+    """Rebuild a response object with .text and .usage_metadata"""
+    if 'error' in recorded:
+        raise ValueError(recorded['error'])
+    return SimpleNamespace(text=recorded['text'], usage_metadata=SimpleNamespace(**recorded['usage']))
+
+def serialize_http_response(response):
+    """Status, headers and body of a requests response"""
+    return {
+        'status_code': response.status_code,
+        'url': response.url,
+        'headers': dict(response.headers),
+        'body': base64.b64encode(response.content).decode('ascii')
+    }
+
+def deserialize_http_response(recorded):
+    """Rebuild a requests.Response that works with .content/.text/.json() and iter_content()"""
+    response = requests.Response()
+    response.status_code = recorded['status_code']
+    response.url = recorded['url']
+    response.headers = CaseInsensitiveDict(recorded['headers'])
+    response._content = base64.b64decode(recorded['body'])
+    response._content_consumed = True
+    return response
+
+def install_cassette():
+    """Route Gemini and HTTP (requests, which Firecrawl also uses) through the cassette"""
+    original_generate_content = genai.GenerativeModel.generate_content
+    original_count_tokens = genai.GenerativeModel.count_tokens
+    original_session_request = requests.sessions.Session.request
+    
+    def generate_content(self, contents, *args, **kwargs):
+        key = get_cassette_key('llm', getattr(self, 'model_name', ''), contents)
+        try:
+            response = cassette_interaction(
+                key,
+                lambda: original_generate_content(self, contents, *args, **kwargs),
+                serialize_llm_response,
+                deserialize_llm_response
+            )
+        except LookupError as e:
+            # Unrecorded prompts fail like a Gemini outage, which every caller already handles
+            raise google_exceptions.ServiceUnavailable(str(e))
+        usage = getattr(response, 'usage_metadata', None)
+        with cassette_state['lock']:
+            cassette_state['stats']['llm_calls'] += 1
+            cassette_state['stats']['prompt_tokens'] += getattr(usage, 'prompt_token_count', 0) or 0
+            cassette_state['stats']['output_tokens'] += getattr(usage, 'candidates_token_count', 0) or 0
+        return response
+    
+    def count_tokens(self, contents, *args, **kwargs):
+        key = get_cassette_key('count_tokens', getattr(self, 'model_name', ''), contents)
+        return cassette_interaction(
+            key,
+            lambda: original_count_tokens(self, contents, *args, **kwargs),
+            lambda result: {'total_tokens': result.total_tokens},
+            lambda recorded: SimpleNamespace(**recorded)
+        )
+    
+    def session_request(self, method, url, *args, **kwargs):
+        body = kwargs.get('data') or kwargs.get('json') or (args[1] if len(args) > 1 else None)
+        key = get_cassette_key('http', method.upper(), url, kwargs.get('params') or (args[0] if args else None), body)
+        with cassette_state['lock']:
+            cassette_state['stats']['http_calls'] += 1
+        try:
+            return cassette_interaction(
+                key,
+                lambda: original_session_request(self, method, url, *args, **kwargs),
+                serialize_http_response,
+                deserialize_http_response
+            )
+        except LookupError as e:
+            # Unrecorded requests behave like network failures, which every scraper already handles
+            raise requests.exceptions.ConnectionError(str(e))
+    
+    genai.GenerativeModel.generate_content = generate_content
+    genai.GenerativeModel.count_tokens = count_tokens
+    requests.sessions.Session.request = session_request
+
+if CASSETTE_MODE in ('record', 'replay'):
+    if CASSETTE_MODE == 'replay':
+        load_cassette()
+    install_cassette()
+    print(f"Cassette {CASSETTE_MODE} mode: {CASSETTE_PATH}")
+
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def get_upload_stream(file):
+    """Seekable binary stream of an uploaded file, rewound to the start"""
+    stream = file.stream
+    if not getattr(stream, 'seekable', lambda: False)():
+        spooled = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_BYTES, dir=app.config['UPLOAD_FOLDER'])
+        shutil.copyfileobj(stream, spooled)
+        stream = file.stream = spooled
+    stream.seek(0)
+    return stream
+
+@contextlib.contextmanager
+def open_document(source):
+    """Binary file object for a path or an already-open stream (rewound, left open)"""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            yield file
+    else:
+        source.seek(0)
+        yield source
+
+def read_text_document(source):
+    """Decode a UTF-8 text document from a path or stream, with universal newlines"""
+    with open_document(source) as file:
+        return file.read().decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
 def extract_text_from_pdf(file_path):
-    """Extract text from PDF file"""
+    """Extract text from PDF file (path or binary stream)"""
     text = ""
     try:
-        with open(file_path, 'rb') as file:
+        with open_document(file_path) as file:
             pdf_reader = PyPDF2.PdfReader(file)
             for page in pdf_reader.pages:
                 text += page.extract_text() + "\n"
@@ -89,10 +360,11 @@ def extract_text_from_pdf(file_path):
     return text
 
 def extract_text_from_docx(file_path):
-    """Extract text from DOCX file"""
+    """Extract text from DOCX file (path or binary stream)"""
     text = ""
     try:
-        doc = Document(file_path)
+        with open_document(file_path) as file:
+            doc = Document(file)
         for paragraph in doc.paragraphs:
             text += paragraph.text + "\n"
     except Exception as e:
@@ -100,19 +372,27 @@ def extract_text_from_docx(file_path):
     return text
 
 def extract_text_from_txt(file_path):
-    """Extract text from TXT file"""
+    """Extract text from TXT file (path or binary stream)"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
+        return read_text_document(file_path)
     except Exception as e:
         print(f"Error reading TXT: {e}")
         return ""
 
+def extract_text_from_file(file_path, file_ext):
+    """Extract the text of a CV (path or binary stream) based on its extension"""
+    if file_ext == 'pdf':
+        return extract_text_from_pdf(file_path)
+    elif file_ext == 'docx':
+        return extract_text_from_docx(file_path)
+    else:
+        return extract_text_from_txt(file_path)
+
 def extract_links_from_pdf(file_path):
-    """Extract URLs from PDF file (both text and hyperlinks)"""
+    """Extract URLs from PDF file (both text and hyperlinks; path or binary stream)"""
     links = set()
     try:
-        with open(file_path, 'rb') as file:
+        with open_document(file_path) as file:
             pdf_reader = PyPDF2.PdfReader(file)
             for page in pdf_reader.pages:
                 # Extract text and find URLs in text
@@ -135,10 +415,11 @@ def extract_links_from_pdf(file_path):
     return list(links)
 
 def extract_links_from_docx(file_path):
-    """Extract URLs from DOCX file (both text and hyperlinks)"""
+    """Extract URLs from DOCX file (both text and hyperlinks; path or binary stream)"""
     links = set()
     try:
-        doc = Document(file_path)
+        with open_document(file_path) as file:
+            doc = Document(file)
         
         # Extract URLs from text
         for paragraph in doc.paragraphs:
@@ -166,14 +447,13 @@ def extract_links_from_docx(file_path):
     return list(links)
 
 def extract_links_from_txt(file_path):
-    """Extract URLs from TXT file"""
+    """Extract URLs from TXT file (path or binary stream)"""
     links = set()
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-            url_pattern = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+[^\s<>"{}|\\^`\[\].,;:!?]')
-            text_urls = url_pattern.findall(content)
-            links.update(text_urls)
+        content = read_text_document(file_path)
+        url_pattern = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+[^\s<>"{}|\\^`\[\].,;:!?]')
+        text_urls = url_pattern.findall(content)
+        links.update(text_urls)
     except Exception as e:
         print(f"Error extracting links from TXT: {e}")
     return list(links)
@@ -1067,7 +1347,7 @@ def scrape_with_firecrawl(url):
             url = 'https://' + url
         
         # Use Firecrawl to scrape - correct API format
-        result = firecrawl.scrape(url, formats=["markdown", "html"])
+        result = firecrawl.scrape(url, formats=["markdown", "html"], timeout=FIRECRAWL_TIMEOUT_SECONDS * 1000)
         
         # Handle response format
         if result:
@@ -1252,123 +1532,548 @@ def sanitize_folder_name(name):
     """Sanitize name to be used as folder name"""
     # Remove or replace invalid characters
     sanitized = re.sub(r'[<>:"/\\|?*]', '_', name)
-    sanitized = sanitized.strip()
+    # Leading dots would hide the folder (or escape the storage dir with '..')
+    sanitized = sanitized.strip().lstrip('.')
     # Limit length
     if len(sanitized) > 100:
         sanitized = sanitized[:100]
     return sanitized or 'unknown'
 
-def save_profile_data(person_name, cv_text, cv_file_path, analysis, scraped_data, job_description=None):
-    """Save all profile data to filesystem organized by person name/ID"""
+CHAT_ARTIFACT_SOURCES = ('resume_text', 'analysis', 'scraped_data', 'metadata')  # Profile fields chat artifacts are derived from
+
+def build_chat_artifacts(person_name, resume_text, analysis, scraped_data):
+    """Compute the derived data the chat agent needs (name, links, compact prompt blocks)"""
+    # Fall back to the name at the top of the resume
+    if not person_name:
+        name_match = re.search(r'^([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)', resume_text, re.MULTILINE)
+        if name_match:
+            person_name = name_match.group(1)
+    
+    # Extract all URLs from resume text
+    url_pattern = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+[^\s<>"{}|\\^`\[\].,;:!?]')
+    resume_urls = url_pattern.findall(resume_text)
+    
+    # Also get URLs from scraped_data (they might have been extracted during initial scraping)
+    scraped_urls = []
+    for platform, data in scraped_data.items():
+        if isinstance(data, dict):
+            scraped_urls.extend(url_pattern.findall(json.dumps(data)))
+    
+    # Combine and deduplicate URLs, keeping first-seen order so the prompt is stable
+    all_available_urls = list(dict.fromkeys(resume_urls + scraped_urls))
+    
+    # Map platform names to URLs
+    url_map = {}
+    for url in all_available_urls:
+        url_lower = url.lower()
+        if 'github.com' in url_lower:
+            url_map['github'] = url
+            url_map['github.com'] = url
+        elif 'linkedin.com' in url_lower:
+            url_map['linkedin'] = url
+            url_map['linkedin.com'] = url
+        elif 'devpost.com' in url_lower:
+            url_map['devpost'] = url
+            url_map['devpost.com'] = url
+        elif 'kaggle.com' in url_lower:
+            url_map['kaggle'] = url
+            url_map['kaggle.com'] = url
+        elif 'orcid.org' in url_lower:
+            url_map['orcid'] = url
+            url_map['orcid.org'] = url
+    
+    return {
+        'person_name': person_name,
+        'urls': all_available_urls,
+        'url_map': url_map,
+        'analysis_block': json.dumps(analysis, separators=(',', ':'), ensure_ascii=False)[:2000],
+        'scraped_data_block': json.dumps(scraped_data, separators=(',', ':'), ensure_ascii=False)[:3000]
+    }
+
+# Profile storage: one folder of loose files per candidate, or a single SQLite (WAL) database
+PROFILE_STORAGE_BACKEND = os.getenv('PROFILE_STORAGE_BACKEND', 'file').lower()  # 'file' or 'sqlite'
+PROFILE_DB_PATH = os.getenv('PROFILE_DB_PATH', os.path.join(DATA_STORAGE_DIR, 'profiles.sqlite'))
+RESUME_BLOB_DIR = os.getenv('RESUME_BLOB_DIR', os.path.join(DATA_STORAGE_DIR, '.blobs'))  # Shared by both backends
+RESUME_BLOB_GC_GRACE_SECONDS = 60 * 60  # Unreferenced blobs younger than this may belong to a save in progress
+PROFILE_FIELDS = ('resume_text', 'analysis', 'scraped_data', 'job_description', 'metadata')
+PROFILE_FIELD_FILES = {
+    'resume_text': 'resume_text.txt',
+    'analysis': 'analysis.json',
+    'scraped_data': 'scraped_data.json',
+    'job_description': 'job_description.txt',
+    'metadata': 'metadata.json'
+}
+PROFILE_JSON_FIELDS = ('analysis', 'scraped_data', 'metadata')
+PROFILE_COMPRESSION = os.getenv('PROFILE_COMPRESSION', 'zstd' if ZSTD_AVAILABLE else 'gzip').lower()  # 'zstd', 'gzip' or 'none'
+PROFILE_COMPRESSED_FIELDS = ('resume_text', 'analysis', 'scraped_data')  # metadata stays plain so listings stay cheap
+COMPRESSION_SUFFIXES = {'zstd': '.zst', 'gzip': '.gz', 'none': ''}
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+if PROFILE_COMPRESSION == 'zstd' and not ZSTD_AVAILABLE:
+    print("zstandard not available, compressing profiles with gzip. Install with: pip install zstandard")
+    PROFILE_COMPRESSION = 'gzip'
+elif PROFILE_COMPRESSION not in COMPRESSION_SUFFIXES:
+    print(f"Warning: unknown PROFILE_COMPRESSION '{PROFILE_COMPRESSION}', using gzip")
+    PROFILE_COMPRESSION = 'gzip'
+
+def encode_profile_field(field, value, compression=PROFILE_COMPRESSION):
+    """Serialize a profile field to bytes: compact JSON or UTF-8 text, compressed for the large fields"""
+    if field in PROFILE_JSON_FIELDS:
+        value = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    data = value.encode('utf-8')
+    if field not in PROFILE_COMPRESSED_FIELDS or compression == 'none':
+        return data
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=6).compress(data)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+def decode_profile_field(field, data):
+    """Inverse of encode_profile_field; also reads legacy uncompressed/indented values"""
+    if isinstance(data, str):
+        text = data
+    else:
+        data = bytes(data)
+        if data.startswith(ZSTD_MAGIC):
+            if not ZSTD_AVAILABLE:
+                raise RuntimeError('Profile data is zstd-compressed but zstandard is not installed')
+            data = zstandard.ZstdDecompressor().decompress(data, max_output_size=512 * 1024 * 1024)
+        elif data.startswith(GZIP_MAGIC):
+            data = gzip.decompress(data)
+        text = data.decode('utf-8')
+    return json.loads(text) if field in PROFILE_JSON_FIELDS else text
+
+def get_field_filenames(field):
+    """Every filename a field may be stored under, newest encoding first"""
+    base = PROFILE_FIELD_FILES[field]
+    return [base + suffix for suffix in ('.zst', '.gz')] + [base]
+
+def is_profile_field_file(filename):
+    """True for the stored field files, compressed or not"""
+    return any(filename in get_field_filenames(field) for field in PROFILE_FIELDS)
+
+PROFILE_LOCK_DIR = os.path.join(DATA_STORAGE_DIR, '.locks')
+PROFILE_DERIVED_FILES = ('chat_artifacts.json', 'search_index.json')  # Rebuilt after every save, not carried over
+profile_thread_locks = {}
+profile_thread_locks_lock = threading.Lock()
+
+@contextlib.contextmanager
+def file_lock(lock_path):
+    """Exclusive lock on lock_path, across threads and (with fcntl) across worker processes"""
+    with profile_thread_locks_lock:
+        thread_lock = profile_thread_locks.setdefault(lock_path, threading.Lock())
+    with thread_lock:
+        if not FCNTL_AVAILABLE:
+            yield
+            return
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def profile_lock(folder_name):
+    """Exclusive per-candidate lock, across threads and (with fcntl) across worker processes"""
+    return file_lock(os.path.join(PROFILE_LOCK_DIR, hashlib.sha1(folder_name.encode('utf-8')).hexdigest() + '.lock'))
+
+def write_file_durably(path, data):
+    """Write bytes or text to a new file and fsync it"""
+    if os.path.lexists(path):
+        os.remove(path)  # Never write through a hard link shared with the published copy
+    with open(path, 'wb') as f:
+        f.write(data.encode('utf-8') if isinstance(data, str) else data)
+        f.flush()
+        os.fsync(f.fileno())
+
+def write_file_atomic(path, data):
+    """Write a file via a temp file and os.replace so readers never see a partial write"""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
     try:
-        # Sanitize person name for folder
-        folder_name = sanitize_folder_name(person_name)
-        person_dir = os.path.join(DATA_STORAGE_DIR, folder_name)
-        os.makedirs(person_dir, exist_ok=True)
-        
-        # Save resume file
-        if cv_file_path and os.path.exists(cv_file_path):
-            resume_filename = os.path.basename(cv_file_path)
-            resume_dest = os.path.join(person_dir, resume_filename)
-            import shutil
-            shutil.copy2(cv_file_path, resume_dest)
-        
-        # Save resume text
-        resume_text_path = os.path.join(person_dir, 'resume_text.txt')
-        with open(resume_text_path, 'w', encoding='utf-8') as f:
-            f.write(cv_text)
-        
-        # Save analysis JSON
-        analysis_path = os.path.join(person_dir, 'analysis.json')
-        with open(analysis_path, 'w', encoding='utf-8') as f:
-            json.dump(analysis, f, indent=2, ensure_ascii=False)
-        
-        # Save scraped data JSON
-        scraped_data_path = os.path.join(person_dir, 'scraped_data.json')
-        with open(scraped_data_path, 'w', encoding='utf-8') as f:
-            json.dump(scraped_data, f, indent=2, ensure_ascii=False)
-        
-        # Save job description if provided
-        if job_description and job_description.strip():
-            job_desc_path = os.path.join(person_dir, 'job_description.txt')
-            with open(job_desc_path, 'w', encoding='utf-8') as f:
-                f.write(job_description)
-        
-        # Save metadata
-        metadata = {
-            'person_name': person_name,
-            'folder_name': folder_name,
-            'saved_at': str(os.path.getmtime(person_dir)) if os.path.exists(person_dir) else None,
-            'has_resume': os.path.exists(resume_text_path),
-            'has_analysis': os.path.exists(analysis_path),
-            'has_scraped_data': os.path.exists(scraped_data_path),
-            'has_job_description': job_description and job_description.strip() != ''
-        }
-        metadata_path = os.path.join(person_dir, 'metadata.json')
-        with open(metadata_path, 'w', encoding='utf-8') as f:
-            json.dump(metadata, f, indent=2, ensure_ascii=False)
-        
-        return person_dir
-    except Exception as e:
-        print(f"Error saving profile data: {e}")
-        return None
+        write_file_durably(tmp_path, data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
-def load_profile_data(person_name):
-    """Load all saved profile data for a person"""
+def fsync_dir(path):
+    """Persist directory entries (renames) where the platform supports it"""
+    if os.name != 'posix':
+        return
+    fd = os.open(path, os.O_RDONLY)
     try:
-        folder_name = sanitize_folder_name(person_name)
-        person_dir = os.path.join(DATA_STORAGE_DIR, folder_name)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class ResumeBlobStore:
+    """Content-addressed store for original resume files, <root>/<ab>/<cd>/<sha256>, with a SQLite index of
+    reference counts and which candidates reference each blob"""
+    
+    def __init__(self, root=RESUME_BLOB_DIR):
+        self.root = root
+        self.local = threading.local()
+        self.connect()
+    
+    def connect(self):
+        """Per-thread connection to the blob index"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            os.makedirs(self.root, exist_ok=True)
+            conn = sqlite3.connect(os.path.join(self.root, 'index.sqlite'), timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS blobs (
+                    hash TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    refcount INTEGER NOT NULL DEFAULT 0,
+                    last_put_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS blob_refs (folder TEXT PRIMARY KEY, hash TEXT NOT NULL, filename TEXT NOT NULL);
+                CREATE INDEX IF NOT EXISTS blob_refs_hash ON blob_refs (hash);
+            ''')
+            self.local.conn = conn
+        return conn
+    
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+    
+    def text_path(self, digest):
+        return self.blob_path(digest) + '.text'
+    
+    def put(self, data):
+        """Store bytes once and return their SHA-256"""
+        digest = hashlib.sha256(data).hexdigest()
+        conn = self.connect()
+        with conn:
+            # Touching last_put_at first keeps a concurrent GC from deleting the blob we are about to reference
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'INSERT INTO blobs (hash, size, last_put_at) VALUES (?, ?, ?) ON CONFLICT (hash) DO UPDATE SET last_put_at = excluded.last_put_at',
+                (digest, len(data), time.time())
+            )
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_file_atomic(path, data)
+        return digest
+    
+    def get(self, digest):
+        """Bytes of a blob, or None"""
+        try:
+            with open(self.blob_path(digest), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    
+    def set_reference(self, folder_name, digest, filename):
+        """Point a candidate at a blob, moving its reference count from any previous blob"""
+        conn = self.connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            previous = conn.execute('SELECT hash FROM blob_refs WHERE folder = ?', (folder_name,)).fetchone()
+            if previous and previous[0] != digest:
+                conn.execute('UPDATE blobs SET refcount = refcount - 1 WHERE hash = ?', (previous[0],))
+            if not previous or previous[0] != digest:
+                conn.execute('UPDATE blobs SET refcount = refcount + 1 WHERE hash = ?', (digest,))
+            conn.execute('INSERT OR REPLACE INTO blob_refs VALUES (?, ?, ?)', (folder_name, digest, filename))
+    
+    def get_reference(self, folder_name):
+        """(sha256, filename) of a candidate's resume, or None"""
+        row = self.connect().execute('SELECT hash, filename FROM blob_refs WHERE folder = ?', (folder_name,)).fetchone()
+        return (row[0], row[1]) if row else None
+    
+    def find_references(self, digest):
+        """Candidates whose resume is the given blob"""
+        return [
+            {'folder': folder, 'filename': filename}
+            for folder, filename in self.connect().execute('SELECT folder, filename FROM blob_refs WHERE hash = ? ORDER BY folder', (digest,))
+        ]
+    
+    def get_text(self, digest):
+        """Previously extracted text of a blob, or None"""
+        try:
+            with open(self.text_path(digest), 'rb') as f:
+                return decode_profile_field('resume_text', f.read())
+        except FileNotFoundError:
+            return None
+    
+    def put_text(self, digest, text):
+        """Cache the extracted text of a blob so identical uploads skip extraction"""
+        path = self.text_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_file_atomic(path, encode_profile_field('resume_text', text))
+    
+    def collect_garbage(self, live_folders, grace_seconds=RESUME_BLOB_GC_GRACE_SECONDS, dry_run=False):
+        """Drop references of deleted candidates, recount references and delete unreferenced blobs"""
+        conn = self.connect()
+        cutoff = time.time() - grace_seconds
+        stats = {'stale_references': 0, 'deleted_blobs': 0, 'freed_bytes': 0, 'orphan_files': 0}
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            stale = [folder for (folder,) in conn.execute('SELECT folder FROM blob_refs') if folder not in live_folders]
+            stats['stale_references'] = len(stale)
+            if not dry_run:
+                conn.executemany('DELETE FROM blob_refs WHERE folder = ?', [(folder,) for folder in stale])
+                conn.execute('UPDATE blobs SET refcount = (SELECT COUNT(*) FROM blob_refs WHERE blob_refs.hash = blobs.hash)')
+            
+            garbage = conn.execute("""
+                SELECT hash, size FROM blobs
+                WHERE last_put_at < ? AND NOT EXISTS (SELECT 1 FROM blob_refs WHERE blob_refs.hash = blobs.hash)
+            """, (cutoff,)).fetchall()
+            for digest, size in garbage:
+                stats['deleted_blobs'] += 1
+                stats['freed_bytes'] += size
+                if not dry_run:
+                    conn.execute('DELETE FROM blobs WHERE hash = ?', (digest,))
+                    for path in (self.blob_path(digest), self.text_path(digest)):
+                        with contextlib.suppress(FileNotFoundError):
+                            os.remove(path)
+                    # Prune the shard directories once they are empty
+                    with contextlib.suppress(OSError):
+                        os.removedirs(os.path.dirname(self.blob_path(digest)))
+            
+            # Files left behind by a crash between writing a blob and indexing it
+            known = {digest for (digest,) in conn.execute('SELECT hash FROM blobs')}
+            for dirpath, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    digest = filename.split('.', 1)[0]
+                    path = os.path.join(dirpath, filename)
+                    if len(digest) != 64 or digest in known or os.path.getmtime(path) >= cutoff:
+                        continue
+                    stats['orphan_files'] += 1
+                    stats['freed_bytes'] += os.path.getsize(path)
+                    if not dry_run:
+                        os.remove(path)
+        return stats
+    
+    def stats(self):
+        """Blob count, stored bytes and reference count totals"""
+        blobs, stored_bytes, references = self.connect().execute('SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(refcount), 0) FROM blobs').fetchone()
+        return {'blobs': blobs, 'stored_bytes': stored_bytes, 'references': references}
+
+resume_blobs = ResumeBlobStore()
+
+class ProfileRepository:
+    """Storage interface for saved profiles, addressed by sanitized folder name"""
+    name = 'base'
+    
+    def save_profile(self, folder_name, record, resume_file=None):
+        """Store the PROFILE_FIELDS in record plus an optional (filename, bytes) resume, returns a location string"""
+        raise NotImplementedError
+    
+    def load_profile(self, folder_name, fields=None):
+        """Return the stored PROFILE_FIELDS (or just the requested ones) for a candidate, or None if it doesn't exist"""
+        raise NotImplementedError
+    
+    def get_resume_file(self, folder_name):
+        """Return the original (filename, bytes) resume, or None"""
+        raise NotImplementedError
+    
+    def profile_version(self, folder_name):
+        """Cheap value that changes on every save of the candidate, or None if it doesn't exist"""
+        raise NotImplementedError
+    
+    def list_profiles(self):
+        """Return [{'name', 'folder', 'saved_at'}] for every stored candidate"""
+        raise NotImplementedError
+    
+    def source_signature(self, folder_name):
+        """Value that changes whenever the candidate's stored fields change"""
+        raise NotImplementedError
+    
+    def read_artifact(self, folder_name, filename):
+        """Return a derived JSON artifact, or None"""
+        raise NotImplementedError
+    
+    def write_artifact(self, folder_name, filename, data):
+        """Store a derived JSON artifact"""
+        raise NotImplementedError
+    
+    def storage_version(self):
+        """Value that changes whenever a candidate is added or removed"""
+        raise NotImplementedError
+    
+    def save_analysis_version(self, folder_name, job_description_hash, record):
+        """Store an analysis against one job description, alongside the main analysis"""
+        raise NotImplementedError
+    
+    def load_analysis_version(self, folder_name, job_description_hash):
+        """Return a stored analysis version record, or None"""
+        raise NotImplementedError
+    
+    def list_analysis_versions(self, folder_name):
+        """Return every stored analysis version record for a candidate"""
+        raise NotImplementedError
+    
+    def load_resume_blob(self, folder_name):
+        """(filename, bytes) of a candidate's resume from the blob store, or None for profiles saved before it"""
+        reference = resume_blobs.get_reference(folder_name)
+        if reference:
+            data = resume_blobs.get(reference[0])
+            if data is not None:
+                return reference[1], data
+        return None
+
+class FileProfileRepository(ProfileRepository):
+    """profile_data/<folder>/ with resume_text.txt, analysis.json, scraped_data.json, job_description.txt, metadata.json
+    <folder> is a symlink to the current version in profile_data/.versions/, so a save publishes in one rename."""
+    name = 'file'
+    
+    def __init__(self, root=DATA_STORAGE_DIR):
+        self.root = root
+        self.staging_dir = os.path.join(root, '.staging')  # Same filesystem, so publishing is a rename
+        self.versions_dir = os.path.join(root, '.versions')
+        self.recover_interrupted_saves()
+    
+    def recover_interrupted_saves(self):
+        """Roll back saves that crashed before publishing, and drop versions no symlink points at"""
+        if os.path.isdir(self.staging_dir):
+            for entry in os.listdir(self.staging_dir):
+                kind, _, rest = entry.partition('-')
+                folder_name = rest.partition('-')[2]
+                entry_path = os.path.join(self.staging_dir, entry)
+                try:
+                    with profile_lock(folder_name):
+                        if not os.path.lexists(entry_path):
+                            continue
+                        if kind == 'old' and not os.path.lexists(os.path.join(self.root, folder_name)):
+                            # Crashed after moving a pre-versioning folder aside: put it back
+                            os.rename(entry_path, os.path.join(self.root, folder_name))
+                            print(f"Recovered profile {folder_name} from an interrupted save")
+                        elif kind == 'link':
+                            os.remove(entry_path)
+                        elif kind in ('old', 'new'):
+                            shutil.rmtree(entry_path, ignore_errors=True)
+                except Exception as e:
+                    print(f"Error recovering {entry}: {e}")
         
-        if not os.path.exists(person_dir):
+        if os.path.isdir(self.versions_dir):
+            for entry in os.listdir(self.versions_dir):
+                folder_name = entry.partition('-')[2]
+                entry_path = os.path.join(self.versions_dir, entry)
+                try:
+                    with profile_lock(folder_name):
+                        if os.path.realpath(os.path.join(self.root, folder_name)) != os.path.realpath(entry_path):
+                            shutil.rmtree(entry_path, ignore_errors=True)
+                except Exception as e:
+                    print(f"Error recovering {entry}: {e}")
+    
+    def save_profile(self, folder_name, record, resume_file=None):
+        # Write a complete new version, then publish it by repointing the <folder> symlink with one rename,
+        # so readers always see either the old or the new version and never a missing profile
+        os.makedirs(self.staging_dir, exist_ok=True)
+        os.makedirs(self.versions_dir, exist_ok=True)
+        save_id = uuid.uuid4().hex
+        person_dir = os.path.join(self.root, folder_name)
+        version_name = f"{save_id}-{folder_name}"
+        staged_dir = os.path.join(self.versions_dir, version_name)
+        link_path = os.path.join(self.staging_dir, f"link-{save_id}-{folder_name}")
+        old_dir = os.path.join(self.staging_dir, f"old-{save_id}-{folder_name}")
+        previous_version = os.path.realpath(person_dir) if os.path.islink(person_dir) else None
+        # The original resume goes to the content-addressed blob store; the profile only references it
+        resume_hash = resume_blobs.put(resume_file[1]) if resume_file else None
+        os.makedirs(staged_dir)
+        try:
+            # Carry over files this save doesn't rewrite (e.g. a resume stored inline before the blob store)
+            if os.path.isdir(person_dir):
+                for filename in os.listdir(person_dir):
+                    source_path = os.path.join(person_dir, filename)
+                    if is_profile_field_file(filename) or filename in PROFILE_DERIVED_FILES or not os.path.isfile(source_path):
+                        continue
+                    if resume_file and filename.rsplit('.', 1)[-1].lower() in ALLOWED_EXTENSIONS:
+                        continue
+                    try:
+                        os.link(source_path, os.path.join(staged_dir, filename))
+                    except OSError:
+                        shutil.copy2(source_path, os.path.join(staged_dir, filename))
+            
+            for field in PROFILE_FIELDS:
+                value = record.get(field)
+                if value is None:
+                    continue
+                suffix = COMPRESSION_SUFFIXES[PROFILE_COMPRESSION] if field in PROFILE_COMPRESSED_FIELDS else ''
+                write_file_durably(os.path.join(staged_dir, PROFILE_FIELD_FILES[field] + suffix), encode_profile_field(field, value))
+            fsync_dir(staged_dir)
+            fsync_dir(self.versions_dir)
+            
+            # Publish: rename a symlink to the new version over <folder> (relative, so the data dir can move)
+            os.symlink(os.path.join('.versions', version_name), link_path)
+            if os.path.isdir(person_dir) and not os.path.islink(person_dir):
+                # A folder saved before versioning can't be replaced by a rename; move it aside this once
+                os.rename(person_dir, old_dir)
+            os.replace(link_path, person_dir)
+            fsync_dir(self.root)
+        except Exception:
+            if os.path.exists(old_dir) and not os.path.lexists(person_dir):
+                os.rename(old_dir, person_dir)
+            if os.path.lexists(link_path):
+                os.remove(link_path)
+            shutil.rmtree(staged_dir, ignore_errors=True)
+            raise
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if previous_version:
+            shutil.rmtree(previous_version, ignore_errors=True)
+        if resume_hash:
+            resume_blobs.set_reference(folder_name, resume_hash, os.path.basename(resume_file[0]))
+        return person_dir
+    
+    def find_field_file(self, folder_name, field):
+        """Path of the stored file for a field, or None"""
+        for filename in get_field_filenames(field):
+            file_path = os.path.join(self.root, folder_name, filename)
+            if os.path.exists(file_path):
+                return file_path
+        return None
+    
+    def load_profile(self, folder_name, fields=None):
+        if not os.path.isdir(os.path.join(self.root, folder_name)):
             return None
         
+        # Only the requested files are opened and decoded
         data = {}
-        
-        # Load resume text
-        resume_text_path = os.path.join(person_dir, 'resume_text.txt')
-        if os.path.exists(resume_text_path):
-            with open(resume_text_path, 'r', encoding='utf-8') as f:
-                data['resume_text'] = f.read()
-        
-        # Load analysis
-        analysis_path = os.path.join(person_dir, 'analysis.json')
-        if os.path.exists(analysis_path):
-            with open(analysis_path, 'r', encoding='utf-8') as f:
-                data['analysis'] = json.load(f)
-        
-        # Load scraped data
-        scraped_data_path = os.path.join(person_dir, 'scraped_data.json')
-        if os.path.exists(scraped_data_path):
-            with open(scraped_data_path, 'r', encoding='utf-8') as f:
-                data['scraped_data'] = json.load(f)
-        
-        # Load job description
-        job_desc_path = os.path.join(person_dir, 'job_description.txt')
-        if os.path.exists(job_desc_path):
-            with open(job_desc_path, 'r', encoding='utf-8') as f:
-                data['job_description'] = f.read()
-        
-        # Load metadata
-        metadata_path = os.path.join(person_dir, 'metadata.json')
-        if os.path.exists(metadata_path):
-            with open(metadata_path, 'r', encoding='utf-8') as f:
-                data['metadata'] = json.load(f)
-        
+        for field in (PROFILE_FIELDS if fields is None else [f for f in PROFILE_FIELDS if f in fields]):
+            file_path = self.find_field_file(folder_name, field)
+            if file_path:
+                with open(file_path, 'rb') as f:
+                    data[field] = decode_profile_field(field, f.read())
         return data
-    except Exception as e:
-        print(f"Error loading profile data: {e}")
+    
+    def get_resume_file(self, folder_name):
+        person_dir = os.path.join(self.root, folder_name)
+        if not os.path.isdir(person_dir):
+            return None
+        resume_file = self.load_resume_blob(folder_name)
+        if resume_file:
+            return resume_file
+        for filename in os.listdir(person_dir):
+            if filename.rsplit('.', 1)[-1].lower() in ALLOWED_EXTENSIONS and not is_profile_field_file(filename):
+                with open(os.path.join(person_dir, filename), 'rb') as f:
+                    return filename, f.read()
         return None
-
-def get_all_saved_persons():
-    """Get list of all saved person names/IDs"""
-    try:
-        if not os.path.exists(DATA_STORAGE_DIR):
+    
+    def profile_version(self, folder_name):
+        # Every save publishes freshly written files, so their mtime/size identify the version
+        if not os.path.isdir(os.path.join(self.root, folder_name)):
+            return None
+        version = []
+        for field in PROFILE_FIELDS:
+            file_path = self.find_field_file(folder_name, field)
+            if file_path:
+                stat = os.stat(file_path)
+                version.append([os.path.basename(file_path), stat.st_mtime_ns, stat.st_size])
+        return version
+    
+    def list_profiles(self):
+        if not os.path.exists(self.root):
             return []
         
         persons = []
-        for folder in os.listdir(DATA_STORAGE_DIR):
-            folder_path = os.path.join(DATA_STORAGE_DIR, folder)
-            if os.path.isdir(folder_path):
+        for folder in os.listdir(self.root):
+            folder_path = os.path.join(self.root, folder)
+            # Dot-directories hold staging copies and lock files, not profiles
+            if not folder.startswith('.') and os.path.isdir(folder_path):
                 metadata_path = os.path.join(folder_path, 'metadata.json')
                 if os.path.exists(metadata_path):
                     try:
@@ -1382,73 +2087,1833 @@ def get_all_saved_persons():
                     except:
                         persons.append({'name': folder, 'folder': folder})
         return persons
-    except Exception as e:
-        print(f"Error getting saved persons: {e}")
-        return []
+    
+    def source_signature(self, folder_name):
+        # mtime/size of the files derived artifacts are built from
+        signature = {}
+        for field in CHAT_ARTIFACT_SOURCES:
+            file_path = self.find_field_file(folder_name, field)
+            if file_path:
+                stat = os.stat(file_path)
+                signature[os.path.basename(file_path)] = [stat.st_mtime_ns, stat.st_size]
+        return signature
+    
+    def read_artifact(self, folder_name, filename):
+        artifact_path = os.path.join(self.root, folder_name, filename)
+        if not os.path.exists(artifact_path):
+            return None
+        with open(artifact_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def write_artifact(self, folder_name, filename, data):
+        write_file_atomic(os.path.join(self.root, folder_name, filename), json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+    
+    def storage_version(self):
+        # The directory mtime changes whenever a profile folder is added or removed
+        try:
+            return str(os.stat(self.root).st_mtime_ns)
+        except OSError:
+            return ''
+    
+    def get_analysis_version_path(self, folder_name, job_description_hash):
+        """analysis-<hash>.json(.gz|.zst) next to the profile files; carried over by later saves"""
+        base = os.path.join(self.root, folder_name, f"analysis-{job_description_hash}.json")
+        for suffix in ('.zst', '.gz', ''):
+            if os.path.exists(base + suffix):
+                return base + suffix
+        return None
+    
+    def save_analysis_version(self, folder_name, job_description_hash, record):
+        existing_path = self.get_analysis_version_path(folder_name, job_description_hash)
+        file_path = os.path.join(self.root, folder_name, f"analysis-{job_description_hash}.json{COMPRESSION_SUFFIXES[PROFILE_COMPRESSION]}")
+        write_file_atomic(file_path, encode_profile_field('analysis', record))
+        if existing_path and existing_path != file_path:
+            os.remove(existing_path)
+    
+    def load_analysis_version(self, folder_name, job_description_hash):
+        file_path = self.get_analysis_version_path(folder_name, job_description_hash)
+        if not file_path:
+            return None
+        with open(file_path, 'rb') as f:
+            return decode_profile_field('analysis', f.read())
+    
+    def list_analysis_versions(self, folder_name):
+        person_dir = os.path.join(self.root, folder_name)
+        if not os.path.isdir(person_dir):
+            return []
+        hashes = {match.group(1) for match in (re.match(r'analysis-([0-9a-f]{64})\.json', f) for f in os.listdir(person_dir)) if match}
+        records = [record for record in (self.load_analysis_version(folder_name, h) for h in hashes) if record]
+        return sorted(records, key=lambda record: record.get('created_at') or 0)
 
-def generate_profile_summary(cv_text, scraped_data, job_description=None):
-    """Generate a comprehensive profile summary with match analysis using Gemini AI"""
+class SqliteProfileRepository(ProfileRepository):
+    """All profiles in one SQLite database in WAL mode (one row per candidate, JSON columns)"""
+    name = 'sqlite'
+    
+    def __init__(self, path=PROFILE_DB_PATH):
+        self.path = path
+        self.local = threading.local()
+        self.connect()
+    
+    def connect(self):
+        """Per-thread connection (sqlite3 connections can't be shared across threads)"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS profiles (
+                    folder TEXT PRIMARY KEY,
+                    person_name TEXT NOT NULL,
+                    saved_at REAL,
+                    version INTEGER NOT NULL,
+                    resume_text TEXT,
+                    analysis TEXT,
+                    scraped_data TEXT,
+                    job_description TEXT,
+                    metadata TEXT,
+                    resume_file_name TEXT,
+                    resume_file BLOB
+                );
+                CREATE INDEX IF NOT EXISTS profiles_person_name ON profiles (person_name);
+                CREATE INDEX IF NOT EXISTS profiles_saved_at ON profiles (saved_at);
+                CREATE INDEX IF NOT EXISTS profiles_version ON profiles (version);
+                CREATE TABLE IF NOT EXISTS profile_artifacts (
+                    folder TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (folder, name)
+                );
+                CREATE TABLE IF NOT EXISTS analysis_versions (
+                    folder TEXT NOT NULL,
+                    job_description_hash TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    record BLOB NOT NULL,
+                    PRIMARY KEY (folder, job_description_hash)
+                );
+            ''')
+            self.local.conn = conn
+        return conn
+    
+    def save_profile(self, folder_name, record, resume_file=None):
+        metadata = record.get('metadata') or {}
+        try:
+            saved_at = float(metadata.get('saved_at'))
+        except (TypeError, ValueError):
+            saved_at = time.time()
+        # Compressed fields are stored as BLOBs; rows written before compression hold TEXT and still decode
+        values = []
+        for field in PROFILE_FIELDS:
+            value = record.get(field)
+            if value is not None:
+                value = encode_profile_field(field, value)
+                value = value if field in PROFILE_COMPRESSED_FIELDS and PROFILE_COMPRESSION != 'none' else value.decode('utf-8')
+            values.append(value)
+        
+        # The original resume goes to the content-addressed blob store; the row only keeps inline resumes saved before it
+        resume_hash = resume_blobs.put(resume_file[1]) if resume_file else None
+        conn = self.connect()
+        with conn:
+            # BEGIN IMMEDIATE takes the write lock up front so the version counter can't race
+            conn.execute('BEGIN IMMEDIATE')
+            version = conn.execute('SELECT COALESCE(MAX(version), 0) + 1 FROM profiles').fetchone()[0]
+            inline_resume = (None, None)
+            if resume_file is None:
+                previous = conn.execute('SELECT resume_file_name, resume_file FROM profiles WHERE folder = ?', (folder_name,)).fetchone()
+                inline_resume = previous if previous and previous[0] else (None, None)
+            conn.execute(
+                'INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [folder_name, record.get('person_name') or folder_name, saved_at, version] + values + list(inline_resume)
+            )
+            conn.execute('DELETE FROM profile_artifacts WHERE folder = ?', (folder_name,))
+        if resume_hash:
+            resume_blobs.set_reference(folder_name, resume_hash, os.path.basename(resume_file[0]))
+        return f"{self.path}#{folder_name}"
+    
+    def load_profile(self, folder_name, fields=None):
+        # Only the requested columns are read and decoded
+        columns = PROFILE_FIELDS if fields is None else [f for f in PROFILE_FIELDS if f in fields]
+        row = self.connect().execute(
+            f"SELECT {', '.join(('folder',) + tuple(columns))} FROM profiles WHERE folder = ?", (folder_name,)
+        ).fetchone()
+        if row is None:
+            return None
+        
+        data = {}
+        for field, value in zip(columns, row[1:]):
+            if value is not None:
+                data[field] = decode_profile_field(field, value)
+        return data
+    
+    def get_resume_file(self, folder_name):
+        row = self.connect().execute('SELECT resume_file_name, resume_file FROM profiles WHERE folder = ?', (folder_name,)).fetchone()
+        if row is None:
+            return None
+        return self.load_resume_blob(folder_name) or ((row[0], bytes(row[1])) if row[0] else None)
+    
+    def profile_version(self, folder_name):
+        row = self.connect().execute('SELECT version FROM profiles WHERE folder = ?', (folder_name,)).fetchone()
+        return row[0] if row else None
+    
+    def list_profiles(self):
+        return [
+            {'name': name, 'folder': folder, 'saved_at': repr(saved_at) if saved_at is not None else None}
+            for folder, name, saved_at in self.connect().execute('SELECT folder, person_name, saved_at FROM profiles')
+        ]
+    
+    def source_signature(self, folder_name):
+        row = self.connect().execute('SELECT version FROM profiles WHERE folder = ?', (folder_name,)).fetchone()
+        return {'version': row[0] if row else None}
+    
+    def read_artifact(self, folder_name, filename):
+        row = self.connect().execute('SELECT data FROM profile_artifacts WHERE folder = ? AND name = ?', (folder_name, filename)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def write_artifact(self, folder_name, filename, data):
+        conn = self.connect()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO profile_artifacts VALUES (?, ?, ?)', (
+                folder_name, filename, json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+            ))
+    
+    def storage_version(self):
+        count, version = self.connect().execute('SELECT COUNT(*), MAX(version) FROM profiles').fetchone()
+        return f"{count}:{version}"
+    
+    def save_analysis_version(self, folder_name, job_description_hash, record):
+        conn = self.connect()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO analysis_versions VALUES (?, ?, ?, ?)', (
+                folder_name, job_description_hash, record.get('created_at') or time.time(), encode_profile_field('analysis', record)
+            ))
+    
+    def load_analysis_version(self, folder_name, job_description_hash):
+        row = self.connect().execute(
+            'SELECT record FROM analysis_versions WHERE folder = ? AND job_description_hash = ?', (folder_name, job_description_hash)
+        ).fetchone()
+        return decode_profile_field('analysis', row[0]) if row else None
+    
+    def list_analysis_versions(self, folder_name):
+        rows = self.connect().execute(
+            'SELECT record FROM analysis_versions WHERE folder = ? ORDER BY created_at', (folder_name,)
+        ).fetchall()
+        return [decode_profile_field('analysis', row[0]) for row in rows]
+
+def create_profile_repository(backend=PROFILE_STORAGE_BACKEND):
+    """Build the configured profile repository"""
+    if backend == 'sqlite':
+        return SqliteProfileRepository()
+    if backend != 'file':
+        print(f"Warning: unknown PROFILE_STORAGE_BACKEND '{backend}', using file storage")
+    return FileProfileRepository()
+
+profile_repository = create_profile_repository()
+print(f"Profile storage backend: {profile_repository.name}")
+
+def write_chat_artifacts(folder_name, person_name, resume_text, analysis, scraped_data):
+    """Build chat artifacts and store them alongside the profile"""
+    artifacts = build_chat_artifacts(person_name, resume_text, analysis, scraped_data)
+    artifacts['source_signature'] = profile_repository.source_signature(folder_name)
+    profile_repository.write_artifact(folder_name, 'chat_artifacts.json', artifacts)
+    return artifacts
+
+def read_derived_artifact(folder_name, filename):
+    """Read a derived artifact, or None if it is missing, unreadable or its source data changed"""
     try:
-        # Prepare the prompt
-        if job_description and job_description.strip():
-            # Job description provided - do match analysis
-            prompt = f"""Analyze the following professional profile against the job description and provide a comprehensive analysis.
+        artifact = profile_repository.read_artifact(folder_name, filename)
+    except Exception as e:
+        print(f"Error reading {filename}: {e}")
+        return None
+    if not artifact or artifact.get('source_signature') != profile_repository.source_signature(folder_name):
+        return None
+    return artifact
 
-JOB DESCRIPTION:
-{job_description[:2000]}
+# BM25 retrieval index over resume sections, scraped data and tool results
+SEARCH_CHUNK_CHARS = 800
+SEARCH_INDEX_MAX_TOOL_CHUNKS = 200  # Chunks tool results may add to one index (a chat session's)
+TOOL_RESULT_URL_PATTERN = re.compile(r'^(?:📄 Scraped(?: content from)?|🖼️ Analyzed media at) (\S+?):\n')
+BM25_K1 = 1.5
+BM25_B = 0.75
+SEARCH_STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'he', 'her', 'his', 'in', 'is',
+    'it', 'its', 'of', 'on', 'or', 'she', 'that', 'the', 'their', 'they', 'this', 'to', 'was', 'were',
+    'what', 'which', 'who', 'with', 'does', 'did', 'do', 'any', 'about'
+}
 
-CV/RESUME CONTENT:
-{cv_text[:3000]}
+def tokenize_for_search(text):
+    """Lowercase word tokens (keeps things like c++, c#, node.js), minus stopwords"""
+    tokens = re.findall(r'[a-z0-9][a-z0-9+#.]*', text.lower())
+    return [token.rstrip('.') for token in tokens if token.rstrip('.') and token not in SEARCH_STOPWORDS]
 
-SCRAPED PROFILE DATA (from GitHub, LinkedIn, DevPost, Kaggle, etc.):
-{json.dumps(scraped_data, indent=2)[:4000]}
+def split_into_chunks(text, source):
+    """Split text into chunks of about SEARCH_CHUNK_CHARS, starting a new chunk at section headings"""
+    chunks = []
+    current = ''
+    for block in text.split('\n'):
+        block = block.strip()
+        if not block:
+            continue
+        # Short all-caps lines or lines ending in ':' are section headings (PROJECTS, Experience:)
+        is_heading = len(block) < 40 and (block.isupper() or block.endswith(':'))
+        if current and (is_heading or len(current) + len(block) + 1 > SEARCH_CHUNK_CHARS):
+            chunks.append({'source': source, 'text': current})
+            current = ''
+        # Very long lines are cut so a single chunk never dominates the prompt
+        while len(block) > SEARCH_CHUNK_CHARS:
+            chunks.append({'source': source, 'text': block[:SEARCH_CHUNK_CHARS]})
+            block = block[SEARCH_CHUNK_CHARS:]
+        current = f"{current}\n{block}" if current else block
+    if current:
+        chunks.append({'source': source, 'text': current})
+    return chunks
 
-Please analyze and return a JSON object with the following structure:
-{{
-    "match_score": number (0-100, representing how well the profile matches the job),
-    "summary": "A comprehensive 2-3 paragraph summary of the candidate's profile",
-    "strengths": [
-        "Unique strength 1 (e.g., specific projects, achievements, skills from links)",
-        "Unique strength 2",
-        "Unique strength 3"
-    ],
-    "weaknesses": [
-        "Area of improvement 1 (missing skills, experience gaps, etc.)",
-        "Area of improvement 2"
-    ],
-    "key_points": [
-        "Key point 1 about the candidate",
-        "Key point 2",
-        "Key point 3"
-    ],
-    "unique_highlights": [
-        "Unique thing from resume or links 1",
-        "Unique thing from resume or links 2",
-        "Unique thing from resume or links 3"
-    ],
-    "skills_match": {{
-        "matched_skills": ["skill1", "skill2", ...],
-        "missing_skills": ["skill1", "skill2", ...]
-    }},
-    "recommendations": [
-        "Recommendation 1 to improve match",
-        "Recommendation 2"
-    ]
-}}
+def flatten_scraped_data(data, prefix=''):
+    """Turn nested scraped JSON into 'key: value' lines for indexing"""
+    lines = []
+    if isinstance(data, dict):
+        for key, value in data.items():
+            lines.extend(flatten_scraped_data(value, f"{prefix}{key} "))
+    elif isinstance(data, list):
+        for item in data:
+            lines.extend(flatten_scraped_data(item, prefix))
+    elif data not in (None, ''):
+        lines.append(f"{prefix.strip()}: {data}")
+    return lines
 
-Return ONLY valid JSON, no markdown formatting or additional text."""
-        else:
-            # No job description - general profile summary
-            prompt = f"""Analyze the following professional profile information and create a comprehensive, well-structured summary.
+def add_chunks_to_index(index, chunks):
+    """Add chunks to an inverted index in place"""
+    for chunk in chunks:
+        tokens = tokenize_for_search(chunk['text'])
+        if not tokens:
+            continue
+        chunk_id = len(index['chunks'])
+        index['chunks'].append(chunk)
+        index['doc_lengths'].append(len(tokens))
+        term_counts = {}
+        for token in tokens:
+            term_counts[token] = term_counts.get(token, 0) + 1
+        for term, count in term_counts.items():
+            index['postings'].setdefault(term, []).append([chunk_id, count])
+    index['total_length'] = sum(index['doc_lengths'])
+    return index
 
-CV/Resume Content:
-{cv_text[:3000]}
+def add_tool_results_to_index(index, results):
+    """Add scraped pages and media analyses to an index in place, once per URL and up to
+    SEARCH_INDEX_MAX_TOOL_CHUNKS chunks in total. Callers sharing the index must hold its lock."""
+    indexed_urls = index.setdefault('tool_urls', [])
+    chunks = []
+    for result in results:
+        match = TOOL_RESULT_URL_PATTERN.match(result)
+        if not match or match.group(1) in indexed_urls:
+            continue
+        budget = SEARCH_INDEX_MAX_TOOL_CHUNKS - index.get('tool_chunks', 0) - len(chunks)
+        if budget <= 0:
+            break
+        indexed_urls.append(match.group(1))
+        chunks.extend(split_into_chunks(result[match.end():], match.group(1))[:budget])
+    index['tool_chunks'] = index.get('tool_chunks', 0) + len(chunks)
+    return add_chunks_to_index(index, chunks)
 
-Scraped Profile Data:
-{json.dumps(scraped_data, indent=2)[:4000]}
+def build_search_index(resume_text, scraped_data):
+    """Build the per-person BM25 index from resume sections and scraped platform data"""
+    index = {'chunks': [], 'postings': {}, 'doc_lengths': [], 'total_length': 0}
+    chunks = split_into_chunks(resume_text, 'resume')
+    for platform, data in scraped_data.items():
+        chunks.extend(split_into_chunks('\n'.join(flatten_scraped_data(data)), platform))
+    return add_chunks_to_index(index, chunks)
 
-Please analyze and return a JSON object with the following structure:
-{{
+def search_index(index, query, top_k=5):
+    """BM25 top-k chunks for a query"""
+    num_chunks = len(index['chunks'])
+    if not num_chunks:
+        return []
+    avg_length = index['total_length'] / num_chunks
+    
+    scores = {}
+    for term in set(tokenize_for_search(query)):
+        postings = index['postings'].get(term)
+        if not postings:
+            continue
+        idf = math.log(1 + (num_chunks - len(postings) + 0.5) / (len(postings) + 0.5))
+        for chunk_id, term_count in postings:
+            length_norm = BM25_K1 * (1 - BM25_B + BM25_B * index['doc_lengths'][chunk_id] / avg_length)
+            scores[chunk_id] = scores.get(chunk_id, 0) + idf * term_count * (BM25_K1 + 1) / (term_count + length_norm)
+    
+    best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [dict(index['chunks'][chunk_id], score=round(score, 3)) for chunk_id, score in best]
+
+def write_search_index(folder_name, resume_text, scraped_data):
+    """Build the BM25 index and store it alongside the profile"""
+    index = build_search_index(resume_text, scraped_data)
+    index['source_signature'] = profile_repository.source_signature(folder_name)
+    profile_repository.write_artifact(folder_name, 'search_index.json', index)
+    return index
+
+# Decoded profiles kept in memory, bounded by entry count and approximate size
+PROFILE_CACHE_MAX_ENTRIES = int(os.getenv('PROFILE_CACHE_MAX_ENTRIES', '128'))
+PROFILE_CACHE_MAX_BYTES = int(os.getenv('PROFILE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+PROFILE_FIELD_ABSENT = object()  # Cached marker for fields the profile doesn't have
+
+profile_cache = {
+    'entries': OrderedDict(),  # folder -> {'version', 'fields', 'bytes'}
+    'bytes': 0,
+    'lock': threading.Lock(),
+    'stats': {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+}
+
+def estimate_size(value):
+    """Approximate in-memory footprint of a decoded field, in bytes"""
+    if value is PROFILE_FIELD_ABSENT:
+        return 0
+    if isinstance(value, str):
+        return len(value)
+    return len(json.dumps(value, ensure_ascii=False, separators=(',', ':')))
+
+def copy_search_index(index):
+    """Copy of a BM25 index that add_chunks_to_index can grow without touching the cached one"""
+    return dict(
+        index,
+        chunks=list(index['chunks']),
+        doc_lengths=list(index['doc_lengths']),
+        tool_urls=list(index.get('tool_urls', [])),
+        postings={term: list(postings) for term, postings in index['postings'].items()}
+    )
+
+def drop_cached_profile(folder_name):
+    """Remove a profile from the cache (caller holds the lock)"""
+    entry = profile_cache['entries'].pop(folder_name, None)
+    if entry:
+        profile_cache['bytes'] -= entry['bytes']
+
+def invalidate_cached_profile(folder_name):
+    """Forget a cached profile, e.g. after it was saved"""
+    with profile_cache['lock']:
+        if folder_name in profile_cache['entries']:
+            drop_cached_profile(folder_name)
+            profile_cache['stats']['invalidations'] += 1
+
+def get_cached_profile_fields(folder_name, version, fields):
+    """Cached fields of a profile at the given version, as {field: value}"""
+    with profile_cache['lock']:
+        entry = profile_cache['entries'].get(folder_name)
+        if entry and entry['version'] != version:
+            # Saved since it was cached (possibly by another worker)
+            drop_cached_profile(folder_name)
+            profile_cache['stats']['invalidations'] += 1
+            entry = None
+        if not entry:
+            profile_cache['stats']['misses'] += 1
+            return {}
+        profile_cache['entries'].move_to_end(folder_name)
+        found = {field: entry['fields'][field] for field in fields if field in entry['fields']}
+        profile_cache['stats']['hits' if len(found) == len(fields) else 'misses'] += 1
+        return found
+
+def cache_profile_fields(folder_name, version, fields):
+    """Add decoded fields of a profile version to the cache, evicting least recently used profiles"""
+    sizes = {field: estimate_size(value) for field, value in fields.items()}
+    with profile_cache['lock']:
+        entry = profile_cache['entries'].get(folder_name)
+        if not entry or entry['version'] != version:
+            drop_cached_profile(folder_name)
+            entry = {'version': version, 'fields': {}, 'bytes': 0}
+            profile_cache['entries'][folder_name] = entry
+        for field, value in fields.items():
+            if field not in entry['fields']:
+                entry['fields'][field] = value
+                entry['bytes'] += sizes[field]
+                profile_cache['bytes'] += sizes[field]
+        profile_cache['entries'].move_to_end(folder_name)
+        
+        while profile_cache['entries'] and (
+            len(profile_cache['entries']) > PROFILE_CACHE_MAX_ENTRIES or profile_cache['bytes'] > PROFILE_CACHE_MAX_BYTES
+        ):
+            evicted_folder = next(iter(profile_cache['entries']))
+            drop_cached_profile(evicted_folder)
+            profile_cache['stats']['evictions'] += 1
+
+def get_profile_cache_stats():
+    """Hit rate and occupancy of the profile cache"""
+    with profile_cache['lock']:
+        stats = dict(profile_cache['stats'])
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'hit_rate': round(stats['hits'] / lookups, 4) if lookups else None,
+            'entries': len(profile_cache['entries']),
+            'bytes': profile_cache['bytes'],
+            'max_entries': PROFILE_CACHE_MAX_ENTRIES,
+            'max_bytes': PROFILE_CACHE_MAX_BYTES
+        })
+    return stats
+
+def save_profile_data(person_name, cv_text, cv_file, analysis, scraped_data, job_description=None, links=None):
+    """Save all profile data to the configured storage backend, organized by person name/ID.
+    cv_file is the original resume: a path, or a (filename, bytes) tuple for uploads kept in memory."""
+    try:
+        # Sanitize person name for folder
+        folder_name = sanitize_folder_name(person_name)
+        
+        # Original resume file
+        resume_file = None
+        if isinstance(cv_file, tuple):
+            resume_file = cv_file
+        elif cv_file and os.path.exists(cv_file):
+            with open(cv_file, 'rb') as f:
+                resume_file = (os.path.basename(cv_file), f.read())
+        
+        # Only one save per candidate at a time, across threads and worker processes
+        with profile_lock(folder_name):
+            has_job_description = bool(job_description and job_description.strip())
+            previous_resume = resume_blobs.get_reference(folder_name)
+            metadata = {
+                'person_name': person_name,
+                'folder_name': folder_name,
+                'saved_at': str(time.time()),
+                'has_resume': cv_text is not None,
+                'has_analysis': analysis is not None,
+                'has_scraped_data': scraped_data is not None,
+                'has_job_description': has_job_description,
+                'links': links or [],
+                # Content address of the original resume in the blob store
+                'resume_sha256': hashlib.sha256(resume_file[1]).hexdigest() if resume_file else (previous_resume[0] if previous_resume else None)
+            }
+            saved_location = profile_repository.save_profile(folder_name, {
+                'person_name': person_name,
+                'resume_text': cv_text,
+                'analysis': analysis,
+                'scraped_data': scraped_data,
+                'job_description': job_description if has_job_description else None,
+                'metadata': metadata
+            }, resume_file)
+            
+            # Precompute chat context artifacts and the retrieval index so the agent doesn't rebuild them per message
+            write_chat_artifacts(folder_name, person_name, cv_text, analysis, scraped_data)
+            write_search_index(folder_name, cv_text, scraped_data)
+            invalidate_cached_profile(folder_name)
+            
+            # Keep the persons manifest and the cross-candidate search index up to date
+            try:
+                update_manifest(person_name, folder_name, metadata, analysis, scraped_data, cv_text)
+            except Exception as e:
+                print(f"Error updating persons manifest: {e}")
+            try:
+                update_vector_index(folder_name, person_name, get_profile_search_text(person_name, cv_text, analysis, scraped_data))
+            except Exception as e:
+                print(f"Error updating candidate search index: {e}")
+        
+        return saved_location
+    except Exception as e:
+        print(f"Error saving profile data: {e}")
+        return None
+
+def load_profile_data(person_name, fields=None):
+    """Load saved profile data for a person (only the given fields, if any)"""
+    try:
+        folder_name = sanitize_folder_name(person_name)
+        wanted = list(PROFILE_FIELDS + ('chat_artifacts', 'search_index')) if fields is None else list(fields)
+        version = profile_repository.profile_version(folder_name)
+        if version is None:
+            # A save may be between its publish renames; wait for it before giving up
+            with profile_lock(folder_name):
+                version = profile_repository.profile_version(folder_name)
+        if version is None:
+            return None
+        
+        # Serve what we can from memory, decode the rest from storage
+        sources = get_cached_profile_fields(folder_name, version, wanted)
+        loaded = {}
+        def get_source(field, default=None):
+            if field not in sources:
+                value = (profile_repository.load_profile(folder_name, [field]) or {}).get(field, PROFILE_FIELD_ABSENT)
+                sources[field] = loaded[field] = value
+            return default if sources[field] is PROFILE_FIELD_ABSENT else sources[field]
+        
+        missing_fields = [field for field in PROFILE_FIELDS if field in wanted and field not in sources]
+        if missing_fields:
+            stored = profile_repository.load_profile(folder_name, missing_fields)
+            if stored is None:
+                return None
+            for field in missing_fields:
+                sources[field] = loaded[field] = stored.get(field, PROFILE_FIELD_ABSENT)
+        
+        # Load chat artifacts and the retrieval index, rebuilding them if any source data changed
+        if 'chat_artifacts' in wanted and 'chat_artifacts' not in sources:
+            artifacts = read_derived_artifact(folder_name, 'chat_artifacts.json')
+            if not artifacts:
+                artifacts = write_chat_artifacts(
+                    folder_name,
+                    get_source('metadata', {}).get('person_name', ''),
+                    get_source('resume_text', ''),
+                    get_source('analysis', {}),
+                    get_source('scraped_data', {})
+                )
+            sources['chat_artifacts'] = loaded['chat_artifacts'] = artifacts
+        
+        if 'search_index' in wanted and 'search_index' not in sources:
+            index = read_derived_artifact(folder_name, 'search_index.json')
+            if not index:
+                index = write_search_index(folder_name, get_source('resume_text', ''), get_source('scraped_data', {}))
+            sources['search_index'] = loaded['search_index'] = index
+        
+        if loaded:
+            cache_profile_fields(folder_name, version, loaded)
+        
+        # Callers get their own copies, so editing a loaded profile can't change what the cache serves next
+        data = {}
+        for field in wanted:
+            if field not in sources or sources[field] is PROFILE_FIELD_ABSENT:
+                continue
+            data[field] = copy_search_index(sources[field]) if field == 'search_index' else copy.deepcopy(sources[field])
+        return data
+    except Exception as e:
+        print(f"Error loading profile data: {e}")
+        return None
+
+def get_all_saved_persons():
+    """Get list of all saved person names/IDs"""
+    try:
+        return profile_repository.list_profiles()
+    except Exception as e:
+        print(f"Error getting saved persons: {e}")
+        return []
+
+# Cross-candidate search: sublinear TF vectors over hashed unigrams and bigrams, stored as postings in SQLite
+VECTOR_INDEX_DIR = 'profile_index'
+VECTOR_PROFILE_TEXT_CHARS = 20000
+VECTOR_DB_PATH = os.path.join(VECTOR_INDEX_DIR, 'vectors.sqlite')
+VECTOR_LOCK_PATH = os.path.join(VECTOR_INDEX_DIR, 'vectors.lock')  # Serializes writers across worker processes
+VECTOR_LEGACY_FILES = ('vector_rows.jsonl', 'vectors.f32', 'vector_df.npy')  # Dense 512-bucket index, removed on rebuild
+
+vector_rebuild_lock = threading.Lock()
+
+def get_profile_search_text(person_name, cv_text, analysis, scraped_data):
+    """Text used to embed a candidate: name, analysis highlights, resume and scraped data"""
+    analysis = analysis if isinstance(analysis, dict) else {}
+    parts = [person_name, str(analysis.get('summary', ''))]
+    for key in ('skills', 'strengths', 'key_points', 'unique_highlights'):
+        if isinstance(analysis.get(key), list):
+            parts.extend(str(item) for item in analysis[key])
+    skills_match = analysis.get('skills_match')
+    if isinstance(skills_match, dict):
+        parts.extend(str(skill) for skill in skills_match.get('matched_skills', []) or [])
+    parts.append(cv_text or '')
+    parts.extend(flatten_scraped_data(scraped_data or {}))
+    return '\n'.join(parts)[:VECTOR_PROFILE_TEXT_CHARS]
+
+def embed_text(text):
+    """Sublinear tf over unigrams and bigrams as {feature id: weight}, L2-normalized.
+    Feature ids are full 32-bit hashes, so collisions are rare and document frequency is effectively per term."""
+    tokens = tokenize_for_search(text)
+    features = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    counts = {}
+    for feature in features:
+        # crc32 is stable across processes, unlike hash()
+        feature_id = zlib.crc32(feature.encode('utf-8'))
+        counts[feature_id] = counts.get(feature_id, 0) + 1
+    weights = {feature_id: 1.0 + math.log(count) for feature_id, count in counts.items()}
+    norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+    return {feature_id: weight / norm for feature_id, weight in weights.items()}
+
+def connect_vector_index(path=None):
+    """Open the candidate vector index (or a rebuild's temp copy), creating the schema if needed.
+    Rollback-journal mode (not WAL) so a rebuilt file can be renamed over the live one."""
+    os.makedirs(VECTOR_INDEX_DIR, exist_ok=True)
+    conn = sqlite3.connect(path or VECTOR_DB_PATH, timeout=10)
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS vector_rows (
+            row INTEGER PRIMARY KEY,
+            folder TEXT NOT NULL UNIQUE,
+            name TEXT NOT NULL,
+            features BLOB NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS vector_postings (
+            feature INTEGER NOT NULL,
+            row INTEGER NOT NULL,
+            weight REAL NOT NULL,
+            PRIMARY KEY (feature, row)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS vector_meta (key TEXT PRIMARY KEY, value TEXT);
+    ''')
+    return conn
+
+def unpack_vector_features(blob):
+    """Feature ids stored with a row, used to find its postings again"""
+    return struct.unpack(f'<{len(blob) // 4}I', blob)
+
+def delete_vector_row(conn, folder_name):
+    """Remove one candidate's row and postings (the caller commits)"""
+    existing = conn.execute('SELECT row, features FROM vector_rows WHERE folder = ?', (folder_name,)).fetchone()
+    if existing:
+        row, features = existing
+        conn.executemany('DELETE FROM vector_postings WHERE feature = ? AND row = ?', [(feature, row) for feature in unpack_vector_features(features)])
+        conn.execute('DELETE FROM vector_rows WHERE row = ?', (row,))
+
+def read_vector_row(conn, row):
+    """One stored row's vector as {feature id: weight}"""
+    features = conn.execute('SELECT features FROM vector_rows WHERE row = ?', (row,)).fetchone()[0]
+    return {
+        feature: conn.execute('SELECT weight FROM vector_postings WHERE feature = ? AND row = ?', (feature, row)).fetchone()[0]
+        for feature in unpack_vector_features(features)
+    }
+
+def write_vector_row(conn, folder_name, person_name, vector, updated_at=None):
+    """Insert or replace one candidate's row and postings (the caller commits)"""
+    delete_vector_row(conn, folder_name)
+    features = struct.pack(f'<{len(vector)}I', *vector)
+    row = conn.execute(
+        'INSERT INTO vector_rows (folder, name, features, updated_at) VALUES (?, ?, ?, ?)',
+        (folder_name, person_name, features, updated_at or time.time())
+    ).lastrowid
+    conn.executemany('INSERT INTO vector_postings (feature, row, weight) VALUES (?, ?, ?)', [(feature, row, weight) for feature, weight in vector.items()])
+
+def update_vector_index(folder_name, person_name, text):
+    """Insert or overwrite one candidate's vector (called from save_profile_data)"""
+    vector = embed_text(text)
+    with file_lock(VECTOR_LOCK_PATH):
+        conn = connect_vector_index()
+        try:
+            with conn:
+                write_vector_row(conn, folder_name, person_name, vector)
+        finally:
+            conn.close()
+
+def drop_vector_rows(folder_names):
+    """Remove candidates whose profiles no longer exist"""
+    for folder_name in folder_names:
+        # A save between its publish renames also looks deleted; its profile lock settles which it is
+        with profile_lock(folder_name):
+            if profile_repository.profile_version(folder_name) is not None:
+                continue
+            with file_lock(VECTOR_LOCK_PATH):
+                conn = connect_vector_index()
+                try:
+                    with conn:
+                        delete_vector_row(conn, folder_name)
+                finally:
+                    conn.close()
+
+def rebuild_vector_index():
+    """Rebuild the search index from every saved profile into a temp database, then rename it over the live one.
+    Profiles are read without the index lock (a save holds its profile lock while it waits for ours); saves that
+    land meanwhile are carried over from the live index before the swap."""
+    started_at = time.time()
+    tmp_path = f"{VECTOR_DB_PATH}.{uuid.uuid4().hex}.tmp"
+    count = 0
+    try:
+        conn = connect_vector_index(tmp_path)
+        try:
+            with conn:
+                for person in get_all_saved_persons():
+                    profile = load_profile_data(person['name'], fields=('resume_text', 'analysis', 'scraped_data'))
+                    if profile:
+                        write_vector_row(conn, person['folder'], person['name'], embed_text(get_profile_search_text(
+                            person['name'], profile.get('resume_text', ''), profile.get('analysis', {}), profile.get('scraped_data', {})
+                        )), started_at)
+                        count += 1
+            
+            with file_lock(VECTOR_LOCK_PATH):
+                if os.path.exists(VECTOR_DB_PATH):
+                    live = connect_vector_index()
+                    try:
+                        with conn:
+                            for row, folder, name, updated_at in live.execute(
+                                'SELECT row, folder, name, updated_at FROM vector_rows WHERE updated_at > ?', (started_at,)
+                            ).fetchall():
+                                write_vector_row(conn, folder, name, read_vector_row(live, row), updated_at)
+                    finally:
+                        live.close()
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO vector_meta (key, value) VALUES ('complete', '1')")
+                conn.close()
+                os.replace(tmp_path, VECTOR_DB_PATH)
+        finally:
+            conn.close()
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    
+    for filename in VECTOR_LEGACY_FILES:
+        path = os.path.join(VECTOR_INDEX_DIR, filename)
+        if os.path.exists(path):
+            os.remove(path)
+    return count
+
+def is_vector_index_complete():
+    """True once a rebuild has indexed every profile (saves alone only index themselves)"""
+    if not os.path.exists(VECTOR_DB_PATH):
+        return False
+    conn = connect_vector_index()
+    try:
+        return conn.execute("SELECT 1 FROM vector_meta WHERE key = 'complete'").fetchone() is not None
+    finally:
+        conn.close()
+
+def ensure_vector_index():
+    """Build the index on first use if profiles were saved before it existed"""
+    if is_vector_index_complete() or not get_all_saved_persons():
+        return
+    with vector_rebuild_lock:
+        # Another request may have finished the rebuild while we waited
+        if not is_vector_index_complete():
+            rebuild_vector_index()
+
+def search_candidates(query, top_k=10):
+    """Top-k candidates by IDF-weighted cosine similarity to the query, reading only the query terms' postings"""
+    query_vector = embed_text(query)
+    if not query_vector or not os.path.exists(VECTOR_DB_PATH):
+        return []
+    
+    conn = connect_vector_index()
+    try:
+        num_rows = conn.execute('SELECT COUNT(*) FROM vector_rows').fetchone()[0]
+        weighted_query = {}
+        postings_of = {}
+        for feature, weight in query_vector.items():
+            postings_of[feature] = conn.execute('SELECT row, weight FROM vector_postings WHERE feature = ?', (feature,)).fetchall()
+            idf = math.log((1 + num_rows) / (1 + len(postings_of[feature]))) + 1
+            weighted_query[feature] = weight * idf
+        norm = math.sqrt(sum(weight * weight for weight in weighted_query.values()))
+        
+        scores = {}
+        for feature, postings in postings_of.items():
+            query_weight = weighted_query[feature] / norm
+            for row, weight in postings:
+                scores[row] = scores.get(row, 0) + query_weight * weight
+        
+        ranked = sorted(((row, score) for row, score in scores.items() if score > 0), key=lambda item: item[1], reverse=True)
+        results = []
+        deleted_folders = []
+        for start in range(0, len(ranked), top_k):
+            page = ranked[start:start + top_k]
+            placeholders = ', '.join('?' * len(page))
+            names = {row: (folder, name) for row, folder, name in conn.execute(
+                f'SELECT row, folder, name FROM vector_rows WHERE row IN ({placeholders})', [row for row, _ in page]
+            )}
+            for row, score in page:
+                folder, name = names[row]
+                # Skip (and later drop) candidates whose profile folder was deleted
+                if profile_repository.profile_version(folder) is None:
+                    deleted_folders.append(folder)
+                    continue
+                results.append({'name': name, 'folder': folder, 'score': round(score, 4)})
+            if len(results) >= top_k:
+                break
+    finally:
+        conn.close()
+    
+    if deleted_folders:
+        drop_vector_rows(deleted_folders)
+    return results[:top_k]
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Rebuild the cross-candidate search index from profile_data/"""
+    count = rebuild_vector_index()
+    print(f"Indexed {count} profiles")
+
+# Persons manifest: a SQLite index of saved profiles so /api/persons doesn't scan every profile
+MANIFEST_DB_PATH = os.path.join(VECTOR_INDEX_DIR, 'manifest.sqlite')
+# Sort keys for keyset pagination; NULLs are coalesced so every row has a comparable key (each has a matching index)
+MANIFEST_SORT_COLUMNS = {'name': 'name_lower', 'saved_at': 'COALESCE(saved_at, 0)', 'match_score': 'COALESCE(match_score, -1)'}
+MANIFEST_MAX_PER_PAGE = 500
+MANIFEST_SCHEMA_VERSION = '4'  # Bump to force a rebuild when the manifest gains data or term normalization changes
+SKILL_SOURCE_KEYS = {'skills', 'matched_skills', 'technologies', 'technologies_mentioned', 'built_with', 'language', 'languages', 'topics'}
+manifest_lock = threading.Lock()
+
+def connect_manifest():
+    """Open the manifest database, creating the schema if needed"""
+    os.makedirs(VECTOR_INDEX_DIR, exist_ok=True)
+    conn = sqlite3.connect(MANIFEST_DB_PATH, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS persons (
+            folder TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            name_lower TEXT NOT NULL,
+            saved_at REAL,
+            match_score REAL,
+            has_job_description INTEGER NOT NULL DEFAULT 0
+        );
+        DROP INDEX IF EXISTS persons_name;
+        DROP INDEX IF EXISTS persons_saved_at;
+        DROP INDEX IF EXISTS persons_match_score;
+        CREATE INDEX IF NOT EXISTS persons_by_name ON persons (name_lower, folder);
+        CREATE INDEX IF NOT EXISTS persons_by_score ON persons (COALESCE(match_score, -1), folder);
+        CREATE INDEX IF NOT EXISTS persons_export ON persons (COALESCE(saved_at, 0), folder);
+        CREATE TABLE IF NOT EXISTS person_terms (folder TEXT PRIMARY KEY, terms TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS person_minhash (folder TEXT PRIMARY KEY, signature BLOB NOT NULL);
+        CREATE TABLE IF NOT EXISTS lsh_buckets (band INTEGER NOT NULL, bucket INTEGER NOT NULL, folder TEXT NOT NULL, PRIMARY KEY (band, bucket, folder));
+        CREATE INDEX IF NOT EXISTS lsh_buckets_folder ON lsh_buckets (folder);
+        CREATE TABLE IF NOT EXISTS manifest_meta (key TEXT PRIMARY KEY, value TEXT);
+    ''')
+    return conn
+
+def normalize_term(term):
+    """Lowercase a skill/keyword and keep only word characters plus +, # and inner dots (c++, c#, node.js)"""
+    return ' '.join(token.rstrip('.') for token in re.findall(r'[a-z0-9][a-z0-9+#.]*', str(term).lower()))
+
+def collect_skill_strings(data):
+    """Every string listed under a skill-like key anywhere in a scraped/analysis structure"""
+    found = []
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key in SKILL_SOURCE_KEYS:
+                values = value if isinstance(value, list) else [value]
+                found.extend(item for item in values if isinstance(item, str) and item.strip())
+            elif isinstance(value, (dict, list)):
+                found.extend(collect_skill_strings(value))
+    elif isinstance(data, list):
+        for item in data:
+            found.extend(collect_skill_strings(item))
+    return found
+
+# Skill taxonomy: canonical skill id -> aliases (compared after normalize_term)
+SKILL_ALIASES = {
+    'javascript': ['js', 'ecmascript', 'es6', 'vanilla js'],
+    'typescript': ['ts'],
+    'python': ['python3', 'python 3', 'py'],
+    'c++': ['cpp', 'c plus plus'],
+    'c#': ['csharp', 'c sharp'],
+    'go': ['golang'],
+    'ruby-on-rails': ['ruby on rails', 'rails', 'ror'],
+    'node.js': ['node', 'nodejs', 'node js'],
+    'react': ['reactjs', 'react.js', 'react js'],
+    'react-native': ['react native'],
+    'vue': ['vuejs', 'vue.js', 'vue js'],
+    'angular': ['angularjs', 'angular.js'],
+    'next.js': ['nextjs', 'next js'],
+    'django': ['django rest framework', 'drf'],
+    'fastapi': ['fast api'],
+    'spring': ['spring boot', 'springboot'],
+    'html': ['html5'],
+    'css': ['css3', 'scss', 'sass'],
+    'tailwind': ['tailwindcss', 'tailwind css'],
+    'sql': ['structured query language'],
+    'postgresql': ['postgres', 'psql'],
+    'mongodb': ['mongo'],
+    'aws': ['amazon web services'],
+    'gcp': ['google cloud', 'google cloud platform'],
+    'azure': ['microsoft azure'],
+    'docker': ['docker compose', 'dockerfile'],
+    'kubernetes': ['k8s'],
+    'ci-cd': ['ci cd', 'ci/cd', 'continuous integration', 'github actions'],
+    'machine-learning': ['machine learning', 'ml'],
+    'deep-learning': ['deep learning', 'dl', 'neural networks'],
+    'nlp': ['natural language processing'],
+    'computer-vision': ['computer vision'],
+    'llm': ['llms', 'large language models', 'large language model', 'generative ai', 'genai'],
+    'pytorch': ['torch'],
+    'tensorflow': ['tensorflow 2', 'tf2'],
+    'scikit-learn': ['sklearn', 'scikit learn'],
+    'data-analysis': ['data analysis', 'data analytics'],
+    'jupyter': ['jupyter notebook', 'jupyter notebooks'],
+    'graphql': ['graph ql'],
+    'rest': ['rest api', 'restful', 'rest apis', 'restful apis'],
+    'linux': ['gnu linux'],
+    'shell': ['bash', 'shell scripting', 'zsh']
+}
+SKILL_ALIASES_PATH = os.getenv('SKILL_ALIASES_PATH', '')  # Optional JSON {canonical: [aliases]} merged over the built-in table
+
+def build_skill_alias_lookup():
+    """normalized alias -> canonical skill id, including each canonical id itself"""
+    aliases = {canonical: list(values) for canonical, values in SKILL_ALIASES.items()}
+    if SKILL_ALIASES_PATH and os.path.exists(SKILL_ALIASES_PATH):
+        try:
+            with open(SKILL_ALIASES_PATH, 'r', encoding='utf-8') as f:
+                for canonical, values in json.load(f).items():
+                    aliases.setdefault(canonical, []).extend(values)
+        except Exception as e:
+            print(f"Error loading skill aliases from {SKILL_ALIASES_PATH}: {e}")
+    
+    lookup = {}
+    for canonical, values in aliases.items():
+        for alias in [canonical, canonical.replace('-', ' ')] + values:
+            lookup[normalize_term(alias)] = canonical
+    return lookup
+
+SKILL_ALIAS_LOOKUP = build_skill_alias_lookup()
+
+def canonicalize_skill(term):
+    """Canonical skill id for a free-text skill ('JS', 'javascript' -> 'javascript'); unknown skills keep their normalized form"""
+    normalized = normalize_term(term)
+    return SKILL_ALIAS_LOOKUP.get(normalized, normalized)
+
+def get_profile_terms(analysis, scraped_data):
+    """Canonical skill ids of a profile, from the analysis and scraped platforms"""
+    terms = {canonicalize_skill(term) for term in collect_skill_strings(analysis or {}) + collect_skill_strings(scraped_data or {})}
+    return sorted(term for term in terms if term and len(term) <= 50)
+
+def get_manifest_record(person_name, folder_name, metadata, analysis):
+    """Manifest row values for one profile"""
+    try:
+        saved_at = float(metadata.get('saved_at'))
+    except (TypeError, ValueError):
+        saved_at = None
+    match_score = (analysis or {}).get('match_score')
+    return (
+        folder_name,
+        person_name,
+        person_name.lower(),
+        saved_at,
+        match_score if isinstance(match_score, (int, float)) else None,
+        1 if metadata.get('has_job_description') else 0
+    )
+
+def write_manifest_records(conn, records, replace_all=False):
+    """Upsert (row, terms, minhash signature) manifest records and stamp the manifest with the current storage version"""
+    with conn:
+        if replace_all:
+            conn.execute('DELETE FROM persons')
+            conn.execute('DELETE FROM person_terms')
+            conn.execute('DELETE FROM person_minhash')
+            conn.execute('DELETE FROM lsh_buckets')
+        else:
+            conn.executemany('DELETE FROM lsh_buckets WHERE folder = ?', [(row[0],) for row, _, _ in records])
+            conn.executemany('DELETE FROM person_minhash WHERE folder = ?', [(row[0],) for row, _, _ in records])
+        conn.executemany('INSERT OR REPLACE INTO persons VALUES (?, ?, ?, ?, ?, ?)', [row for row, _, _ in records])
+        conn.executemany('INSERT OR REPLACE INTO person_terms VALUES (?, ?)', [(row[0], json.dumps(terms)) for row, terms, _ in records])
+        
+        # Near-duplicate index: the signature plus one LSH bucket per band
+        signed = [(row[0], signature) for row, _, signature in records if signature]
+        conn.executemany('INSERT OR REPLACE INTO person_minhash VALUES (?, ?)', [(folder, pack_minhash_signature(signature)) for folder, signature in signed])
+        conn.executemany('INSERT OR IGNORE INTO lsh_buckets VALUES (?, ?, ?)', [
+            (band, bucket, folder) for folder, signature in signed for band, bucket in get_lsh_buckets(signature)
+        ])
+        conn.execute("INSERT OR REPLACE INTO manifest_meta VALUES ('storage_version', ?)", (profile_repository.storage_version(),))
+        conn.execute("INSERT OR REPLACE INTO manifest_meta VALUES ('schema_version', ?)", (MANIFEST_SCHEMA_VERSION,))
+        # Bumped on every write so in-memory structures built from the manifest know to reload
+        generation = uuid.uuid4().hex
+        conn.execute("INSERT OR REPLACE INTO manifest_meta VALUES ('generation', ?)", (generation,))
+    return generation
+
+def get_manifest_generation(conn):
+    row = conn.execute("SELECT value FROM manifest_meta WHERE key = 'generation'").fetchone()
+    return row[0] if row else None
+
+def update_manifest(person_name, folder_name, metadata, analysis, scraped_data=None, resume_text=None):
+    """Record one saved profile in the manifest and patch the in-memory term index to match"""
+    signature = get_minhash_signature(resume_text or '', metadata.get('links'))
+    terms = get_profile_terms(analysis, scraped_data)
+    with manifest_lock:
+        conn = connect_manifest()
+        try:
+            # Write lock first, so no other process can change the manifest between this read and the write
+            conn.execute('BEGIN IMMEDIATE')
+            previous_generation = get_manifest_generation(conn)
+            previous_terms = conn.execute('SELECT terms FROM person_terms WHERE folder = ?', (folder_name,)).fetchone()
+            generation = write_manifest_records(conn, [(get_manifest_record(person_name, folder_name, metadata, analysis), terms, signature)])
+        finally:
+            conn.close()
+    update_term_index(previous_generation, generation, folder_name, person_name, json.loads(previous_terms[0]) if previous_terms else [], terms)
+
+def ensure_manifest_current(conn):
+    """Rebuild the manifest if profiles changed outside the app or it predates the current schema"""
+    meta = dict(conn.execute("SELECT key, value FROM manifest_meta WHERE key IN ('storage_version', 'schema_version')").fetchall())
+    if meta.get('storage_version') != profile_repository.storage_version() or meta.get('schema_version') != MANIFEST_SCHEMA_VERSION:
+        rebuild_manifest(conn)
+
+def rebuild_manifest(conn):
+    """Re-scan every saved profile into the manifest"""
+    records = []
+    for person in get_all_saved_persons():
+        try:
+            profile = profile_repository.load_profile(person['folder'], ('metadata', 'analysis', 'scraped_data', 'resume_text')) or {}
+        except Exception as e:
+            print(f"Error reading profile {person['folder']}: {e}")
+            profile = {}
+        records.append((
+            get_manifest_record(person['name'], person['folder'], profile.get('metadata') or person, profile.get('analysis') or {}),
+            get_profile_terms(profile.get('analysis'), profile.get('scraped_data')),
+            get_minhash_signature(profile.get('resume_text') or '', (profile.get('metadata') or {}).get('links'))
+        ))
+    write_manifest_records(conn, records, replace_all=True)
+    print(f"Rebuilt persons manifest with {len(records)} profiles")
+
+def encode_manifest_cursor(sort_key, folder):
+    """Opaque /api/persons cursor: the sort key and folder of the last row returned"""
+    return base64.urlsafe_b64encode(json.dumps([sort_key, folder]).encode('utf-8')).decode('ascii')
+
+def decode_manifest_cursor(cursor):
+    """(sort key, folder) from an /api/persons cursor; raises ValueError if it is malformed"""
+    try:
+        sort_key, folder = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(folder, str) or not isinstance(sort_key, (str, int, float)):
+        raise ValueError('Invalid cursor')
+    return sort_key, folder
+
+def query_manifest(q='', sort='saved_at', order='desc', cursor=None, per_page=100, has_job_description=None, min_score=None, include_total=False):
+    """One page of saved persons from the manifest, rebuilding it if profiles changed outside the app.
+    Keyset pagination on (sort key, folder): returns (persons, next cursor or None, total or None)"""
+    where, params = [], []
+    if q:
+        where.append("name_lower LIKE ? ESCAPE '\\'")
+        params.append('%' + re.sub(r'([%_\\])', r'\\\1', q.lower()) + '%')
+    if has_job_description is not None:
+        where.append('has_job_description = ?')
+        params.append(1 if has_job_description else 0)
+    if min_score is not None:
+        where.append('match_score >= ?')
+        params.append(min_score)
+    filter_sql = ('WHERE ' + ' AND '.join(where)) if where else ''
+    
+    sort_column = MANIFEST_SORT_COLUMNS.get(sort, MANIFEST_SORT_COLUMNS['saved_at'])
+    direction, comparison = ('ASC', '>') if order == 'asc' else ('DESC', '<')
+    page_where, page_params = list(where), list(params)
+    if cursor:
+        last_key, last_folder = decode_manifest_cursor(cursor)
+        # Written as a range on the sort key so SQLite seeks its index instead of merging two lookups and re-sorting
+        page_where.append(f'{sort_column} {comparison}= ? AND ({sort_column} {comparison} ? OR folder {comparison} ?)')
+        page_params.extend([last_key, last_key, last_folder])
+    page_sql = ('WHERE ' + ' AND '.join(page_where)) if page_where else ''
+    
+    with manifest_lock:
+        conn = connect_manifest()
+        try:
+            ensure_manifest_current(conn)
+            # Counting is O(matching rows), so only when asked for
+            total = conn.execute(f'SELECT COUNT(*) FROM persons {filter_sql}', params).fetchone()[0] if include_total else None
+            rows = conn.execute(
+                f'SELECT folder, name, saved_at, match_score, {sort_column} AS sort_key FROM persons {page_sql} '
+                f'ORDER BY {sort_column} {direction}, folder {direction} LIMIT ?',
+                page_params + [per_page + 1]
+            ).fetchall()
+        finally:
+            conn.close()
+    
+    next_cursor = encode_manifest_cursor(rows[per_page - 1]['sort_key'], rows[per_page - 1]['folder']) if len(rows) > per_page else None
+    persons = [{
+        'name': row['name'],
+        'folder': row['folder'],
+        'saved_at': repr(row['saved_at']) if row['saved_at'] is not None else None,
+        'match_score': row['match_score']
+    } for row in rows[:per_page]]
+    return persons, next_cursor, total
+
+# Near-duplicate detection: MinHash signatures of resume shingles + links, banded into an LSH index in the manifest
+MINHASH_NUM_PERM = 120
+MINHASH_BANDS = 20  # 20 bands x 6 rows: pairs at 0.8 similarity collide in some band >99% of the time
+MINHASH_SHINGLE_SIZE = 3  # Words per shingle
+MINHASH_MIN_SHINGLES = 20  # Shorter resumes are too small to compare reliably
+MINHASH_MASK = (1 << 64) - 1
+DUPLICATE_SIMILARITY_THRESHOLD = float(os.getenv('DUPLICATE_SIMILARITY_THRESHOLD', '0.8'))
+DUPLICATE_MAX_MATCHES = 5
+
+# Fixed seed so signatures stay comparable across restarts
+_minhash_rng = random.Random(1337)
+MINHASH_PARAMS = [(_minhash_rng.getrandbits(64) | 1, _minhash_rng.getrandbits(64)) for _ in range(MINHASH_NUM_PERM)]
+if NUMPY_AVAILABLE:
+    MINHASH_A = np.array([a for a, _ in MINHASH_PARAMS], dtype=np.uint64)[:, None]
+    MINHASH_B = np.array([b for _, b in MINHASH_PARAMS], dtype=np.uint64)[:, None]
+
+def get_duplicate_shingles(resume_text, links=None):
+    """Word shingles of a resume plus its canonical links, as 64-bit hashes"""
+    tokens = re.findall(r'[a-z0-9]+', (resume_text or '').lower())
+    shingles = {' '.join(tokens[i:i + MINHASH_SHINGLE_SIZE]) for i in range(max(0, len(tokens) - MINHASH_SHINGLE_SIZE + 1))}
+    if len(shingles) < MINHASH_MIN_SHINGLES:
+        return set()
+    for link in links or []:
+        try:
+            shingles.add('link:' + canonicalize_url(link))
+        except Exception:
+            continue
+    return {int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little') for shingle in shingles}
+
+def get_minhash_signature(resume_text, links=None):
+    """MinHash signature (MINHASH_NUM_PERM 32-bit values) of a resume, or None if it is too short"""
+    hashes = get_duplicate_shingles(resume_text, links)
+    if not hashes:
+        return None
+    # Multiply-shift hashing: top 32 bits of (a*x + b) mod 2^64
+    if NUMPY_AVAILABLE:
+        values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))[None, :]
+        return [int(v) for v in ((MINHASH_A * values + MINHASH_B) >> np.uint64(32)).min(axis=1)]
+    return [min(((a * x + b) & MINHASH_MASK) >> 32 for x in hashes) for a, b in MINHASH_PARAMS]
+
+def pack_minhash_signature(signature):
+    return struct.pack(f'<{len(signature)}I', *signature)
+
+def unpack_minhash_signature(blob):
+    return list(struct.unpack(f'<{len(blob) // 4}I', blob))
+
+def get_lsh_buckets(signature):
+    """(band, bucket) pairs of a signature; two signatures share a bucket when all rows of that band match"""
+    rows = len(signature) // MINHASH_BANDS
+    return [(
+        band,
+        int.from_bytes(hashlib.blake2b(pack_minhash_signature(signature[band * rows:(band + 1) * rows]), digest_size=8).digest(), 'little', signed=True)
+    ) for band in range(MINHASH_BANDS)]
+
+def get_minhash_similarity(signature_a, signature_b):
+    """Estimated Jaccard similarity: the fraction of matching signature slots"""
+    return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / len(signature_a)
+
+def find_near_duplicates(resume_text, links=None, threshold=None, exclude_folder=None):
+    """Saved profiles whose resume + links are near-duplicates of the given ones, best match first.
+    exclude_folder is the profile being saved, which would otherwise match itself on a re-upload."""
+    threshold = DUPLICATE_SIMILARITY_THRESHOLD if threshold is None else threshold
+    signature = get_minhash_signature(resume_text, links)
+    if not signature:
+        return []
+    
+    # One OR term per band so SQLite probes the (band, bucket) primary key instead of scanning
+    buckets = get_lsh_buckets(signature)
+    with manifest_lock:
+        conn = connect_manifest()
+        try:
+            ensure_manifest_current(conn)
+            rows = conn.execute(f"""
+                SELECT m.folder, m.signature, p.name FROM person_minhash m JOIN persons p ON p.folder = m.folder
+                WHERE m.folder IN (SELECT folder FROM lsh_buckets WHERE {' OR '.join(['(band = ? AND bucket = ?)'] * len(buckets))})
+            """, [value for bucket in buckets for value in bucket]).fetchall()
+        finally:
+            conn.close()
+    
+    matches = []
+    for row in rows:
+        if row['folder'] == exclude_folder:
+            continue
+        similarity = get_minhash_similarity(signature, unpack_minhash_signature(row['signature']))
+        if similarity >= threshold:
+            matches.append({'name': row['name'], 'folder': row['folder'], 'similarity': round(similarity, 3)})
+    matches.sort(key=lambda match: -match['similarity'])
+    return matches[:DUPLICATE_MAX_MATCHES]
+
+# Candidate term index, built from the manifest's canonical skill ids:
+# sorted candidate postings per skill for boolean filters (common skills also keep a Python int bitset),
+# plus a CSR candidate x term matrix for ranking
+RANK_MAX_SHORTLIST = 100
+RANK_MAX_NGRAM = 3
+RANK_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv('RANK_WORKERS', '4')))
+TERM_BITMAP_MIN_SHARE = 1 / 32  # Skills listed by at least this share of candidates get a prebuilt bitmap (never larger than their int32 postings)
+term_index = {'current': None}  # Swapped whole on rebuild, so readers never see a half-built index
+term_index_lock = threading.Lock()
+
+def get_term_count(state, term_id):
+    """Number of candidates listing a term"""
+    return state['posting_bounds'][term_id + 1] - state['posting_bounds'][term_id]
+
+def get_term_rows(state, term_id):
+    """Ascending candidate rows listing a term"""
+    return state['posting_rows'][state['posting_bounds'][term_id]:state['posting_bounds'][term_id + 1]]
+
+def rows_to_bitmap(term_rows, num_rows):
+    """Pack candidate row numbers into a Python int bitset (bit i = row i)"""
+    if NUMPY_AVAILABLE:
+        flags = np.zeros(num_rows, dtype=bool)
+        flags[np.asarray(term_rows, dtype=np.int64)] = True
+        return int.from_bytes(np.packbits(flags, bitorder='little').tobytes(), 'little')
+    # Assembled once in a bytearray; OR-ing bits into a growing int would be quadratic
+    bits = bytearray((num_rows + 7) // 8)
+    for row in term_rows:
+        bits[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(bits, 'little')
+
+def get_skill_bitmap(state, skill):
+    """Candidate bitmap of a canonical skill, or None if no candidate lists it"""
+    # Incremental updates can leave a skill in the vocabulary after its last candidate dropped it
+    if skill not in state['vocab'] or not get_term_count(state, state['vocab'][skill]):
+        return None
+    bitmap = state['bitmaps'].get(skill)
+    if bitmap is None:
+        bitmap = rows_to_bitmap(get_term_rows(state, state['vocab'][skill]), len(state['folders']))
+    return bitmap
+
+def load_term_index():
+    """Candidate term index, rebuilt from the manifest when it changes"""
+    with manifest_lock:
+        conn = connect_manifest()
+        try:
+            ensure_manifest_current(conn)
+            generation = get_manifest_generation(conn)
+            with term_index_lock:
+                current = term_index['current']
+                if current and current['generation'] == generation:
+                    return current
+            rows = conn.execute(
+                'SELECT persons.folder, persons.name, person_terms.terms FROM persons JOIN person_terms ON persons.folder = person_terms.folder ORDER BY persons.folder'
+            ).fetchall()
+        finally:
+            conn.close()
+    
+    # Stored term lists are already de-duplicated
+    vocab, folders, names, indptr, indices = {}, [], [], [0], []
+    for folder, name, terms in rows:
+        folders.append(folder)
+        names.append(name)
+        indices.extend([vocab.setdefault(term, len(vocab)) for term in json.loads(terms)])
+        indptr.append(len(indices))
+    terms = sorted(vocab, key=vocab.get)
+    
+    state = {
+        'generation': generation,
+        'folders': folders,
+        'names': names,
+        'rows': {folder: row for row, folder in enumerate(folders)},
+        'vocab': vocab,
+        'terms': terms
+    }
+    if NUMPY_AVAILABLE:
+        state['indptr'] = np.array(indptr, dtype=np.int64)
+        state['indices'] = np.array(indices, dtype=np.int32)
+        state['df'] = np.bincount(state['indices'], minlength=len(vocab)).astype(np.float32)
+        
+        # Group (term, row) pairs by term: a stable sort keeps each term's rows ascending
+        entry_rows = np.repeat(np.arange(len(rows), dtype=np.int32), np.diff(state['indptr']))
+        state['posting_rows'] = entry_rows[np.argsort(state['indices'], kind='stable')]
+        state['posting_bounds'] = np.concatenate(([0], np.cumsum(np.bincount(state['indices'], minlength=len(vocab))))).tolist()
+    else:
+        postings = [[] for _ in terms]
+        for row in range(len(rows)):
+            for term_id in indices[indptr[row]:indptr[row + 1]]:
+                postings[term_id].append(row)
+        state['posting_rows'] = [row for term_rows in postings for row in term_rows]
+        state['posting_bounds'] = [0]
+        for term_rows in postings:
+            state['posting_bounds'].append(state['posting_bounds'][-1] + len(term_rows))
+    
+    # Only common skills keep a bitmap; rare ones are packed from their postings when a query uses them
+    min_df = max(1, math.ceil(len(rows) * TERM_BITMAP_MIN_SHARE))
+    state['bitmaps'] = {
+        term: rows_to_bitmap(get_term_rows(state, term_id), len(rows))
+        for term_id, term in enumerate(terms)
+        if get_term_count(state, term_id) >= min_df
+    }
+    with term_index_lock:
+        term_index['current'] = state
+    return state
+
+def update_term_index(previous_generation, generation, folder_name, person_name, previous_terms, terms):
+    """Patch one candidate's terms into the loaded term index, instead of rebuilding it for every save.
+    Only applies when the index was built from the manifest as it was just before this write."""
+    with term_index_lock:
+        current = term_index['current']
+    if current is None or current['generation'] != previous_generation:
+        return
+    state = apply_term_index_update(current, generation, folder_name, person_name, previous_terms, terms)
+    with term_index_lock:
+        if term_index['current'] is current:
+            term_index['current'] = state
+
+def apply_term_index_update(state, generation, folder_name, person_name, previous_terms, terms):
+    """Copy of a term index with one candidate's terms replaced; a new candidate is appended as the last row"""
+    folders, names, rows = list(state['folders']), list(state['names']), state['rows']
+    vocab, term_list = dict(state['vocab']), list(state['terms'])
+    row = rows.get(folder_name)
+    is_new_row = row is None
+    if is_new_row:
+        row = len(folders)
+        folders.append(folder_name)
+        names.append(person_name)
+        rows = dict(rows)
+        rows[folder_name] = row
+    else:
+        names[row] = person_name
+    
+    old_ids = {vocab[term] for term in previous_terms if term in vocab} if not is_new_row else set()
+    new_ids = [vocab.setdefault(term, len(vocab)) for term in terms]
+    term_list.extend(sorted(set(vocab) - set(state['vocab']), key=vocab.get))
+    removed = sorted(old_ids - set(new_ids))
+    added = sorted(set(new_ids) - old_ids)
+    
+    # Splice the row out of / into each changed term's (ascending) posting segment
+    old_bounds = state['posting_bounds'] + [state['posting_bounds'][-1]] * (len(vocab) - len(state['vocab']))
+    posting_rows = state['posting_rows']
+    delete_positions = [bisect.bisect_left(posting_rows, row, old_bounds[t], old_bounds[t + 1]) for t in removed]
+    insert_positions = [bisect.bisect_left(posting_rows, row, old_bounds[t], old_bounds[t + 1]) for t in added]
+    # Insert positions are taken before the deletions; shift them past the entries deleted ahead of them
+    insert_positions = [p - bisect.bisect_left(delete_positions, p) for p in insert_positions]
+    if NUMPY_AVAILABLE:
+        posting_rows = np.insert(np.delete(posting_rows, delete_positions), insert_positions, row).astype(np.int32)
+    else:
+        posting_rows = list(posting_rows)
+        for position in reversed(delete_positions):
+            del posting_rows[position]
+        for position in reversed(insert_positions):
+            posting_rows.insert(position, row)
+    
+    change = [0] * len(vocab)
+    for t in removed:
+        change[t] -= 1
+    for t in added:
+        change[t] += 1
+    posting_bounds = [0]
+    running = 0
+    for t in range(len(vocab)):
+        running += change[t]
+        posting_bounds.append(old_bounds[t + 1] + running)
+    
+    # Prebuilt bitmaps flip one bit; skills that become common are packed on demand like any rare one
+    bitmaps = dict(state['bitmaps'])
+    for t in removed:
+        if term_list[t] in bitmaps:
+            bitmaps[term_list[t]] &= ~(1 << row)
+    for t in added:
+        if term_list[t] in bitmaps:
+            bitmaps[term_list[t]] |= 1 << row
+    
+    updated = dict(
+        state,
+        generation=generation,
+        folders=folders,
+        names=names,
+        rows=rows,
+        vocab=vocab,
+        terms=term_list,
+        posting_rows=posting_rows,
+        posting_bounds=posting_bounds,
+        bitmaps=bitmaps
+    )
+    if NUMPY_AVAILABLE:
+        start, end = (state['indptr'][row], state['indptr'][row + 1]) if not is_new_row else (state['indptr'][-1], state['indptr'][-1])
+        new_ids_array = np.array(new_ids, dtype=np.int32)
+        updated['indices'] = np.concatenate((state['indices'][:start], new_ids_array, state['indices'][end:]))
+        indptr = np.append(state['indptr'], state['indptr'][-1]) if is_new_row else state['indptr'].copy()
+        indptr[row + 1:] += len(new_ids) - (end - start)
+        updated['indptr'] = indptr
+        df = np.concatenate((state['df'], np.zeros(len(vocab) - len(state['vocab']), dtype=np.float32)))
+        df += np.array(change, dtype=np.float32)
+        updated['df'] = df
+    return updated
+
+def get_text_ngrams(text, max_n=RANK_MAX_NGRAM):
+    """Normalized 1..max_n word n-grams of a text, for matching multi-word skills"""
+    tokens = normalize_term(text).split()
+    return {' '.join(tokens[i:i + n]) for n in range(1, max_n + 1) for i in range(len(tokens) - n + 1)}
+
+def get_query_term_ids(state, job_description):
+    """Vocabulary ids of the canonical skills that appear (under any alias) in a job description"""
+    canonical_terms = {SKILL_ALIAS_LOOKUP.get(ngram, ngram) for ngram in get_text_ngrams(job_description)}
+    return sorted(state['vocab'][term] for term in canonical_terms if term in state['vocab'] and get_term_count(state, state['vocab'][term]))
+
+def parse_skill_query(query):
+    """Parse 'python AND (react OR vue) AND NOT java' into a nested tuple tree.
+    Runs of bare words form one skill ('machine learning'); quotes also group words."""
+    tokens = re.findall(r'\(|\)|"[^"]*"|[^\s()"]+', query)
+    position = 0
+    
+    def peek():
+        return tokens[position].upper() if position < len(tokens) else None
+    
+    def parse_or():
+        nonlocal position
+        node = parse_and()
+        while peek() == 'OR':
+            position += 1
+            node = ('or', node, parse_and())
+        return node
+    
+    def parse_and():
+        nonlocal position
+        node = parse_not()
+        while peek() == 'AND':
+            position += 1
+            node = ('and', node, parse_not())
+        return node
+    
+    def parse_not():
+        nonlocal position
+        if peek() == 'NOT':
+            position += 1
+            return ('not', parse_not())
+        return parse_atom()
+    
+    def parse_atom():
+        nonlocal position
+        token = peek()
+        if token is None:
+            raise ValueError('Query ended unexpectedly')
+        if token == '(':
+            position += 1
+            node = parse_or()
+            if peek() != ')':
+                raise ValueError('Missing closing parenthesis')
+            position += 1
+            return node
+        if token == ')' or token in ('AND', 'OR', 'NOT'):
+            raise ValueError(f"Unexpected '{tokens[position]}'")
+        if tokens[position].startswith('"'):
+            position += 1
+            return ('skill', tokens[position - 1].strip('"'))
+        words = []
+        while peek() is not None and peek() not in ('(', ')', 'AND', 'OR', 'NOT') and not tokens[position].startswith('"'):
+            words.append(tokens[position])
+            position += 1
+        return ('skill', ' '.join(words))
+    
+    node = parse_or()
+    if position != len(tokens):
+        raise ValueError(f"Unexpected '{tokens[position]}'")
+    return node
+
+def evaluate_skill_query(node, state, unknown_skills):
+    """Evaluate a parsed skill query to a candidate bitmap"""
+    kind = node[0]
+    if kind == 'skill':
+        skill = canonicalize_skill(node[1])
+        bitmap = get_skill_bitmap(state, skill)
+        if bitmap is None:
+            unknown_skills.append(skill)
+        return bitmap or 0
+    if kind == 'not':
+        return ((1 << len(state['folders'])) - 1) & ~evaluate_skill_query(node[1], state, unknown_skills)
+    left = evaluate_skill_query(node[1], state, unknown_skills)
+    right = evaluate_skill_query(node[2], state, unknown_skills)
+    return left & right if kind == 'and' else left | right
+
+def iterate_bitmap(bitmap, limit=None):
+    """Row numbers set in a bitmap, lowest first"""
+    count = 0
+    while bitmap and (limit is None or count < limit):
+        lowest = bitmap & -bitmap
+        yield lowest.bit_length() - 1
+        bitmap ^= lowest
+        count += 1
+
+def filter_candidates_by_skills(query, limit=100):
+    """Candidates matching a boolean skill query, returns (count, candidates, unknown skills)"""
+    state = load_term_index()
+    unknown_skills = []
+    bitmap = evaluate_skill_query(parse_skill_query(query), state, unknown_skills)
+    candidates = [{'name': state['names'][row], 'folder': state['folders'][row]} for row in iterate_bitmap(bitmap, limit)]
+    return bitmap.bit_count(), candidates, sorted(set(unknown_skills))
+
+def prefilter_candidates(job_description, top_k=20):
+    """Score every candidate by IDF-weighted coverage of the JD's terms, return the top_k"""
+    state = load_term_index()
+    num_candidates = len(state['folders'])
+    query_ids = get_query_term_ids(state, job_description)
+    if not num_candidates or not query_ids:
+        return [], num_candidates, []
+    if not NUMPY_AVAILABLE:
+        return prefilter_candidates_from_postings(state, query_ids, top_k), num_candidates, [state['terms'][term_id] for term_id in query_ids]
+    
+    # Rare skills count more than ones everybody lists
+    weights = np.zeros(len(state['vocab']), dtype=np.float32)
+    weights[query_ids] = np.log1p(num_candidates / state['df'][query_ids])
+    
+    # Row sums of the CSR matrix against the weight vector, via a cumulative sum over the stored entries
+    cumulative = np.concatenate(([0.0], np.cumsum(weights[state['indices']], dtype=np.float64)))
+    scores = (cumulative[state['indptr'][1:]] - cumulative[state['indptr'][:-1]]) / weights.sum()
+    
+    top_k = min(top_k, num_candidates)
+    best = np.argpartition(-scores, top_k - 1)[:top_k]
+    best = best[np.argsort(-scores[best], kind='stable')]
+    query_set = set(query_ids)
+    shortlist = []
+    for row in best:
+        if scores[row] <= 0:
+            break
+        row_ids = state['indices'][state['indptr'][row]:state['indptr'][row + 1]]
+        shortlist.append({
+            'name': state['names'][row],
+            'folder': state['folders'][row],
+            'prefilter_score': round(float(scores[row]), 4),
+            'matched_terms': [state['terms'][term_id] for term_id in row_ids if term_id in query_set]
+        })
+    return shortlist, num_candidates, [state['terms'][term_id] for term_id in query_ids]
+
+def prefilter_candidates_from_postings(state, query_ids, top_k):
+    """prefilter_candidates without NumPy: walk the query terms' postings instead of the whole matrix"""
+    num_candidates = len(state['folders'])
+    weights = {term_id: math.log1p(num_candidates / get_term_count(state, term_id)) for term_id in query_ids}
+    total_weight = sum(weights.values())
+    scores, matched = {}, {}
+    for term_id in query_ids:
+        for row in get_term_rows(state, term_id):
+            scores[row] = scores.get(row, 0.0) + weights[term_id]
+            matched.setdefault(row, []).append(state['terms'][term_id])
+    return [{
+        'name': state['names'][row],
+        'folder': state['folders'][row],
+        'prefilter_score': round(scores[row] / total_weight, 4),
+        'matched_terms': matched[row]
+    } for row in heapq.nsmallest(top_k, scores, key=lambda row: (-scores[row], row))]
+
+@app.cli.command('migrate-profiles')
+@click.option('--source', 'source_backend', type=click.Choice(['file', 'sqlite']), default='file', help='Backend to read from')
+@click.option('--target', 'target_backend', type=click.Choice(['file', 'sqlite']), default='sqlite', help='Backend to write to')
+def migrate_profiles_command(source_backend, target_backend):
+    """Copy every saved profile from one storage backend to the other"""
+    if source_backend == target_backend:
+        raise click.ClickException('Source and target backends must differ')
+    source = create_profile_repository(source_backend)
+    target = create_profile_repository(target_backend)
+    
+    migrated, failed = 0, 0
+    for person in source.list_profiles():
+        try:
+            # Same lock save_profile_data takes, so a save during the migration can't interleave with the copy
+            with profile_lock(person['folder']):
+                profile = source.load_profile(person['folder'])
+                if profile is None:
+                    continue
+                profile['person_name'] = person['name']
+                target.save_profile(person['folder'], profile, source.get_resume_file(person['folder']))
+                for record in source.list_analysis_versions(person['folder']):
+                    target.save_analysis_version(person['folder'], record['job_description_hash'], record)
+            migrated += 1
+        except Exception as e:
+            print(f"Error migrating {person['folder']}: {e}")
+            failed += 1
+    print(f"Migrated {migrated} profiles from {source_backend} to {target_backend} ({failed} failed)")
+    print(f"Set PROFILE_STORAGE_BACKEND={target_backend} to use the migrated data")
+
+@app.cli.command('compact-profiles')
+def compact_profiles_command():
+    """Rewrite stored profiles with the current compact/compressed encoding, moving inline resumes to the blob store"""
+    rewritten = 0
+    for person in profile_repository.list_profiles():
+        with profile_lock(person['folder']):
+            profile = profile_repository.load_profile(person['folder'])
+            if profile is None:
+                continue
+            profile['person_name'] = person['name']
+            profile_repository.save_profile(person['folder'], profile, profile_repository.get_resume_file(person['folder']))
+            rewritten += 1
+    print(f"Rewrote {rewritten} profiles with {PROFILE_COMPRESSION} compression")
+
+@app.cli.command('gc-resume-blobs')
+@click.option('--grace-seconds', default=RESUME_BLOB_GC_GRACE_SECONDS, help='Keep unreferenced blobs younger than this')
+@click.option('--dry-run', is_flag=True, help='Report what would be deleted without deleting it')
+def gc_resume_blobs_command(grace_seconds, dry_run):
+    """Delete resume blobs no saved candidate references"""
+    live_folders = {person['folder'] for person in profile_repository.list_profiles()}
+    stats = resume_blobs.collect_garbage(live_folders, grace_seconds, dry_run)
+    print(f"{'Would delete' if dry_run else 'Deleted'} {stats['deleted_blobs']} blobs and {stats['orphan_files']} orphan files "
+          f"({stats['freed_bytes'] / 1024 / 1024:.1f} MiB), dropped {stats['stale_references']} stale references")
+    totals = resume_blobs.stats()
+    print(f"Blob store: {totals['blobs']} blobs, {totals['stored_bytes'] / 1024 / 1024:.1f} MiB, {totals['references']} references")
+
+def get_path_size(path):
+    """Total size in bytes of a file or directory tree"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(dirpath, filename)) for filename in filenames)
+    return total
+
+@app.cli.command('bench-storage')
+@click.option('--count', default=500, help='Number of synthetic profiles to save and load')
+@click.option('--workers', default=8, help='Threads used for the concurrent load pass')
+def bench_storage_command(count, workers):
+    """Compare save/load throughput of the file and SQLite storage backends"""
+    record = {
+        'resume_text': 'Experienced engineer. ' * 250,
+        'analysis': {'summary': 'Summary. ' * 100, 'skills': ['Python', 'SQL', 'React'] * 10, 'match_score': 72},
+        'scraped_data': {'github': {'repositories': [{'name': f'repo-{i}', 'description': 'A project. ' * 10, 'language': 'Python'} for i in range(60)]}},
+        'job_description': 'We are hiring. ' * 100
+    }
+    bench_dir = tempfile.mkdtemp(prefix='hiregem-bench-')
+    try:
+        for backend in ('file', 'sqlite'):
+            if backend == 'file':
+                repository, storage_path = FileProfileRepository(os.path.join(bench_dir, 'files')), os.path.join(bench_dir, 'files')
+            else:
+                storage_path = os.path.join(bench_dir, 'sqlite')
+                repository = SqliteProfileRepository(os.path.join(storage_path, 'profiles.sqlite'))
+            folders = [f'candidate-{i}' for i in range(count)]
+            
+            started_at = time.perf_counter()
+            for folder in folders:
+                metadata = {'person_name': folder, 'folder_name': folder, 'saved_at': str(time.time())}
+                repository.save_profile(folder, dict(record, person_name=folder, metadata=metadata))
+            save_seconds = time.perf_counter() - started_at
+            
+            started_at = time.perf_counter()
+            for folder in folders:
+                repository.load_profile(folder)
+            load_seconds = time.perf_counter() - started_at
+            
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                started_at = time.perf_counter()
+                list(executor.map(repository.load_profile, folders))
+                concurrent_seconds = time.perf_counter() - started_at
+            
+            print(f"{backend:>6}: save {count / save_seconds:8.0f}/s  load {count / load_seconds:8.0f}/s  "
+                  f"load x{workers} threads {count / concurrent_seconds:8.0f}/s  disk {get_path_size(storage_path) / 1024 / 1024:.1f} MiB")
+    finally:
+        shutil.rmtree(bench_dir, ignore_errors=True)
+
+# Structured job requirements, parsed once per JD content hash and shared by every candidate analysis
+JOB_REQUIREMENTS_VERSION = 1  # Bump when the extraction prompt changes to invalidate cached entries
+JOB_REQUIREMENTS_CACHE_MAX_ENTRIES = 256
+JOB_REQUIREMENTS_SENIORITY_LEVELS = ('intern', 'junior', 'mid', 'senior', 'lead', 'principal', 'executive', 'unspecified')
+
+job_requirements_cache = OrderedDict()  # JD hash -> requirements dict
+job_requirements_lock = threading.Lock()
+job_requirements_inflight = {}  # JD hash -> Lock, so concurrent analyses of one JD only call Gemini once
+
+def get_job_requirements_path(job_description_hash):
+    """Path of the on-disk entry for a JD's structured requirements"""
+    return os.path.join(JOB_DESCRIPTION_CACHE_DIR, f'{job_description_hash}.json')
+
+def get_cached_job_requirements(job_description_hash):
+    """Look up parsed requirements in memory, then on disk"""
+    with job_requirements_lock:
+        if job_description_hash in job_requirements_cache:
+            job_requirements_cache.move_to_end(job_description_hash)
+            return job_requirements_cache[job_description_hash]
+    
+    cache_path = get_job_requirements_path(job_description_hash)
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                requirements = json.load(f)
+            if requirements.get('version') == JOB_REQUIREMENTS_VERSION:
+                remember_job_requirements(job_description_hash, requirements)
+                return requirements
+        except Exception as e:
+            print(f"Error reading job description cache: {e}")
+    return None
+
+def remember_job_requirements(job_description_hash, requirements):
+    """Keep parsed requirements in the bounded in-memory LRU"""
+    with job_requirements_lock:
+        job_requirements_cache[job_description_hash] = requirements
+        job_requirements_cache.move_to_end(job_description_hash)
+        while len(job_requirements_cache) > JOB_REQUIREMENTS_CACHE_MAX_ENTRIES:
+            job_requirements_cache.popitem(last=False)
+
+def normalize_job_requirements(parsed):
+    """Coerce Gemini's requirements JSON into a fixed shape with canonical skill ids"""
+    def skill_list(values):
+        skills = []
+        for value in values if isinstance(values, list) else []:
+            skill = canonicalize_skill(str(value))
+            if skill and skill not in skills:
+                skills.append(skill)
+        return skills[:25]
+    
+    must_have = skill_list(parsed.get('must_have_skills'))
+    nice_to_have = [skill for skill in skill_list(parsed.get('nice_to_have_skills')) if skill not in must_have]
+    seniority = str(parsed.get('seniority') or '').strip().lower()
+    try:
+        min_years = max(0, int(parsed.get('min_years_experience') or 0))
+    except (TypeError, ValueError):
+        min_years = 0
+    return {
+        'title': str(parsed.get('title') or '').strip()[:120],
+        'seniority': seniority if seniority in JOB_REQUIREMENTS_SENIORITY_LEVELS else 'unspecified',
+        'domain': str(parsed.get('domain') or '').strip()[:80],
+        'min_years_experience': min_years,
+        'must_have_skills': must_have,
+        'nice_to_have_skills': nice_to_have,
+        'responsibilities': [str(item).strip()[:160] for item in (parsed.get('responsibilities') or [])[:5] if str(item).strip()]
+    }
+
+def extract_job_requirements(job_description):
+    """Ask Gemini for the structured requirements of a job description"""
+    prompt = f"""Extract the hiring requirements from the following job description.
+
+JOB DESCRIPTION:
+{job_description[:6000]}
+
+Return a JSON object with the following structure:
+{{
+    "title": "Role title",
+    "seniority": one of {list(JOB_REQUIREMENTS_SENIORITY_LEVELS)},
+    "domain": "Industry or product domain (e.g., fintech, healthcare, developer tools)",
+    "min_years_experience": number (0 if not stated),
+    "must_have_skills": ["skill1", "skill2", ...],
+    "nice_to_have_skills": ["skill1", "skill2", ...],
+    "responsibilities": ["Main responsibility 1", "Main responsibility 2", "Main responsibility 3"]
+}}
+
+Use short skill names (e.g., "Python", "Kubernetes", "React"). Return ONLY valid JSON, no markdown formatting or additional text."""
+    
+    response = model.generate_content(prompt)
+    ai_text = response.text.strip()
+    if ai_text.startswith('```'):
+        ai_text = ai_text.split('```')[1]
+        if ai_text.startswith('json'):
+            ai_text = ai_text[4:]
+    return normalize_job_requirements(json.loads(ai_text.strip()))
+
+def get_job_requirements(job_description):
+    """Structured requirements for a JD, parsed once per content hash. Returns (requirements, cached);
+    requirements is None when the JD could not be parsed."""
+    job_description_hash = get_job_description_hash(job_description)
+    requirements = get_cached_job_requirements(job_description_hash)
+    if requirements:
+        return requirements, True
+    
+    with job_requirements_lock:
+        inflight_lock = job_requirements_inflight.setdefault(job_description_hash, threading.Lock())
+    with inflight_lock:
+        try:
+            # Another request may have parsed the same JD while we waited
+            requirements = get_cached_job_requirements(job_description_hash)
+            if requirements:
+                return requirements, True
+            try:
+                requirements = extract_job_requirements(job_description)
+            except Exception as e:
+                print(f"Error analyzing job description: {e}")
+                return None, False
+            
+            requirements = dict(requirements, version=JOB_REQUIREMENTS_VERSION, job_description_hash=job_description_hash, created_at=time.time())
+            remember_job_requirements(job_description_hash, requirements)
+            try:
+                write_file_atomic(get_job_requirements_path(job_description_hash), json.dumps(requirements, ensure_ascii=False).encode('utf-8'))
+            except Exception as e:
+                print(f"Error writing job description cache: {e}")
+            return requirements, False
+        finally:
+            with job_requirements_lock:
+                job_requirements_inflight.pop(job_description_hash, None)
+
+def format_job_requirements(requirements):
+    """Compact prompt form of structured job requirements"""
+    lines = []
+    if requirements.get('title'):
+        lines.append(f"Role: {requirements['title']}")
+    lines.append(f"Seniority: {requirements.get('seniority', 'unspecified')}")
+    if requirements.get('domain'):
+        lines.append(f"Domain: {requirements['domain']}")
+    if requirements.get('min_years_experience'):
+        lines.append(f"Minimum experience: {requirements['min_years_experience']} years")
+    lines.append(f"Must-have skills: {', '.join(requirements.get('must_have_skills') or []) or 'none stated'}")
+    lines.append(f"Nice-to-have skills: {', '.join(requirements.get('nice_to_have_skills') or []) or 'none stated'}")
+    if requirements.get('responsibilities'):
+        lines.append(f"Responsibilities: {'; '.join(requirements['responsibilities'])}")
+    return '\n'.join(lines)
+
+def generate_profile_summary(cv_text, scraped_data, job_description=None, job_requirements=None):
+    """Generate a comprehensive profile summary with match analysis using Gemini AI"""
+    try:
+        # Prepare the prompt
+        if job_description and job_description.strip():
+            # Job description provided - do match analysis against its cached structured requirements
+            if job_requirements is None:
+                job_requirements, _ = get_job_requirements(job_description)
+            if job_requirements:
+                job_section = f"""JOB REQUIREMENTS:
+{format_job_requirements(job_requirements)}
+
+Score must-have skills first, then seniority and domain fit, then nice-to-have skills, so scores are comparable across candidates for this role."""
+            else:
+                job_section = f"""JOB DESCRIPTION:
+{job_description[:2000]}"""
+            prompt = f"""Analyze the following professional profile against the job requirements and provide a comprehensive analysis.
+
+{job_section}
+
+CV/RESUME CONTENT:
+{cv_text[:3000]}
+
+SCRAPED PROFILE DATA (from GitHub, LinkedIn, DevPost, Kaggle, etc.):
+{json.dumps(scraped_data, indent=2)[:4000]}
+
+Please analyze and return a JSON object with the following structure:
+{{
+    "match_score": number (0-100, representing how well the profile matches the job),
     "summary": "A comprehensive 2-3 paragraph summary of the candidate's profile",
     "strengths": [
         "Unique strength 1 (e.g., specific projects, achievements, skills from links)",
@@ -1456,7 +3921,7 @@ Please analyze and return a JSON object with the following structure:
         "Unique strength 3"
     ],
     "weaknesses": [
-        "Area of improvement 1",
+        "Area of improvement 1 (missing skills, experience gaps, etc.)",
         "Area of improvement 2"
     ],
     "key_points": [
@@ -1469,20 +3934,63 @@ Please analyze and return a JSON object with the following structure:
         "Unique thing from resume or links 2",
         "Unique thing from resume or links 3"
     ],
-    "skills": ["skill1", "skill2", ...],
+    "skills_match": {{
+        "matched_skills": ["skill1", "skill2", ...],
+        "missing_skills": ["skill1", "skill2", ...]
+    }},
     "recommendations": [
-        "Recommendation 1 for professional growth",
+        "Recommendation 1 to improve match",
         "Recommendation 2"
     ]
 }}
 
 Return ONLY valid JSON, no markdown formatting or additional text."""
+        else:
+            # No job description - general profile summary
+            prompt = f"""Analyze the following professional profile information and create a comprehensive, well-structured summary.
 
-        response = model.generate_content(prompt)
-        ai_text = response.text.strip()
-        
-        # Clean the response
-        if ai_text.startswith('```'):
+CV/Resume Content:
+{cv_text[:3000]}
+
+Scraped Profile Data:
+{json.dumps(scraped_data, indent=2)[:4000]}
+
+Please analyze and return a JSON object with the following structure:
+{{
+    "summary": "A comprehensive 2-3 paragraph summary of the candidate's profile",
+    "strengths": [
+        "Unique strength 1 (e.g., specific projects, achievements, skills from links)",
+        "Unique strength 2",
+        "Unique strength 3"
+    ],
+    "weaknesses": [
+        "Area of improvement 1",
+        "Area of improvement 2"
+    ],
+    "key_points": [
+        "Key point 1 about the candidate",
+        "Key point 2",
+        "Key point 3"
+    ],
+    "unique_highlights": [
+        "Unique thing from resume or links 1",
+        "Unique thing from resume or links 2",
+        "Unique thing from resume or links 3"
+    ],
+    "skills": ["skill1", "skill2", ...],
+    "recommendations": [
+        "Recommendation 1 for professional growth",
+        "Recommendation 2"
+    ]
+}}
+
+Return ONLY valid JSON, no markdown formatting or additional text."""
+
+        response = model.generate_content(prompt)
+        ai_text = response.text.strip()
+        
+        # Clean the response
+        if ai_text.startswith('```'):
             ai_text = ai_text.split('```')[1]
             if ai_text.startswith('json'):
                 ai_text = ai_text[4:]
@@ -1519,135 +4027,1316 @@ def chat():
 
 @app.route('/api/persons', methods=['GET'])
 def get_persons():
-    """Get list of all saved persons"""
-    persons = get_all_saved_persons()
-    return jsonify({'success': True, 'persons': persons})
+    """Get a page of saved persons (?q=&sort=name|saved_at|match_score&order=&per_page=&cursor=&include_total=)
+    Pass the previous response's next_cursor to get the following page."""
+    try:
+        per_page = min(MANIFEST_MAX_PER_PAGE, max(1, int(request.args.get('per_page', 100))))
+        min_score = request.args.get('min_score')
+        min_score = float(min_score) if min_score not in (None, '') else None
+    except ValueError:
+        return jsonify({'error': 'per_page and min_score must be numbers'}), 400
+    
+    has_job_description = request.args.get('has_job_description')
+    if has_job_description not in (None, ''):
+        has_job_description = has_job_description.lower() in ('1', 'true', 'yes')
+    else:
+        has_job_description = None
+    
+    sort = request.args.get('sort', 'saved_at')
+    if sort not in MANIFEST_SORT_COLUMNS:
+        return jsonify({'error': f"sort must be one of: {', '.join(MANIFEST_SORT_COLUMNS)}"}), 400
+    order = request.args.get('order', 'asc' if sort == 'name' else 'desc').lower()
+    
+    include_total = request.args.get('include_total', '').lower() in ('1', 'true', 'yes')
+    
+    try:
+        persons, next_cursor, total = query_manifest(
+            q=request.args.get('q', '').strip(),
+            sort=sort,
+            order=order,
+            cursor=request.args.get('cursor') or None,
+            per_page=per_page,
+            has_job_description=has_job_description,
+            min_score=min_score,
+            include_total=include_total
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error querying persons manifest: {e}")
+        return jsonify({'error': f'Error listing persons: {str(e)}'}), 500
+    
+    response = {'success': True, 'persons': persons, 'per_page': per_page, 'next_cursor': next_cursor}
+    if include_total:
+        response['total'] = total
+    return jsonify(response)
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit rate and size of the in-memory profile cache"""
+    return jsonify({'success': True, 'profile_cache': get_profile_cache_stats()})
+
+@app.route('/api/skills', methods=['GET'])
+def list_skills():
+    """Canonical skills across all candidates with candidate counts (?limit=)"""
+    limit = max(1, min(request.args.get('limit', 100, type=int), 5000))
+    state = load_term_index()
+    counts = sorted(((skill, get_term_count(state, term_id)) for term_id, skill in enumerate(state['terms'])), key=lambda item: (-item[1], item[0]))
+    return jsonify({
+        'success': True,
+        'total_skills': len(counts),
+        'skills': [{'skill': skill, 'candidates': count} for skill, count in counts[:limit]]
+    })
+
+@app.route('/api/skills/filter', methods=['GET'])
+def filter_by_skills():
+    """Candidates matching a boolean skill query, e.g. ?q=python AND (react OR vue) AND NOT java"""
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 100, type=int), MANIFEST_MAX_PER_PAGE))
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+    
+    started_at = time.time()
+    try:
+        count, candidates, unknown_skills = filter_candidates_by_skills(query, limit)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid skill query: {e}'}), 400
+    
+    return jsonify({
+        'success': True,
+        'query': query,
+        'count': count,
+        'candidates': candidates,
+        'unknown_skills': unknown_skills,
+        'elapsed_ms': round((time.time() - started_at) * 1000, 2)
+    })
+
+@app.route('/api/search', methods=['GET'])
+def search_persons():
+    """Search all saved candidates (e.g. 'shipped a Flutter app, Kaggle medals')"""
+    query = request.args.get('q', '').strip()
+    top_k = request.args.get('k', 10, type=int)
+    
+    if not query:
+        return jsonify({'error': 'Query parameter q is required'}), 400
+    ensure_vector_index()
+    
+    started_at = time.time()
+    results = search_candidates(query, max(1, min(top_k, 100)))
+    return jsonify({
+        'success': True,
+        'results': results,
+        'took_ms': round((time.time() - started_at) * 1000, 2)
+    })
+
+RESPONSE_COMPRESSION_MIN_BYTES = 1024
+
+def choose_response_encoding():
+    """Best compression the client accepts: br (if brotli is installed), gzip or None"""
+    if BROTLI_AVAILABLE and request.accept_encodings['br']:
+        return 'br'
+    if request.accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+def compress_response_body(body, encoding):
+    """Compress a response body for the given Content-Encoding"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
 
-@app.route('/api/load-person', methods=['POST'])
+@app.route('/api/load-person', methods=['GET', 'POST'])
 def load_person():
-    """Load profile data for a specific person"""
-    data = request.json
-    person_name = data.get('person_name', '').strip()
+    """Load profile data for a specific person (GET supports ?fields= and If-None-Match)"""
+    if request.method == 'POST':
+        data = request.json or {}
+        person_name = data.get('person_name', '').strip()
+        fields = data.get('fields')
+    else:
+        person_name = request.args.get('person_name', '').strip()
+        fields = request.args.get('fields')
     
     if not person_name:
         return jsonify({'error': 'Person name is required'}), 400
     
-    profile_data = load_profile_data(person_name)
+    # Field selector: "fields=metadata,analysis" (or a list in the POST body)
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    fields = list(fields or PROFILE_FIELDS)
+    unknown_fields = [field for field in fields if field not in PROFILE_FIELDS]
+    if unknown_fields:
+        return jsonify({'error': f"Unknown fields: {', '.join(unknown_fields)}. Available: {', '.join(PROFILE_FIELDS)}"}), 400
     
-    if not profile_data:
+    folder_name = sanitize_folder_name(person_name)
+    version = profile_repository.profile_version(folder_name)
+    if version is None:
         return jsonify({'error': f'No data found for {person_name}'}), 404
     
-    return jsonify({'success': True, 'data': profile_data})
+    # Strong ETag per profile version and field selection, suffixed with the content encoding
+    encoding = choose_response_encoding()
+    identity_etag = hashlib.sha256(json.dumps([folder_name, version, sorted(fields)]).encode('utf-8')).hexdigest()[:32]
+    etag = f"{identity_etag}-{encoding}" if encoding else identity_etag
+    
+    if request.method == 'GET' and (request.if_none_match.contains(etag) or request.if_none_match.contains(identity_etag)):
+        # The client's copy is current; skip loading the profile entirely
+        if not request.if_none_match.contains(etag):
+            etag = identity_etag
+        response = app.response_class(status=304)
+    else:
+        profile_data = load_profile_data(person_name, fields=fields)
+        if not profile_data:
+            return jsonify({'error': f'No data found for {person_name}'}), 404
+        
+        body = app.json.dumps({'success': True, 'data': profile_data}).encode('utf-8')
+        response = app.response_class(body, mimetype='application/json')
+        if encoding and len(body) >= RESPONSE_COMPRESSION_MIN_BYTES:
+            response.set_data(compress_response_body(body, encoding))
+            response.headers['Content-Encoding'] = encoding
+        else:
+            etag = identity_etag
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+# Bulk export: walks the manifest in saved_at order, one page of profiles in memory at a time
+EXPORT_FORMATS = ('ndjson', 'csv', 'parquet')
+EXPORT_PAGE_SIZE = 200
+EXPORT_JSON_FIELDS = ('analysis', 'scraped_data', 'metadata')  # Nested fields, serialized as JSON strings in CSV/Parquet
+
+def parse_export_since(value):
+    """Epoch seconds or an ISO 8601 date/time for the since= filter"""
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+        return parsed.timestamp()
+
+def iterate_manifest_pages(since=None, page_size=EXPORT_PAGE_SIZE):
+    """Pages of (folder, name, saved_at) saved after `since`, oldest first, using keyset pagination"""
+    with manifest_lock:
+        conn = connect_manifest()
+        try:
+            ensure_manifest_current(conn)
+        finally:
+            conn.close()
+    
+    last_saved_at, last_folder = (since, '\uffff') if since is not None else (-1.0, '')
+    while True:
+        with manifest_lock:
+            conn = connect_manifest()
+            try:
+                rows = conn.execute('''
+                    SELECT folder, name, saved_at FROM persons
+                    WHERE COALESCE(saved_at, 0) >= ? AND (COALESCE(saved_at, 0) > ? OR folder > ?)
+                    ORDER BY COALESCE(saved_at, 0), folder LIMIT ?
+                ''', (last_saved_at, last_saved_at, last_folder, page_size)).fetchall()
+            finally:
+                conn.close()
+        if not rows:
+            return
+        yield [(row['folder'], row['name'], row['saved_at']) for row in rows]
+        last_saved_at, last_folder = rows[-1]['saved_at'] or 0, rows[-1]['folder']
+
+def iterate_export_records(since=None, fields=PROFILE_FIELDS):
+    """Lists of export records (folder, person_name, saved_at + the selected fields), one manifest page at a time"""
+    for page in iterate_manifest_pages(since):
+        records = []
+        for folder, name, saved_at in page:
+            try:
+                # Read straight from storage so an export doesn't flush the hot profile cache
+                profile = profile_repository.load_profile(folder, list(fields)) or {}
+            except Exception as e:
+                print(f"Error exporting profile {folder}: {e}")
+                continue
+            record = {'folder': folder, 'person_name': name, 'saved_at': saved_at}
+            record.update((field, profile.get(field)) for field in fields)
+            records.append(record)
+        yield records
+
+def flatten_export_record(record, fields):
+    """Column values of a record for tabular formats"""
+    values = [record['folder'], record['person_name'], record['saved_at']]
+    for field in fields:
+        value = record.get(field)
+        values.append(json.dumps(value, ensure_ascii=False) if field in EXPORT_JSON_FIELDS and value is not None else value)
+    return values
+
+def generate_export_chunks(export_format='ndjson', since=None, fields=PROFILE_FIELDS, compress=False):
+    """Encoded NDJSON/CSV export, one chunk per manifest page, optionally gzip-compressed on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits=31: gzip container
+    
+    def encode(text):
+        data = text.encode('utf-8')
+        return compressor.compress(data) if compressor else data
+    
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['folder', 'person_name', 'saved_at'] + list(fields))
+        for records in iterate_export_records(since, fields):
+            writer.writerows(flatten_export_record(record, fields) for record in records)
+            chunk = encode(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+            if chunk:
+                yield chunk
+        chunk = encode(buffer.getvalue())
+        if chunk:
+            yield chunk
+    else:
+        for records in iterate_export_records(since, fields):
+            chunk = encode(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+            if chunk:
+                yield chunk
+    
+    if compressor:
+        yield compressor.flush()
+
+def write_parquet_export(path, since=None, fields=PROFILE_FIELDS):
+    """Write the export as a Parquet file, one row group per manifest page. Returns the number of rows."""
+    columns = ['folder', 'person_name', 'saved_at'] + list(fields)
+    schema = pyarrow.schema([(column, pyarrow.float64() if column == 'saved_at' else pyarrow.string()) for column in columns])
+    count = 0
+    with pyarrow.parquet.ParquetWriter(path, schema, compression='zstd') as writer:
+        for records in iterate_export_records(since, fields):
+            if records:
+                rows = [flatten_export_record(record, fields) for record in records]
+                writer.write_table(pyarrow.Table.from_pylist([dict(zip(columns, row)) for row in rows], schema=schema))
+                count += len(rows)
+    return count
+
+def parse_export_fields(fields):
+    """Field list from "fields=a,b"; returns (fields, error)"""
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    fields = list(fields or PROFILE_FIELDS)
+    unknown_fields = [field for field in fields if field not in PROFILE_FIELDS]
+    if unknown_fields:
+        return None, f"Unknown fields: {', '.join(unknown_fields)}. Available: {', '.join(PROFILE_FIELDS)}"
+    return fields, None
+
+@app.route('/api/export', methods=['GET'])
+def export_profiles():
+    """Stream every saved profile as NDJSON or CSV (?format=&since=&fields=&gzip=1)"""
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv (Parquet is available from the export-profiles command)'}), 400
+    fields, error = parse_export_fields(request.args.get('fields'))
+    if error:
+        return jsonify({'error': error}), 400
+    try:
+        since = parse_export_since(request.args.get('since'))
+    except ValueError:
+        return jsonify({'error': 'since must be epoch seconds or an ISO 8601 date'}), 400
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+    
+    filename = f"profiles.{export_format}" + ('.gz' if compress else '')
+    mimetype = 'application/gzip' if compress else ('text/csv' if export_format == 'csv' else 'application/x-ndjson')
+    response = app.response_class(generate_export_chunks(export_format, since, fields, compress), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@app.cli.command('export-profiles')
+@click.option('--output', required=True, help="File to write, or '-' for stdout (not for parquet)")
+@click.option('--format', 'export_format', type=click.Choice(EXPORT_FORMATS), default='ndjson', help='Output format')
+@click.option('--since', default=None, help='Only profiles saved after this time (epoch seconds or ISO 8601)')
+@click.option('--fields', default=None, help='Comma-separated profile fields (default: all)')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output (ndjson/csv)')
+def export_profiles_command(output, export_format, since, fields, compress):
+    """Export saved profiles for bulk sync or analytics"""
+    fields, error = parse_export_fields(fields)
+    if error:
+        raise click.BadParameter(error, param_hint='--fields')
+    try:
+        since = parse_export_since(since)
+    except ValueError:
+        raise click.BadParameter('expected epoch seconds or an ISO 8601 date', param_hint='--since')
+    
+    started_at = time.time()
+    if export_format == 'parquet':
+        if not PYARROW_AVAILABLE:
+            raise click.UsageError('Parquet export requires pyarrow. Install with: pip install pyarrow')
+        if output == '-':
+            raise click.UsageError('Parquet export needs a file path')
+        count = write_parquet_export(output, since, fields)
+        click.echo(f"Exported {count} profiles to {output} in {time.time() - started_at:.1f}s", err=True)
+        return
+    
+    written = 0
+    target = click.get_binary_stream('stdout') if output == '-' else open(output, 'wb')
+    try:
+        for chunk in generate_export_chunks(export_format, since, fields, compress):
+            target.write(chunk)
+            written += len(chunk)
+    finally:
+        if output != '-':
+            target.close()
+    click.echo(f"Exported {written / 1024 / 1024:.1f} MiB in {time.time() - started_at:.1f}s", err=True)
+
+# Web search providers (SEARCH_PROVIDER = 'html', 'api' or 'stub')
+SEARCH_PROVIDER = os.getenv('SEARCH_PROVIDER', '').lower()
+GOOGLE_SEARCH_API_KEY = os.getenv('GOOGLE_SEARCH_API_KEY')
+GOOGLE_SEARCH_CX = os.getenv('GOOGLE_SEARCH_CX')
+SEARCH_STUB_PATH = os.getenv('SEARCH_STUB_PATH', os.path.join('cassettes', 'search_stub.json'))
+SEARCH_CACHE_TTL_SECONDS = 60 * 60
+PAGE_CACHE_TTL_SECONDS = 30 * 60
+SEARCH_CACHE_MAX_ENTRIES = 512
+SEARCH_PREFETCH_COUNT = 3  # Top results scraped in parallel for each search
+
+search_result_cache = {'entries': OrderedDict(), 'lock': threading.Lock()}
+page_content_cache = {'entries': OrderedDict(), 'lock': threading.Lock()}
+
+class SearchProvider:
+    """Base class for web search backends"""
+    name = 'base'
+    
+    def search(self, query, num_results=5):
+        """Return up to num_results result URLs for query"""
+        raise NotImplementedError
+
+class HtmlSearchProvider(SearchProvider):
+    """Scrapes the google.com results page (no API key, often rate limited)"""
+    name = 'html'
+    
+    def search(self, query, num_results=5):
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        }
+        search_url = f"https://www.google.com/search?q={requests.utils.quote(query)}&num={num_results}"
+        response = requests.get(search_url, headers=headers, timeout=10)
+        if response.status_code != 200:
+            print(f"HTML search returned {response.status_code}")
+            return []
+        
+        soup = BeautifulSoup(response.content, 'html.parser')
+        results = []
+        
+        # Extract search result links
+        for link in soup.find_all('a', href=True):
+            href = link.get('href', '')
+            if href.startswith('/url?q='):
+                # Extract actual URL
+                actual_url = requests.utils.unquote(href.split('/url?q=')[1].split('&')[0])
+                if actual_url.startswith('http') and actual_url not in results:
+                    results.append(actual_url)
+                    if len(results) >= num_results:
+                        break
+        return results
+
+class ApiSearchProvider(SearchProvider):
+    """Google Programmable Search (Custom Search JSON API)"""
+    name = 'api'
+    
+    def search(self, query, num_results=5):
+        response = requests.get('https://www.googleapis.com/customsearch/v1', params={
+            'key': GOOGLE_SEARCH_API_KEY,
+            'cx': GOOGLE_SEARCH_CX,
+            'q': query,
+            'num': min(num_results, 10)
+        }, timeout=10)
+        if response.status_code != 200:
+            print(f"Search API returned {response.status_code}: {response.text[:200]}")
+            return []
+        return [item['link'] for item in response.json().get('items', []) if item.get('link')][:num_results]
+
+class StubSearchProvider(SearchProvider):
+    """Local provider for tests: serves results from a JSON file of query -> URLs"""
+    name = 'stub'
+    
+    def __init__(self, path=SEARCH_STUB_PATH):
+        self.results = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.results = {k.strip().lower(): v for k, v in json.load(f).items()}
+    
+    def search(self, query, num_results=5):
+        return list(self.results.get(query.strip().lower(), self.results.get('*', [])))[:num_results]
+
+def create_search_provider():
+    """Pick the configured search provider, preferring the API when it has credentials"""
+    provider = SEARCH_PROVIDER or ('api' if GOOGLE_SEARCH_API_KEY and GOOGLE_SEARCH_CX else 'html')
+    if provider == 'api' and not (GOOGLE_SEARCH_API_KEY and GOOGLE_SEARCH_CX):
+        print("Warning: SEARCH_PROVIDER=api needs GOOGLE_SEARCH_API_KEY and GOOGLE_SEARCH_CX, using html search")
+        provider = 'html'
+    if provider == 'stub':
+        return StubSearchProvider()
+    if provider == 'api':
+        return ApiSearchProvider()
+    return HtmlSearchProvider()
+
+search_provider = create_search_provider()
+print(f"Web search provider: {search_provider.name}")
+
+def get_ttl_cached(cache, key, ttl_seconds):
+    """Return (value, True) for a fresh cache entry, (None, False) otherwise"""
+    with cache['lock']:
+        entry = cache['entries'].get(key)
+        if entry and time.time() - entry[0] < ttl_seconds:
+            cache['entries'].move_to_end(key)
+            return entry[1], True
+    return None, False
+
+def put_ttl_cached(cache, key, value):
+    """Store a value in a TTL cache, evicting the oldest entries past the size limit"""
+    with cache['lock']:
+        cache['entries'][key] = (time.time(), value)
+        cache['entries'].move_to_end(key)
+        while len(cache['entries']) > SEARCH_CACHE_MAX_ENTRIES:
+            cache['entries'].popitem(last=False)
+
+def search_google(query, num_results=5):
+    """Search the web with the configured provider and return top result URLs"""
+    cache_key = (search_provider.name, re.sub(r'\s+', ' ', (query or '').strip().lower()), num_results)
+    cached, hit = get_ttl_cached(search_result_cache, cache_key, SEARCH_CACHE_TTL_SECONDS)
+    if hit:
+        return list(cached)
+    
+    try:
+        results = search_provider.search(query, num_results)
+    except Exception as e:
+        print(f"Web search error ({search_provider.name}): {e}")
+        return []
+    
+    # Empty results are not cached so a blocked request can be retried
+    if results:
+        put_ttl_cached(search_result_cache, cache_key, results)
+    return list(results)
+
+def fetch_page_content(url):
+    """Scrape a page through Firecrawl with a shared TTL cache"""
+    cache_key = canonicalize_url(url)
+    cached, hit = get_ttl_cached(page_content_cache, cache_key, PAGE_CACHE_TTL_SECONDS)
+    if hit:
+        return cached
+    
+    scraped = scrape_with_firecrawl(url)
+    if scraped:
+        put_ttl_cached(page_content_cache, cache_key, scraped)
+    return scraped
+
+def prefetch_pages(urls, fetch=fetch_page_content, timeout=60):
+    """Fetch several pages in parallel, returns {url: scraped or None}
+    Each call gets its own pool, so one chat's slow scrapes never queue another chat's."""
+    urls = list(urls)[:SEARCH_PREFETCH_COUNT]
+    if not urls:
+        return {}
+    
+    executor = ThreadPoolExecutor(max_workers=len(urls))
+    try:
+        futures = {url: executor.submit(fetch, url) for url in urls}
+        deadline = time.monotonic() + timeout
+        pages = {}
+        for url, future in futures.items():
+            try:
+                pages[url] = future.result(timeout=max(0, deadline - time.monotonic()))
+            except Exception as e:
+                print(f"Prefetch error for {url}: {e}")
+                pages[url] = None
+        return pages
+    finally:
+        # Don't wait on scrapes that ran past the deadline
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# Media analysis settings
+MEDIA_MAX_BYTES = 20 * 1024 * 1024  # Skip anything larger than Gemini's inline request limit
+MEDIA_MAX_IMAGE_SIDE = 1024  # Longest image side (px) sent to Gemini
+MEDIA_CACHE_MAX_ENTRIES = 512
+MEDIA_VIDEO_HOSTS = ('youtube.com', 'youtu.be', 'vimeo.com')
+MEDIA_GEMINI_TIMEOUT_SECONDS = 80  # Below the analyze_media tool timeout
+MEDIA_ANALYSIS_PROMPT = 'Please analyze this image or video and provide a detailed description, including any text, objects, people, activities, or relevant information visible.'
+
+vision_model = None
+vision_model_lock = threading.Lock()
+media_analysis_cache = {}  # canonical URL / content hash -> analysis text
+media_cache_lock = threading.Lock()
+
+def get_vision_model():
+    """Return the shared Gemini vision client, creating it on first use"""
+    global vision_model
+    with vision_model_lock:
+        if vision_model is None:
+            try:
+                vision_model = genai.GenerativeModel('gemini-2.5-flash')
+            except:
+                vision_model = model
+        return vision_model
+
+def canonicalize_url(url):
+    """Normalize a URL so the same page/image/video always maps to the same cache key"""
+    url = url.strip()
+    if not url.lower().startswith('http://') and not url.lower().startswith('https://'):
+        url = 'https://' + url
+    
+    # Collapse the different YouTube URL shapes (embed, youtu.be, shorts) to watch?v=<id>
+    youtube_match = re.search(r'(?:youtube\.com/(?:watch\?v=|embed/|shorts/)|youtu\.be/)([a-zA-Z0-9_-]+)', url)
+    if youtube_match:
+        return f'https://www.youtube.com/watch?v={youtube_match.group(1)}'
+    
+    # Lowercase the host, drop fragments and tracking parameters, sort the rest
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not k.lower().startswith('utm_'))
+    return urlunsplit((parts.scheme.lower(), host, parts.path or '/', urlencode(query), ''))
+
+def get_media_cache_path(cache_key):
+    """Path of the on-disk entry for a media cache key"""
+    return os.path.join(MEDIA_CACHE_DIR, hashlib.sha256(cache_key.encode('utf-8')).hexdigest() + '.json')
+
+def get_cached_media_analysis(cache_key):
+    """Look up a previous analysis in memory, then on disk"""
+    with media_cache_lock:
+        if cache_key in media_analysis_cache:
+            return media_analysis_cache[cache_key]
+    
+    cache_path = get_media_cache_path(cache_key)
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                analysis = json.load(f).get('analysis')
+            if analysis:
+                remember_media_analysis(cache_key, analysis)
+                return analysis
+        except Exception as e:
+            print(f"Error reading media cache: {e}")
+    return None
+
+def remember_media_analysis(cache_key, analysis):
+    """Keep an analysis in the bounded in-memory cache"""
+    with media_cache_lock:
+        media_analysis_cache[cache_key] = analysis
+        while len(media_analysis_cache) > MEDIA_CACHE_MAX_ENTRIES:
+            # Dicts keep insertion order, so the first key is the oldest entry
+            media_analysis_cache.pop(next(iter(media_analysis_cache)))
+
+def store_media_analysis(cache_keys, analysis):
+    """Cache an analysis under every key it is known by (canonical URL, content hash)"""
+    for cache_key in cache_keys:
+        remember_media_analysis(cache_key, analysis)
+        try:
+            with open(get_media_cache_path(cache_key), 'w', encoding='utf-8') as f:
+                json.dump({'key': cache_key, 'analysis': analysis}, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"Error writing media cache: {e}")
+
+def probe_media(url):
+    """HEAD-check a media URL for content type and size before spending a vision call"""
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+    }
+    try:
+        response = requests.head(url, headers=headers, timeout=10, allow_redirects=True)
+        if response.status_code in (403, 405, 501):
+            # Some CDNs reject HEAD - fall back to a streamed GET and only read the headers
+            response = requests.get(url, headers=headers, timeout=10, stream=True)
+            response.close()
+        
+        if response.status_code != 200:
+            return {'error': f'Media URL returned status {response.status_code}'}
+        
+        content_length = response.headers.get('Content-Length', '')
+        return {
+            'content_type': response.headers.get('Content-Type', '').split(';')[0].strip().lower(),
+            'size': int(content_length) if content_length.isdigit() else None,
+            'etag': response.headers.get('ETag', '')
+        }
+    except requests.exceptions.RequestException as e:
+        return {'error': f'Network error: {str(e)}'}
+
+def download_media(url):
+    """Download media bytes, giving up once MEDIA_MAX_BYTES is exceeded"""
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+    }
+    response = requests.get(url, headers=headers, timeout=15, stream=True)
+    try:
+        if response.status_code != 200:
+            return None
+        data = bytearray()
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            data.extend(chunk)
+            if len(data) > MEDIA_MAX_BYTES:
+                return None
+        return bytes(data)
+    finally:
+        response.close()
+
+def downscale_image(image_bytes, content_type):
+    """Shrink an image to MEDIA_MAX_IMAGE_SIDE before upload, returns (bytes, mime type)"""
+    if not PIL_AVAILABLE:
+        return image_bytes, content_type
+    
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            if max(img.size) <= MEDIA_MAX_IMAGE_SIDE and content_type in ('image/jpeg', 'image/png', 'image/webp'):
+                return image_bytes, content_type
+            
+            img.thumbnail((MEDIA_MAX_IMAGE_SIDE, MEDIA_MAX_IMAGE_SIDE))
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            buffer = io.BytesIO()
+            img.save(buffer, format='JPEG', quality=85)
+            return buffer.getvalue(), 'image/jpeg'
+    except Exception as e:
+        print(f"Error downscaling image: {e}")
+        return image_bytes, content_type
+
+def analyze_image_or_video(url):
+    """Analyze image or video using Gemini Vision API, with cached and pre-filtered requests"""
+    try:
+        url_key = canonicalize_url(url)
+        cached = get_cached_media_analysis(url_key)
+        if cached:
+            return cached
+        
+        cache_keys = [url_key]
+        host = urlsplit(url_key).hostname or ''
+        
+        # Exact host or a subdomain of it; a substring test would also match e.g. notyoutube.com
+        if any(host == video_host or host.endswith('.' + video_host) for video_host in MEDIA_VIDEO_HOSTS):
+            # Hosted videos are fetched by Gemini itself - nothing to probe or downscale
+            contents = types.Content(
+                parts=[
+                    types.Part(file_data=types.FileData(file_uri=url_key)),
+                    types.Part(text=MEDIA_ANALYSIS_PROMPT)
+                ]
+            )
+        else:
+            probe = probe_media(url)
+            if 'error' in probe:
+                return f"Error analyzing image/video: {probe['error']}"
+            
+            content_type = probe['content_type']
+            if not content_type.startswith('image/') and not content_type.startswith('video/'):
+                return f"Skipped media analysis: {url} is not an image or video (content type: {content_type or 'unknown'})"
+            if probe['size'] and probe['size'] > MEDIA_MAX_BYTES:
+                return f"Skipped media analysis: {url} is too large ({probe['size']} bytes)"
+            
+            if content_type.startswith('video/'):
+                # Don't download whole videos just to hash them - ETag + size identifies the content
+                if probe['etag'] and probe['size']:
+                    content_key = f"etag:{probe['etag']}:{probe['size']}"
+                    cached = get_cached_media_analysis(content_key)
+                    if cached:
+                        store_media_analysis([url_key], cached)
+                        return cached
+                    cache_keys.append(content_key)
+                contents = types.Content(
+                    parts=[
+                        types.Part(file_data=types.FileData(file_uri=url)),
+                        types.Part(text=MEDIA_ANALYSIS_PROMPT)
+                    ]
+                )
+            else:
+                image_bytes = download_media(url)
+                if image_bytes is None:
+                    return f"Skipped media analysis: could not download {url} within {MEDIA_MAX_BYTES} bytes"
+                
+                # The same screenshot is often hosted under several URLs
+                content_key = 'sha256:' + hashlib.sha256(image_bytes).hexdigest()
+                cached = get_cached_media_analysis(content_key)
+                if cached:
+                    store_media_analysis([url_key], cached)
+                    return cached
+                cache_keys.append(content_key)
+                
+                image_bytes, mime_type = downscale_image(image_bytes, content_type)
+                contents = [{'mime_type': mime_type, 'data': image_bytes}, MEDIA_ANALYSIS_PROMPT]
+        
+        response = get_vision_model().generate_content(contents, request_options={'timeout': MEDIA_GEMINI_TIMEOUT_SECONDS})
+        analysis = response.text
+        store_media_analysis(cache_keys, analysis)
+        return analysis
+    except Exception as e:
+        return f"Error analyzing image/video: {str(e)}"
+
+# Prompt context caching for the chat agent
+RESUME_PROMPT_CHARS = 2500  # Resume prefix kept in the prompt; lookup_resume retrieves the rest
+PROMPT_CACHE_TTL_SECONDS = 30 * 60
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv('PROMPT_CACHE_MIN_TOKENS', '1024'))  # Gemini rejects smaller cached contents
+PROMPT_CONTEXT_MAX_ENTRIES = 64
+
+person_prompt_contexts = OrderedDict()  # prompt key (profile version or payload hash) -> static prompt context
+prompt_context_lock = threading.Lock()
+
+def build_person_prompt_prefix(person_data):
+    """Build the static per-person part of the agent prompt (resume, analysis, links, instructions)"""
+    resume_text = person_data.get('resume_text', '')
+    job_description = person_data.get('job_description', '')
+    
+    # Derived artifacts are precomputed at save time; legacy payloads build them on the fly
+    artifacts = person_data.get('chat_artifacts') or build_chat_artifacts(
+        person_data.get('metadata', {}).get('person_name', ''),
+        resume_text,
+        person_data.get('analysis', {}),
+        person_data.get('scraped_data', {})
+    )
+    person_name = artifacts['person_name']
+    all_available_urls = artifacts['urls']
+    url_map = artifacts['url_map']
+    
+    available_urls_text = ""
+    if all_available_urls:
+        available_urls_text = f"""
+AVAILABLE LINKS FROM RESUME:
+{chr(10).join([f"- {url}" for url in all_available_urls[:20]])}
+
+URL MAPPING (use these when user mentions platforms):
+{chr(10).join([f"- {platform}: {url}" for platform, url in url_map.items()])}
+"""
+    
+    # Only the top of the resume goes into the prompt - the rest is retrieved with lookup_resume
+    resume_text_for_prompt = resume_text[:RESUME_PROMPT_CHARS]
+    if len(resume_text) > RESUME_PROMPT_CHARS:
+        resume_text_for_prompt += "\n\n[Resume continues - use lookup_resume with a search query to retrieve other sections]"
+    
+    prefix = f"""You are an AI assistant helping to answer questions about a person's professional profile.
+
+PERSON'S NAME: {person_name or 'Unknown'}
+
+RESUME (beginning):
+{resume_text_for_prompt}
+
+PROFILE ANALYSIS:
+{artifacts['analysis_block']}
+
+SCRAPED DATA FROM PLATFORMS:
+{artifacts['scraped_data_block']}
+
+{available_urls_text}
+
+{f"JOB DESCRIPTION (if relevant): {job_description[:1000]}" if job_description else ""}
+
+You have access to 3 tools:
+1. **lookup_resume** - Search the person's FULL resume, scraped platform data and earlier tool results. tool_input is a search query (e.g. "Flutter mobile app", "Kaggle medals"). Returns the most relevant passages from:
+   - All resume sections (Projects, Experience, Education, etc.), including the parts not shown above
+   - All links, project names and descriptions
+   - All skills, technologies, and achievements
+   - Data scraped from GitHub, DevPost, Kaggle, etc. and results of earlier searches
+   Use this tool whenever the answer is not in the resume beginning shown above.
+2. **search_website** - Search any website using Firecrawl. Use this when:
+   - User asks about a paper, publication, or research
+   - User asks to verify information from a specific URL
+   - User asks to check a website mentioned in scraped data or resume links
+   - User mentions a platform (GitHub, LinkedIn, etc.) - use the URL from AVAILABLE LINKS above
+   - You need to search Google first, then scrape the first result
+3. **analyze_media** - Analyze images or videos from URLs using Gemini Vision
+
+IMPORTANT INSTRUCTIONS:
+- Only the beginning of the resume is shown above. When user asks about projects or anything else in the resume that is not visible above, use lookup_resume with a focused query.
+- ALWAYS check AVAILABLE LINKS FROM RESUME first before searching! If user mentions "GitHub", "LinkedIn", etc., use the actual URL from the resume links above.
+- **CRITICAL: Be PROACTIVE with tools!**
+  - If user asks "are those projects in his GitHub?" or "is [project] on GitHub?", you MUST:
+    1. Get the GitHub URL from AVAILABLE LINKS
+    2. Use search_website tool to scrape the GitHub page
+    3. Search for the project names in the scraped content
+    4. Report if found or not
+  - If user asks about a project on DevPost/Kaggle/etc., automatically scrape that platform and search for the project
+  - If user asks about videos/images in a project, automatically go to the project page and use analyze_media tool
+- If user asks about a paper/publication (e.g., "was he a co-author of paper X?"), you MUST:
+  1. First search Google for the paper title
+  2. Get the first search result URL
+  3. Scrape that URL using search_website tool
+  4. Check if the person's name appears in the authors/authorship section
+- When using search_website tool, provide the EXACT URL from AVAILABLE LINKS or a valid URL (not platform names like "GitHub")
+- You can use MULTIPLE tools in sequence if needed
+- Always explain what tool you're using and why
+- Be thorough and verify information when asked - don't just say "I don't know", actually scrape and check!
+- When user asks about projects, use lookup_resume to retrieve the matching resume and platform passages
+"""
+    
+    return {
+        'prefix': prefix,
+        'person_name': person_name,
+        'first_name': person_name.split()[0] if person_name else "",
+        'all_available_urls': all_available_urls,
+        'url_map': url_map
+    }
+
+# Changes whenever the prompt template above is edited, so cached contexts from older code aren't reused
+PERSON_PROMPT_TEMPLATE_HASH = hashlib.sha256(json.dumps([
+    RESUME_PROMPT_CHARS,
+    [const for const in build_person_prompt_prefix.__code__.co_consts if isinstance(const, str)]
+]).encode('utf-8')).hexdigest()
+
+def get_profile_prompt_key(folder_name, version):
+    """Prompt context key for a saved profile: its storage version plus the prompt template hash"""
+    if version is None:
+        return None
+    return hashlib.sha256(json.dumps(['profile', folder_name, version, PERSON_PROMPT_TEMPLATE_HASH], default=str).encode('utf-8')).hexdigest()
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 chars per token) used when the API gives no usage data"""
+    return len(text) // 4
+
+def register_cached_prompt_context(context):
+    """Register the static prefix as Gemini cached content, if the model and SDK support it"""
+    context['cached_model'] = None
+    context['cache'] = None
+    if not GEMINI_CACHING_AVAILABLE or CASSETTE_MODE or context['prefix_tokens'] < PROMPT_CACHE_MIN_TOKENS:
+        return
+    
+    try:
+        cache = caching.CachedContent.create(
+            model=getattr(model, 'model_name', 'models/gemini-2.5-flash'),
+            display_name=f"hire-gem-{context['person_name'] or 'profile'}"[:128],
+            contents=[context['prefix']],
+            ttl=datetime.timedelta(seconds=PROMPT_CACHE_TTL_SECONDS)
+        )
+        context['cache'] = cache
+        context['cached_model'] = genai.GenerativeModel.from_cached_content(cached_content=cache)
+        context['cache_expires_at'] = time.time() + PROMPT_CACHE_TTL_SECONDS - 60
+    except Exception as e:
+        # Model without explicit caching support - the stable prefix still benefits from implicit caching
+        print(f"Prompt context caching unavailable: {e}")
+
+def release_prompt_context(context):
+    """Delete the server-side cached content behind a prompt context"""
+    cache = context.get('cache')
+    if cache:
+        try:
+            cache.delete()
+        except Exception as e:
+            print(f"Error deleting cached prompt context: {e}")
+    context['cache'] = None
+    context['cached_model'] = None
+
+def get_person_prompt_context(person_data, prompt_key=None):
+    """Return the static prompt context for a person, building it once and reusing it across messages.
+    Sessions pass the prompt_key of the profile version they loaded; legacy payloads are hashed in full."""
+    fingerprint = prompt_key
+    if fingerprint is None:
+        # Every input of build_person_prompt_prefix, so payloads differing only in analysis or JD get their own prefix
+        fingerprint_source = json.dumps([
+            PERSON_PROMPT_TEMPLATE_HASH,
+            person_data.get('metadata', {}).get('person_name', ''),
+            person_data.get('resume_text', ''),
+            person_data.get('analysis', {}),
+            person_data.get('scraped_data', {}),
+            person_data.get('job_description', ''),
+            person_data.get('chat_artifacts')
+        ], sort_keys=True, ensure_ascii=False, default=str)
+        fingerprint = hashlib.sha256(fingerprint_source.encode('utf-8')).hexdigest()
+    
+    with prompt_context_lock:
+        context = person_prompt_contexts.get(fingerprint)
+        if context:
+            person_prompt_contexts.move_to_end(fingerprint)
+    
+    if context is None:
+        context = build_person_prompt_prefix(person_data)
+        try:
+            context['prefix_tokens'] = model.count_tokens(context['prefix']).total_tokens
+        except Exception:
+            context['prefix_tokens'] = estimate_tokens(context['prefix'])
+        register_cached_prompt_context(context)
+        
+        evicted = []
+        with prompt_context_lock:
+            existing = person_prompt_contexts.get(fingerprint)
+            if existing:
+                # A concurrent miss registered the same prefix first: use it and drop ours
+                evicted.append(context)
+                context = existing
+                person_prompt_contexts.move_to_end(fingerprint)
+            else:
+                person_prompt_contexts[fingerprint] = context
+                while len(person_prompt_contexts) > PROMPT_CONTEXT_MAX_ENTRIES:
+                    evicted.append(person_prompt_contexts.popitem(last=False)[1])
+        for old_context in evicted:
+            release_prompt_context(old_context)
+    elif context.get('cached_model') and time.time() >= context.get('cache_expires_at', 0):
+        # Server-side cache is about to expire - register a fresh one
+        release_prompt_context(context)
+        register_cached_prompt_context(context)
+    
+    return context
+
+def generate_with_prompt_context(context, delta_prompt, token_log=None):
+    """Send only the per-iteration delta when the prefix is cached, otherwise prefix + delta"""
+    response = None
+    if context.get('cached_model'):
+        try:
+            response = context['cached_model'].generate_content(delta_prompt)
+        except Exception as e:
+            print(f"Cached prompt context failed, resending full prompt: {e}")
+            release_prompt_context(context)
+    if response is None:
+        response = model.generate_content(context['prefix'] + delta_prompt)
+    
+    # Report prompt tokens before (full prefix resent) and after (uncached tokens actually billed)
+    usage = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(usage, 'prompt_token_count', 0) or (context['prefix_tokens'] + estimate_tokens(delta_prompt))
+    cached_tokens = getattr(usage, 'cached_content_token_count', 0) or 0
+    if token_log is not None:
+        entry = {
+            'call': len(token_log) + 1,
+            'prompt_tokens_before': prompt_tokens,
+            'prompt_tokens_after': prompt_tokens - cached_tokens,
+            'cached_tokens': cached_tokens
+        }
+        token_log.append(entry)
+        print(f"Chat LLM call {entry['call']}: prompt tokens {entry['prompt_tokens_before']} -> {entry['prompt_tokens_after']} (cached {cached_tokens})")
+    return response
+
+# Tool-result cache for the chat agent (scoped to a chat session)
+TOOL_CACHE_TTL_SECONDS = 5 * 60
+TOOL_CACHE_MAX_ENTRIES = 100
+
+def new_tool_cache():
+    """Create an empty tool-result cache"""
+    return {'entries': OrderedDict(), 'lock': threading.Lock()}
+
+def get_tool_cache_key(tool, tool_input):
+    """Cache key from the tool name and its canonical input"""
+    tool_input = str(tool_input or '').strip()
+    if tool_input.lower().startswith('http://') or tool_input.lower().startswith('https://'):
+        return (tool, canonicalize_url(tool_input))
+    return (tool, re.sub(r'\s+', ' ', tool_input.lower()))
+
+def cached_tool_call(tool_cache, tool, tool_input, func, *args):
+    """Run a tool through the cache, returns (result, was_cache_hit)"""
+    cache_key = get_tool_cache_key(tool, tool_input)
+    now = time.time()
+    with tool_cache['lock']:
+        entry = tool_cache['entries'].get(cache_key)
+        if entry and now - entry[0] < TOOL_CACHE_TTL_SECONDS:
+            tool_cache['entries'].move_to_end(cache_key)
+            return entry[1], True
+    
+    result = func(*args)
+    
+    # Failed lookups are not cached so the next attempt can succeed
+    if result and not (isinstance(result, str) and result.startswith('Error')):
+        with tool_cache['lock']:
+            tool_cache['entries'][cache_key] = (now, result)
+            tool_cache['entries'].move_to_end(cache_key)
+            while len(tool_cache['entries']) > TOOL_CACHE_MAX_ENTRIES:
+                tool_cache['entries'].popitem(last=False)
+    return result, False
+
+# Parallel tool execution for the chat agent
+AGENT_TOOLS = ('lookup_resume', 'search_website', 'analyze_media')
+AGENT_TOOL_TIMEOUTS = {'lookup_resume': 5, 'search_website': 60, 'analyze_media': 90}  # seconds
+AGENT_TOOL_MAX_PARALLEL = int(os.getenv('AGENT_TOOL_WORKERS', '8'))  # Per message
+LOOKUP_RESUME_TOP_K = 5
+
+def run_search_website(tool_input, previous_results, agent_context):
+    """search_website tool: scrape a platform/URL or search Google, returns result lines"""
+    message = agent_context['message']
+    chat_history = agent_context['chat_history']
+    resume_text = agent_context['resume_text']
+    person_name = agent_context['person_name']
+    first_name = agent_context['first_name']
+    url_map = agent_context['url_map']
+    all_available_urls = agent_context['all_available_urls']
+    run_tool = agent_context['run_tool']
+    results = []
+    tool_input = tool_input or ''
+    
+    # First, check if user mentioned a platform - map to actual URL
+    tool_input_lower = tool_input.lower() if tool_input else ""
+    message_lower = message.lower()
+    
+    # Check if user is asking about projects on a platform (e.g., "are those in his github?")
+    # Extract project names from previous context, chat history, or message
+    project_names = []
+    if 'project' in message_lower or 'projects' in message_lower or 'those' in message_lower:
+        # Extract from previous tool results
+        for result in previous_results:
+            if 'project' in result.lower():
+                # Extract project names (capitalized words that might be project names)
+                matches = re.findall(r'\b([A-Z][a-zA-Z]+(?:AI|App|System|Platform|Tube)?)\b', result)
+                project_names.extend(matches)
+        
+        # Extract from chat history (previous assistant messages)
+        for chat_msg in chat_history[-3:]:
+            if chat_msg.get('role') == 'assistant':
+                content = chat_msg.get('content', '')
+                # Look for project names in bullet points or numbered lists
+                matches = re.findall(r'(?:^|\n)[\*\-\d+\.]\s*\*?\*?([A-Z][a-zA-Z]+(?:AI|App|System|Platform|Tube)?)', content, re.MULTILINE)
+                project_names.extend(matches)
+        
+        # Extract from resume text - look for project sections
+        resume_lower = resume_text.lower()
+        if 'project' in resume_lower:
+            # Find project names (usually capitalized, might be in bullet points)
+            project_matches = re.findall(r'(?:project|projects?)[\s:]*([A-Z][a-zA-Z\s]+(?:AI|App|System|Platform|Tube)?)', resume_text, re.IGNORECASE)
+            for match in project_matches:
+                # Clean up and extract individual project names
+                cleaned = re.sub(r'\s+', ' ', match.strip())
+                if len(cleaned.split()) <= 3:  # Likely a project name
+                    project_names.append(cleaned)
+        
+        # Also check message for specific project mentions
+        if 'inqube' in message_lower:
+            project_names.append('InqubeAI')
+        if 'crunchtube' in message_lower or 'crunch' in message_lower:
+            project_names.append('CrunchTube')
+        
+        # Deduplicate
+        project_names = sorted(set([p.strip() for p in project_names if len(p.strip()) > 2]))
+    
+    # Check if it's a platform mention (GitHub, LinkedIn, etc.)
+    platform_url = None
+    platform_name = None
+    for platform, url in url_map.items():
+        if platform in tool_input_lower or platform in message_lower:
+            platform_url = url
+            platform_name = platform
+            break
+    
+    # If platform URL found, use it and search for projects if mentioned
+    if platform_url:
+        results.append(f"🔗 Found {platform_url} from resume links")
+        scraped = run_tool('scrape', platform_url, fetch_page_content, platform_url)
+        if scraped:
+            content = scraped.get('markdown', scraped.get('content', ''))[:4000]
+            results.append(f"📄 Scraped {platform_url}:\n{content}")
+            
+            # If user asked about projects, search for them in the scraped content
+            if project_names:
+                content_lower = content.lower()
+                found_projects = []
+                not_found_projects = []
+                for project in project_names:
+                    if project.lower() in content_lower:
+                        found_projects.append(project)
+                    else:
+                        not_found_projects.append(project)
+                
+                if found_projects:
+                    results.append(f"✅ Found projects on {platform_name}: {', '.join(found_projects)}")
+                if not_found_projects:
+                    results.append(f"❌ Projects not found on {platform_name}: {', '.join(not_found_projects)}")
+        else:
+            results.append(f"⚠️ Could not scrape {platform_url}")
+        return results
+    
+    # Check if tool_input is already a valid URL
+    if tool_input and (tool_input.startswith('http://') or tool_input.startswith('https://')):
+        scraped = run_tool('scrape', tool_input, fetch_page_content, tool_input)
+        if scraped:
+            content = scraped.get('markdown', scraped.get('content', ''))[:2000]
+            results.append(f"📄 Scraped {tool_input}:\n{content}")
+        else:
+            results.append(f"⚠️ Could not scrape {tool_input}")
+        return results
+    
+    # Check if it's a paper/publication question - search Google first
+    if any(keyword in message.lower() for keyword in ['paper', 'publication', 'research', 'article', 'co-author', 'author', 'coauthor']):
+        # Extract paper title from message
+        # Look for quoted text or text after keywords
+        paper_title = None
+        
+        # Try to find quoted text first
+        quoted_match = re.search(r'["\']([^"\']+)["\']', message)
+        if quoted_match:
+            paper_title = quoted_match.group(1)
+        else:
+            # Extract text after keywords like "paper", "publication", etc.
+            for keyword in ['paper', 'publication', 'research', 'article']:
+                pattern = rf'{keyword}\s+(?:called|titled|named|["\']|:)?\s*([^?.,!]+)'
+                match = re.search(pattern, message, re.I)
+                if match:
+                    paper_title = match.group(1).strip()
+                    break
+        
+        # Fallback: use tool_input or clean the message
+        if not paper_title:
+            paper_title = tool_input if tool_input else message
+            # Remove question words and common phrases
+            paper_title = re.sub(r'^(was|is|are|can|do|does|did|will|would|could|should|tell|check|verify|lookup|look up|search for|find|he|she|they|a|an|the|co-author|coauthor|author of)', '', paper_title, flags=re.I).strip()
+            paper_title = re.sub(r'\?$', '', paper_title).strip()
+        
+        # Search the web for the paper
+        search_query = paper_title
+        google_results = run_tool('search', search_query, search_google, search_query, 5)
+        
+        if google_results:
+            # Scrape the top results in parallel and check each one for the person's name
+            top_urls = google_results[:SEARCH_PREFETCH_COUNT]
+            results.append(f"🔍 Searched the web for '{search_query}' and found: {', '.join(top_urls)}")
+            pages = prefetch_pages(top_urls, lambda url: run_tool('scrape', url, fetch_page_content, url))
+            
+            best_url, best_content, best_match = None, None, 0
+            for url in top_urls:
+                scraped = pages.get(url)
+                if not scraped:
+                    continue
+                content = scraped.get('markdown', scraped.get('content', ''))[:3000]
+                content_lower = content.lower()
+                match = 2 if person_name and person_name.lower() in content_lower else 1 if first_name and first_name.lower() in content_lower else 0
+                if best_url is None or match > best_match:
+                    best_url, best_content, best_match = url, content, match
+            
+            if best_url:
+                results.append(f"📄 Scraped content from {best_url}:\n{best_content}")
+                
+                # Check if person's name is in the content
+                if best_match == 2:
+                    results.append(f"✅ Found person's name '{person_name}' in the content!")
+                elif best_match == 1:
+                    results.append(f"⚠️ Found first name '{first_name}' in the content (partial match)")
+                else:
+                    results.append(f"❌ Person's name '{person_name}' not found in the top {len(top_urls)} results")
+            else:
+                results.append(f"⚠️ Could not scrape {', '.join(top_urls)}")
+        else:
+            results.append(f"⚠️ No web search results found for '{search_query}'")
+    
+    elif tool_input:
+        # Check if it's in available URLs
+        matching_url = None
+        for url in all_available_urls:
+            if tool_input.lower() in url.lower() or url.lower() in tool_input.lower():
+                matching_url = url
+                break
+        
+        if matching_url:
+            scraped = run_tool('scrape', matching_url, fetch_page_content, matching_url)
+            if scraped:
+                content = scraped.get('markdown', scraped.get('content', ''))[:2000]
+                results.append(f"📄 Scraped {matching_url}:\n{content}")
+            else:
+                results.append(f"⚠️ Could not scrape {matching_url}")
+        else:
+            # Try as direct URL
+            url = tool_input
+            if not url.startswith('http'):
+                url = 'https://' + url
+            scraped = run_tool('scrape', url, fetch_page_content, url)
+            if scraped:
+                content = scraped.get('markdown', scraped.get('content', ''))[:2000]
+                results.append(f"📄 Scraped {url}:\n{content}")
+            else:
+                results.append(f"⚠️ Could not scrape {url}. Available URLs from resume: {', '.join(all_available_urls[:5])}")
+    else:
+        # No tool_input provided - suggest available URLs
+        results.append(f"⚠️ No URL specified. Available URLs from resume: {', '.join(all_available_urls[:5])}")
+    
+    return results
 
-def search_google(query, num_results=5):
-    """Search Google and return top result URLs"""
-    try:
-        # Use DuckDuckGo HTML search as a fallback (no API key needed)
-        # Or use a simple Google search via scraping
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        }
-        
-        # Try Google search
-        search_url = f"https://www.google.com/search?q={requests.utils.quote(query)}&num={num_results}"
-        response = requests.get(search_url, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'html.parser')
-            results = []
-            
-            # Extract search result links
-            for link in soup.find_all('a', href=True):
-                href = link.get('href', '')
-                if href.startswith('/url?q='):
-                    # Extract actual URL
-                    actual_url = href.split('/url?q=')[1].split('&')[0]
-                    if actual_url.startswith('http') and actual_url not in results:
-                        results.append(actual_url)
-                        if len(results) >= num_results:
-                            break
-            
-            return results
-        return []
-    except Exception as e:
-        print(f"Google search error: {e}")
+def run_agent_tool(tool_name, tool_input, previous_results, agent_context):
+    """Run a single agent tool call, returns result lines"""
+    if tool_name == "search_website":
+        return run_search_website(tool_input, previous_results, agent_context)
+    elif tool_name == "analyze_media":
+        url = tool_input
+        if url:
+            result = agent_context['run_tool']('analyze_media', url, analyze_image_or_video, url)
+            return [f"🖼️ Analyzed media at {url}:\n{result}"]
         return []
+    elif tool_name == "lookup_resume":
+        query = tool_input or agent_context['message']
+        with agent_context['search_index_lock']:
+            passages = search_index(agent_context['search_index'], query, top_k=LOOKUP_RESUME_TOP_K)
+        if not passages:
+            return [f"📚 No resume or profile passages matched '{query}'"]
+        passages_text = '\n\n'.join(f"[{passage['source']}] {passage['text']}" for passage in passages)
+        return [f"📚 Resume/profile passages for '{query}':\n{passages_text}"]
+    return []
 
-def analyze_image_or_video(url):
-    """Analyze image or video using Gemini Vision API"""
+def execute_agent_tool_calls(tool_calls, previous_results, agent_context):
+    """Run independent tool calls in parallel with per-tool timeouts.
+    Each message gets its own small pool, so a tool stuck past its timeout only ties up a thread of this
+    request (until its own network timeout fires) instead of a slot every chat shares."""
+    started_at = time.time()
+    executor = ThreadPoolExecutor(max_workers=max(1, min(len(tool_calls), AGENT_TOOL_MAX_PARALLEL)))
     try:
-        # Use Gemini Vision API
-        vision_model = genai.GenerativeModel('gemini-2.5-flash')
+        futures = [
+            (call, executor.submit(run_agent_tool, call['tool'], call.get('tool_input', ''), previous_results, agent_context))
+            for call in tool_calls
+        ]
         
-        response = vision_model.generate_content(
-            contents=types.Content(
-                parts=[
-                    types.Part(
-                        file_data=types.FileData(file_uri=url)
-                    ),
-                    types.Part(text='Please analyze this image or video and provide a detailed description, including any text, objects, people, activities, or relevant information visible.')
-                ]
-            )
-        )
-        
-        return response.text
-    except Exception as e:
-        return f"Error analyzing image/video: {str(e)}"
+        results = []
+        for call, future in futures:
+            timeout = AGENT_TOOL_TIMEOUTS.get(call['tool'], 60)
+            try:
+                results.extend(future.result(timeout=max(0, started_at + timeout - time.time())))
+            except FuturesTimeoutError:
+                future.cancel()
+                results.append(f"⏱️ {call['tool']} timed out after {timeout}s for '{call.get('tool_input', '')}'")
+            except Exception as e:
+                results.append(f"⚠️ {call['tool']} failed for '{call.get('tool_input', '')}': {str(e)}")
+        return results
+    finally:
+        # Don't wait for stragglers; calls that never started are dropped
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def parse_agent_decision(text):
+    """(cleaned text, decision dict) from the agent's reply: bare JSON, fenced JSON or JSON wrapped in prose.
+    A reply without a parseable JSON object is treated as a plain final answer."""
+    ai_text = text.strip()
+    if ai_text.startswith('```'):
+        ai_text = ai_text.split('```')[1]
+        if ai_text.startswith('json'):
+            ai_text = ai_text[4:]
+    ai_text = ai_text.strip()
+    
+    # raw_decode parses one complete (nested) object and ignores any prose after it
+    decoder = json.JSONDecoder()
+    start = ai_text.find('{')
+    while start != -1:
+        try:
+            decision, _ = decoder.raw_decode(ai_text, start)
+            if isinstance(decision, dict):
+                return ai_text, decision
+        except ValueError:
+            pass
+        start = ai_text.find('{', start + 1)
+    return ai_text, {'needs_tool': False, 'final_answer': ai_text}
 
-def ai_agent_chat(message, person_data, chat_history):
-    """AI Agent with tools to answer questions about a person's profile - supports iterative tool usage"""
+def ai_agent_chat(message, person_data, chat_history, stats=None, tool_cache=None, search_index=None, search_index_lock=None, prompt_key=None):
+    """AI Agent with tools to answer questions about a person's profile - supports iterative tool usage.
+    A session's search_index is shared by its concurrent messages, so pass the session lock with it."""
     try:
-        # Prepare context from person data
+        # Static per-person context is built once and reused across iterations and messages
+        context = get_person_prompt_context(person_data, prompt_key)
         resume_text = person_data.get('resume_text', '')
-        analysis = person_data.get('analysis', {})
-        scraped_data = person_data.get('scraped_data', {})
-        job_description = person_data.get('job_description', '')
-        
-        # Extract person's name from resume or metadata
-        person_name = person_data.get('metadata', {}).get('person_name', '')
-        if not person_name:
-            # Try to extract from resume text
-            name_match = re.search(r'^([A-Z][a-z]+(?:\s+[A-Z][a-z]+)+)', resume_text, re.MULTILINE)
-            if name_match:
-                person_name = name_match.group(1)
-        
-        # Extract first name for searching
-        first_name = person_name.split()[0] if person_name else ""
-        
-        # Extract all URLs from resume text
-        url_pattern = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+[^\s<>"{}|\\^`\[\].,;:!?]')
-        resume_urls = url_pattern.findall(resume_text)
+        person_name = context['person_name']
+        first_name = context['first_name']
+        all_available_urls = context['all_available_urls']
+        url_map = context['url_map']
+        token_log = stats.setdefault('token_usage', []) if stats is not None else None
         
-        # Also get URLs from scraped_data (they might have been extracted during initial scraping)
-        scraped_urls = []
-        for platform, data in scraped_data.items():
-            if isinstance(data, dict):
-                # Extract URLs from scraped data
-                data_str = json.dumps(data)
-                scraped_urls.extend(url_pattern.findall(data_str))
+        # Scraped pages and searches are reused across iterations (and messages, with a session cache)
+        if tool_cache is None:
+            tool_cache = new_tool_cache()
+        cache_hits = stats.setdefault('cache_hits', []) if stats is not None else []
         
-        # Combine and deduplicate URLs
-        all_available_urls = list(set(resume_urls + scraped_urls))
+        def run_tool(tool, tool_input, func, *args):
+            result, cache_hit = cached_tool_call(tool_cache, tool, tool_input, func, *args)
+            if cache_hit:
+                cache_hits.append(f"{tool}: {tool_input}")
+            return result
         
-        # Map platform names to URLs
-        url_map = {}
-        for url in all_available_urls:
-            url_lower = url.lower()
-            if 'github.com' in url_lower:
-                url_map['github'] = url
-                url_map['github.com'] = url
-            elif 'linkedin.com' in url_lower:
-                url_map['linkedin'] = url
-                url_map['linkedin.com'] = url
-            elif 'devpost.com' in url_lower:
-                url_map['devpost'] = url
-                url_map['devpost.com'] = url
-            elif 'kaggle.com' in url_lower:
-                url_map['kaggle'] = url
-                url_map['kaggle.com'] = url
-            elif 'orcid.org' in url_lower:
-                url_map['orcid'] = url
-                url_map['orcid.org'] = url
+        # Retrieval index over resume, scraped data and tool results (grows with each tool call)
+        if search_index is None:
+            search_index = build_search_index(resume_text, person_data.get('scraped_data', {}))
+        if search_index_lock is None:
+            search_index_lock = threading.Lock()
+        
+        agent_context = {
+            'search_index': search_index,
+            'search_index_lock': search_index_lock,
+            'message': message,
+            'chat_history': chat_history,
+            'resume_text': resume_text,
+            'person_name': person_name,
+            'first_name': first_name,
+            'url_map': url_map,
+            'all_available_urls': all_available_urls,
+            'run_tool': run_tool
+        }
         
         # Build initial context
         tools_used = []
@@ -1657,80 +5346,13 @@ def ai_agent_chat(message, person_data, chat_history):
         
         while iteration < max_iterations:
             iteration += 1
+            if stats is not None:
+                stats['iterations'] = iteration
             
-            # Build context prompt with accumulated tool results
-            available_urls_text = ""
-            if all_available_urls:
-                available_urls_text = f"""
-AVAILABLE LINKS FROM RESUME:
-{chr(10).join([f"- {url}" for url in all_available_urls[:20]])}
-
-URL MAPPING (use these when user mentions platforms):
-{chr(10).join([f"- {platform}: {url}" for platform, url in url_map.items()])}
-"""
-            
-            # Use full resume text (not truncated) so agent can see all content including projects and links
-            # Limit to 8000 chars to avoid token limits, but prioritize showing full content
-            resume_text_for_prompt = resume_text[:8000] if len(resume_text) > 8000 else resume_text
-            if len(resume_text) > 8000:
-                resume_text_for_prompt += "\n\n[Resume text truncated for length, but all key sections should be visible above]"
-            
-            context_prompt = f"""You are an AI assistant helping to answer questions about a person's professional profile.
-
-PERSON'S NAME: {person_name or 'Unknown'}
-
-FULL RESUME TEXT (with all links, projects, and sections visible):
-{resume_text_for_prompt}
-
-PROFILE ANALYSIS:
-{json.dumps(analysis, indent=2)[:2000]}
-
-SCRAPED DATA FROM PLATFORMS:
-{json.dumps(scraped_data, indent=2)[:3000]}
-
-{available_urls_text}
-
-{f"JOB DESCRIPTION (if relevant): {job_description[:1000]}" if job_description else ""}
-
+            # Only the delta changes per iteration: tool results, history and the question
+            delta_prompt = f"""
 {f"TOOL RESULTS FROM PREVIOUS ITERATIONS:\n{chr(10).join(tool_results)}\n" if tool_results else ""}
 
-You have access to 3 tools:
-1. **lookup_resume** - Look up information from the FULL RESUME TEXT provided above. The resume text contains:
-   - All sections (Projects, Experience, Education, etc.)
-   - All links embedded in the resume
-   - All project names and descriptions
-   - All skills, technologies, and achievements
-   Use this tool when you need to reference specific information from the resume. The full resume text is already provided above, so you can answer questions directly from it.
-2. **search_website** - Search any website using Firecrawl. Use this when:
-   - User asks about a paper, publication, or research
-   - User asks to verify information from a specific URL
-   - User asks to check a website mentioned in scraped data or resume links
-   - User mentions a platform (GitHub, LinkedIn, etc.) - use the URL from AVAILABLE LINKS above
-   - You need to search Google first, then scrape the first result
-3. **analyze_media** - Analyze images or videos from URLs using Gemini Vision
-
-IMPORTANT INSTRUCTIONS:
-- The FULL RESUME TEXT is provided above with ALL content including projects, links, and sections. When user asks about projects or anything in the resume, use lookup_resume tool and reference the full resume text directly.
-- ALWAYS check AVAILABLE LINKS FROM RESUME first before searching! If user mentions "GitHub", "LinkedIn", etc., use the actual URL from the resume links above.
-- **CRITICAL: Be PROACTIVE with tools!**
-  - If user asks "are those projects in his GitHub?" or "is [project] on GitHub?", you MUST:
-    1. Get the GitHub URL from AVAILABLE LINKS
-    2. Use search_website tool to scrape the GitHub page
-    3. Search for the project names in the scraped content
-    4. Report if found or not
-  - If user asks about a project on DevPost/Kaggle/etc., automatically scrape that platform and search for the project
-  - If user asks about videos/images in a project, automatically go to the project page and use analyze_media tool
-- If user asks about a paper/publication (e.g., "was he a co-author of paper X?"), you MUST:
-  1. First search Google for the paper title
-  2. Get the first search result URL
-  3. Scrape that URL using search_website tool
-  4. Check if the person's name appears in the authors/authorship section
-- When using search_website tool, provide the EXACT URL from AVAILABLE LINKS or a valid URL (not platform names like "GitHub")
-- You can use MULTIPLE tools in sequence if needed
-- Always explain what tool you're using and why
-- Be thorough and verify information when asked - don't just say "I don't know", actually scrape and check!
-- When user asks about projects, check the FULL RESUME TEXT above - it contains all project information with links
-
 Current conversation history:
 {json.dumps(chat_history[-5:], indent=2) if len(chat_history) > 0 else "No previous conversation"}
 
@@ -1739,10 +5361,15 @@ User's question: {message}
 Analyze the question and determine if you need to use any tools. If yes, respond in this JSON format:
 {{
     "needs_tool": true/false,
-    "tool": "lookup_resume" | "search_website" | "analyze_media" | null,
-    "tool_input": "what to search/scrape/analyze",
-    "reasoning": "why you need this tool"
+    "tool_calls": [
+        {{
+            "tool": "lookup_resume" | "search_website" | "analyze_media",
+            "tool_input": "what to search/scrape/analyze"
+        }}
+    ],
+    "reasoning": "why you need these tools"
 }}
+List ALL independent tool calls you need right now in "tool_calls" (e.g. GitHub, DevPost and a demo video together) - they run in parallel.
 
 If you don't need a tool, respond with:
 {{
@@ -1751,25 +5378,8 @@ If you don't need a tool, respond with:
 }}"""
 
             # Get AI decision on tool usage
-            response = model.generate_content(context_prompt)
-            ai_text = response.text.strip()
-            
-            # Clean JSON response
-            if ai_text.startswith('```'):
-                ai_text = ai_text.split('```')[1]
-                if ai_text.startswith('json'):
-                    ai_text = ai_text[4:]
-            ai_text = ai_text.strip()
-            
-            try:
-                decision = json.loads(ai_text)
-            except:
-                # Fallback: try to extract JSON from text
-                json_match = re.search(r'\{[^}]+\}', ai_text)
-                if json_match:
-                    decision = json.loads(json_match.group())
-                else:
-                    decision = {"needs_tool": False, "final_answer": ai_text}
+            response = generate_with_prompt_context(context, delta_prompt, token_log)
+            ai_text, decision = parse_agent_decision(response.text)
             
             # If no tool needed, return final answer
             if not decision.get('needs_tool', False):
@@ -1778,223 +5388,33 @@ If you don't need a tool, respond with:
                     final_answer = "\n\n".join(tool_results) + "\n\n" + final_answer
                 return final_answer, ", ".join(tools_used) if tools_used else "lookup_resume"
             
-            # Execute tool
-            tool_name = decision.get('tool')
-            tool_input = decision.get('tool_input', '')
-            
-            if tool_name == "search_website":
-                tools_used.append("search_website")
-                
-                # First, check if user mentioned a platform - map to actual URL
-                tool_input_lower = tool_input.lower() if tool_input else ""
-                message_lower = message.lower()
-                
-                # Check if user is asking about projects on a platform (e.g., "are those in his github?")
-                # Extract project names from previous context, chat history, or message
-                project_names = []
-                if 'project' in message_lower or 'projects' in message_lower or 'those' in message_lower:
-                    # Extract from previous tool results
-                    for result in tool_results:
-                        if 'project' in result.lower():
-                            # Extract project names (capitalized words that might be project names)
-                            matches = re.findall(r'\b([A-Z][a-zA-Z]+(?:AI|App|System|Platform|Tube)?)\b', result)
-                            project_names.extend(matches)
-                    
-                    # Extract from chat history (previous assistant messages)
-                    for chat_msg in chat_history[-3:]:
-                        if chat_msg.get('role') == 'assistant':
-                            content = chat_msg.get('content', '')
-                            # Look for project names in bullet points or numbered lists
-                            matches = re.findall(r'(?:^|\n)[\*\-\d+\.]\s*\*?\*?([A-Z][a-zA-Z]+(?:AI|App|System|Platform|Tube)?)', content, re.MULTILINE)
-                            project_names.extend(matches)
-                    
-                    # Extract from resume text - look for project sections
-                    resume_lower = resume_text.lower()
-                    if 'project' in resume_lower:
-                        # Find project names (usually capitalized, might be in bullet points)
-                        project_matches = re.findall(r'(?:project|projects?)[\s:]*([A-Z][a-zA-Z\s]+(?:AI|App|System|Platform|Tube)?)', resume_text, re.IGNORECASE)
-                        for match in project_matches:
-                            # Clean up and extract individual project names
-                            cleaned = re.sub(r'\s+', ' ', match.strip())
-                            if len(cleaned.split()) <= 3:  # Likely a project name
-                                project_names.append(cleaned)
-                    
-                    # Also check message for specific project mentions
-                    if 'inqube' in message_lower:
-                        project_names.append('InqubeAI')
-                    if 'crunchtube' in message_lower or 'crunch' in message_lower:
-                        project_names.append('CrunchTube')
-                    
-                    # Deduplicate
-                    project_names = list(set([p.strip() for p in project_names if len(p.strip()) > 2]))
-                
-                # Check if it's a platform mention (GitHub, LinkedIn, etc.)
-                platform_url = None
-                platform_name = None
-                for platform, url in url_map.items():
-                    if platform in tool_input_lower or platform in message_lower:
-                        platform_url = url
-                        platform_name = platform
-                        break
-                
-                # If platform URL found, use it and search for projects if mentioned
-                if platform_url:
-                    tool_results.append(f"🔗 Found {platform_url} from resume links")
-                    scraped = scrape_with_firecrawl(platform_url)
-                    if scraped:
-                        content = scraped.get('markdown', scraped.get('content', ''))[:4000]
-                        tool_results.append(f"📄 Scraped {platform_url}:\n{content}")
-                        
-                        # If user asked about projects, search for them in the scraped content
-                        if project_names:
-                            content_lower = content.lower()
-                            found_projects = []
-                            not_found_projects = []
-                            for project in project_names:
-                                if project.lower() in content_lower:
-                                    found_projects.append(project)
-                                else:
-                                    not_found_projects.append(project)
-                            
-                            if found_projects:
-                                tool_results.append(f"✅ Found projects on {platform_name}: {', '.join(found_projects)}")
-                            if not_found_projects:
-                                tool_results.append(f"❌ Projects not found on {platform_name}: {', '.join(not_found_projects)}")
-                    else:
-                        tool_results.append(f"⚠️ Could not scrape {platform_url}")
-                    continue
-                
-                # Check if tool_input is already a valid URL
-                if tool_input and (tool_input.startswith('http://') or tool_input.startswith('https://')):
-                    scraped = scrape_with_firecrawl(tool_input)
-                    if scraped:
-                        content = scraped.get('markdown', scraped.get('content', ''))[:2000]
-                        tool_results.append(f"📄 Scraped {tool_input}:\n{content}")
-                    else:
-                        tool_results.append(f"⚠️ Could not scrape {tool_input}")
-                    continue
-                
-                # Check if it's a paper/publication question - search Google first
-                if any(keyword in message.lower() for keyword in ['paper', 'publication', 'research', 'article', 'co-author', 'author', 'coauthor']):
-                    # Extract paper title from message
-                    # Look for quoted text or text after keywords
-                    paper_title = None
-                    
-                    # Try to find quoted text first
-                    quoted_match = re.search(r'["\']([^"\']+)["\']', message)
-                    if quoted_match:
-                        paper_title = quoted_match.group(1)
-                    else:
-                        # Extract text after keywords like "paper", "publication", etc.
-                        for keyword in ['paper', 'publication', 'research', 'article']:
-                            pattern = rf'{keyword}\s+(?:called|titled|named|["\']|:)?\s*([^?.,!]+)'
-                            match = re.search(pattern, message, re.I)
-                            if match:
-                                paper_title = match.group(1).strip()
-                                break
-                    
-                    # Fallback: use tool_input or clean the message
-                    if not paper_title:
-                        paper_title = tool_input if tool_input else message
-                        # Remove question words and common phrases
-                        paper_title = re.sub(r'^(was|is|are|can|do|does|did|will|would|could|should|tell|check|verify|lookup|look up|search for|find|he|she|they|a|an|the|co-author|coauthor|author of)', '', paper_title, flags=re.I).strip()
-                        paper_title = re.sub(r'\?$', '', paper_title).strip()
-                    
-                    # Search Google for the paper
-                    search_query = paper_title
-                    google_results = search_google(search_query, num_results=3)
-                    
-                    if google_results:
-                        # Scrape the first result
-                        first_url = google_results[0]
-                        tool_results.append(f"🔍 Searched Google for '{search_query}' and found: {first_url}")
-                        
-                        # Scrape the first result
-                        scraped = scrape_with_firecrawl(first_url)
-                        if scraped:
-                            content = scraped.get('markdown', scraped.get('content', ''))[:3000]
-                            tool_results.append(f"📄 Scraped content from {first_url}:\n{content}")
-                            
-                            # Check if person's name is in the content
-                            if person_name and person_name.lower() in content.lower():
-                                tool_results.append(f"✅ Found person's name '{person_name}' in the content!")
-                            elif first_name and first_name.lower() in content.lower():
-                                tool_results.append(f"⚠️ Found first name '{first_name}' in the content (partial match)")
-                            else:
-                                tool_results.append(f"❌ Person's name '{person_name}' not found in the content")
-                        else:
-                            tool_results.append(f"⚠️ Could not scrape {first_url}")
-                    else:
-                        tool_results.append(f"⚠️ No Google search results found for '{search_query}'")
-                
-                elif tool_input:
-                    # Check if it's in available URLs
-                    matching_url = None
-                    for url in all_available_urls:
-                        if tool_input.lower() in url.lower() or url.lower() in tool_input.lower():
-                            matching_url = url
-                            break
-                    
-                    if matching_url:
-                        scraped = scrape_with_firecrawl(matching_url)
-                        if scraped:
-                            content = scraped.get('markdown', scraped.get('content', ''))[:2000]
-                            tool_results.append(f"📄 Scraped {matching_url}:\n{content}")
-                        else:
-                            tool_results.append(f"⚠️ Could not scrape {matching_url}")
-                    else:
-                        # Try as direct URL
-                        url = tool_input
-                        if not url.startswith('http'):
-                            url = 'https://' + url
-                        scraped = scrape_with_firecrawl(url)
-                        if scraped:
-                            content = scraped.get('markdown', scraped.get('content', ''))[:2000]
-                            tool_results.append(f"📄 Scraped {url}:\n{content}")
-                        else:
-                            tool_results.append(f"⚠️ Could not scrape {url}. Available URLs from resume: {', '.join(all_available_urls[:5])}")
-                else:
-                    # No tool_input provided - suggest available URLs
-                    tool_results.append(f"⚠️ No URL specified. Available URLs from resume: {', '.join(all_available_urls[:5])}")
-                
-                # Continue to next iteration to process results
-                continue
-                
-            elif tool_name == "analyze_media":
-                tools_used.append("analyze_media")
-                url = tool_input
-                if url:
-                    result = analyze_image_or_video(url)
-                    tool_results.append(f"🖼️ Analyzed media at {url}:\n{result}")
-                continue
-                
-            elif tool_name == "lookup_resume":
-                tools_used.append("lookup_resume")
-                # Already have resume context, just continue
-                continue
-            else:
+            # Execute every requested tool call concurrently, then merge results in request order
+            tool_calls = decision.get('tool_calls')
+            if not isinstance(tool_calls, list):
+                tool_calls = [{'tool': decision.get('tool'), 'tool_input': decision.get('tool_input', '')}]
+            tool_calls = [call for call in tool_calls if isinstance(call, dict) and call.get('tool') in AGENT_TOOLS]
+            if not tool_calls:
                 # Unknown tool or no tool needed
                 break
+            
+            tools_used.extend(call['tool'] for call in tool_calls)
+            new_results = execute_agent_tool_calls(tool_calls, list(tool_results), agent_context)
+            tool_results.extend(new_results)
+            
+            # Make fresh scrapes searchable for later lookup_resume calls
+            with search_index_lock:
+                add_tool_results_to_index(search_index, new_results)
         
-        # Generate final answer with all tool results
-        # Use full resume text for final answer generation
-        resume_text_final = resume_text[:6000] if len(resume_text) > 6000 else resume_text
-        
-        final_prompt = f"""Based on the following information, provide a comprehensive answer to the user's question.
-
-PERSON'S NAME: {person_name or 'Unknown'}
-
-FULL RESUME TEXT (with all projects, links, and sections):
-{resume_text_final}
-
+        # Generate final answer with all tool results, reusing the cached per-person context
+        final_prompt = f"""
 TOOL RESULTS:
 {chr(10).join(tool_results) if tool_results else 'No additional tool results'}
 
 USER'S QUESTION: {message}
 
-Provide a clear, accurate answer based on all the information gathered. Reference specific projects, links, and sections from the resume when relevant."""
+Based on all of the information above, provide a comprehensive answer to the user's question in plain text (not JSON). Reference specific projects, links, and sections from the resume when relevant."""
         
-        final_response = model.generate_content(final_prompt)
+        final_response = generate_with_prompt_context(context, final_prompt, token_log)
         answer = final_response.text
         
         return answer, ", ".join(tools_used) if tools_used else "lookup_resume"
@@ -2002,28 +5422,214 @@ Provide a clear, accurate answer based on all the information gathered. Referenc
     except Exception as e:
         return f"Error processing chat: {str(e)}", None
 
+# Server-side chat sessions
+CHAT_SESSION_MAX_ENTRIES = 200
+CHAT_SESSION_TTL_SECONDS = 2 * 60 * 60
+CHAT_HISTORY_MAX_MESSAGES = 50
+CHAT_SESSION_SPILL_DIR = os.getenv('CHAT_SESSION_SPILL_DIR', '')  # Optional: evicted sessions are written here
+
+chat_sessions = OrderedDict()  # session id -> session dict, least recently used first
+chat_sessions_lock = threading.Lock()
+
+def spill_chat_session(session):
+    """Write an evicted session's history to disk so it can be restored later"""
+    if not CHAT_SESSION_SPILL_DIR:
+        return
+    try:
+        os.makedirs(CHAT_SESSION_SPILL_DIR, exist_ok=True)
+        spill_path = os.path.join(CHAT_SESSION_SPILL_DIR, f"{session['id']}.json")
+        with open(spill_path, 'w', encoding='utf-8') as f:
+            # Profile data is not spilled - it is reloaded from the profile store on restore
+            json.dump({
+                'id': session['id'],
+                'person_name': session['person_name'],
+                'chat_history': session['chat_history'],
+                'created_at': session['created_at'],
+                'last_used': session['last_used']
+            }, f, ensure_ascii=False)
+    except Exception as e:
+        print(f"Error spilling chat session: {e}")
+
+def restore_spilled_chat_session(session_id):
+    """Bring a spilled session back into memory, or None if it is missing or expired"""
+    if not CHAT_SESSION_SPILL_DIR:
+        return None
+    spill_path = os.path.join(CHAT_SESSION_SPILL_DIR, f"{session_id}.json")
+    if not os.path.exists(spill_path):
+        return None
+    
+    try:
+        with open(spill_path, 'r', encoding='utf-8') as f:
+            spilled = json.load(f)
+        os.remove(spill_path)
+    except Exception as e:
+        print(f"Error restoring chat session: {e}")
+        return None
+    
+    if time.time() - spilled.get('last_used', 0) > CHAT_SESSION_TTL_SECONDS:
+        return None
+    person_data, prompt_key = load_chat_person_data(spilled['person_name'])
+    if not person_data:
+        return None
+    
+    session = dict(spilled, person_data=person_data, prompt_key=prompt_key, tool_cache=new_tool_cache(), lock=threading.Lock())
+    session['search_index'] = person_data.pop('search_index', None)
+    store_chat_session(session)
+    return session
+
+def store_chat_session(session):
+    """Insert a session and evict expired / least recently used ones"""
+    now = time.time()
+    evicted = []
+    with chat_sessions_lock:
+        chat_sessions[session['id']] = session
+        chat_sessions.move_to_end(session['id'])
+        for session_id, existing in list(chat_sessions.items()):
+            if now - existing['last_used'] > CHAT_SESSION_TTL_SECONDS:
+                del chat_sessions[session_id]
+        while len(chat_sessions) > CHAT_SESSION_MAX_ENTRIES:
+            evicted.append(chat_sessions.popitem(last=False)[1])
+    for old_session in evicted:
+        spill_chat_session(old_session)
+
+def load_chat_person_data(person_name):
+    """(profile data, prompt context key) for a chat session, or (None, None)"""
+    folder_name = sanitize_folder_name(person_name)
+    # Read the version first: a save in between leaves an old key on newer data, never a new key on stale data
+    version = profile_repository.profile_version(folder_name)
+    person_data = load_profile_data(person_name)
+    if not person_data:
+        return None, None
+    return person_data, get_profile_prompt_key(folder_name, version)
+
+def create_chat_session(person_name):
+    """Create a chat session bound to a saved person, or None if the person does not exist"""
+    person_data, prompt_key = load_chat_person_data(person_name)
+    if not person_data:
+        return None
+    
+    now = time.time()
+    session = {
+        'id': uuid.uuid4().hex,
+        'person_name': person_name,
+        'person_data': person_data,
+        'prompt_key': prompt_key,
+        'chat_history': [],
+        'tool_cache': new_tool_cache(),
+        'search_index': person_data.pop('search_index', None),
+        'created_at': now,
+        'last_used': now,
+        'lock': threading.Lock()
+    }
+    store_chat_session(session)
+    return session
+
+def get_chat_session(session_id):
+    """Look up a live session (restoring it from disk if it was spilled)"""
+    if not re.fullmatch(r'[0-9a-f]{32}', session_id or ''):
+        return None
+    
+    with chat_sessions_lock:
+        session = chat_sessions.get(session_id)
+        if session and time.time() - session['last_used'] > CHAT_SESSION_TTL_SECONDS:
+            del chat_sessions[session_id]
+            session = None
+        if session:
+            session['last_used'] = time.time()
+            chat_sessions.move_to_end(session_id)
+    
+    if session is None:
+        session = restore_spilled_chat_session(session_id)
+    return session
+
+def delete_chat_session(session_id):
+    """Drop a session from memory and disk"""
+    with chat_sessions_lock:
+        session = chat_sessions.pop(session_id, None)
+    if CHAT_SESSION_SPILL_DIR and re.fullmatch(r'[0-9a-f]{32}', session_id or ''):
+        spill_path = os.path.join(CHAT_SESSION_SPILL_DIR, f"{session_id}.json")
+        if os.path.exists(spill_path):
+            os.remove(spill_path)
+            return True
+    return session is not None
+
+@app.route('/api/chat/sessions', methods=['POST'])
+def create_chat_session_api():
+    """Create a chat session for a saved person"""
+    data = request.json or {}
+    person_name = data.get('person_name', '').strip()
+    
+    if not person_name:
+        return jsonify({'error': 'Person name is required'}), 400
+    
+    session = create_chat_session(person_name)
+    if not session:
+        return jsonify({'error': f'No data found for {person_name}'}), 404
+    
+    return jsonify({
+        'success': True,
+        'session_id': session['id'],
+        'person_name': person_name,
+        'metadata': session['person_data'].get('metadata', {})
+    })
+
+@app.route('/api/chat/sessions/<session_id>', methods=['DELETE'])
+def delete_chat_session_api(session_id):
+    """End a chat session"""
+    if not delete_chat_session(session_id):
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify({'success': True})
+
 @app.route('/api/chat', methods=['POST'])
 def chat_api():
     """Handle chat messages from AI agent"""
     try:
         data = request.json
         message = data.get('message', '').strip()
-        person_data = data.get('person_data', {})
-        chat_history = data.get('chat_history', [])
+        session_id = data.get('session_id')
         
         if not message:
             return jsonify({'error': 'Message is required'}), 400
         
+        session = None
+        tool_cache = None
+        if session_id:
+            session = get_chat_session(session_id)
+            if not session:
+                return jsonify({'error': 'Chat session not found or expired'}), 404
+            person_data = session['person_data']
+            chat_history = session['chat_history']
+            tool_cache = session['tool_cache']
+            search_index = session['search_index']
+        else:
+            # Legacy clients send the whole profile and history with every message
+            person_data = data.get('person_data', {})
+            chat_history = data.get('chat_history', [])
+            search_index = None
+        
         if not person_data:
             return jsonify({'error': 'Person data is required'}), 400
         
         # Get AI agent response
-        response, tool_used = ai_agent_chat(message, person_data, chat_history)
+        stats = {}
+        response, tool_used = ai_agent_chat(
+            message, person_data, list(chat_history), stats, tool_cache, search_index,
+            session['lock'] if session else None, session['prompt_key'] if session else None
+        )
+        
+        if session:
+            with session['lock']:
+                session['chat_history'].append({'role': 'user', 'content': message})
+                session['chat_history'].append({'role': 'assistant', 'content': response})
+                del session['chat_history'][:-CHAT_HISTORY_MAX_MESSAGES]
         
         return jsonify({
             'success': True,
             'response': response,
-            'tool_used': tool_used
+            'tool_used': tool_used,
+            'cache_hits': stats.get('cache_hits', []),
+            'token_usage': stats.get('token_usage', []),
+            'iterations': stats.get('iterations', 0)
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -2041,18 +5647,10 @@ def extract_links():
     
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
         
-        # Extract links based on file type
+        # Extract links based on file type, straight from the spooled upload
         file_ext = filename.rsplit('.', 1)[1].lower()
-        links = extract_links_from_file(file_path, file_ext)
-        
-        # Clean up uploaded file
-        try:
-            os.remove(file_path)
-        except:
-            pass
+        links = extract_links_from_file(get_upload_stream(file), file_ext)
         
         return jsonify({
             'success': True,
@@ -2071,32 +5669,70 @@ def upload_file():
     links = request.form.get('links', '')
     job_description = request.form.get('jobDescription', '')
     person_name = request.form.get('personName', '').strip()
+    # What to do when the resume is a near-duplicate of a saved profile: ask (409 with matches), reuse or ignore
+    on_duplicate = request.form.get('onDuplicate', 'ask').strip().lower()
     
     if not person_name:
         return jsonify({'error': 'Person name/ID is required'}), 400
+    if on_duplicate not in ('ask', 'reuse', 'ignore'):
+        return jsonify({'error': 'onDuplicate must be ask, reuse or ignore'}), 400
     
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
         
-        # Extract text from CV
+        # Extract text from CV, straight from the spooled upload
         file_ext = filename.rsplit('.', 1)[1].lower()
-        if file_ext == 'pdf':
-            cv_text = extract_text_from_pdf(file_path)
-        elif file_ext == 'docx':
-            cv_text = extract_text_from_docx(file_path)
-        else:
-            cv_text = extract_text_from_txt(file_path)
+        cv_stream = get_upload_stream(file)
+        cv_bytes = cv_stream.read()
+        resume_hash = hashlib.sha256(cv_bytes).hexdigest()
+        
+        # A byte-identical file was extracted before: reuse its text
+        cv_text = resume_blobs.get_text(resume_hash)
+        if cv_text is None:
+            cv_text = extract_text_from_file(cv_stream, file_ext)
+            if cv_text.strip():
+                try:
+                    resume_blobs.put_text(resume_hash, cv_text)
+                except Exception as e:
+                    print(f"Error caching extracted resume text: {e}")
         
         # Process links
         link_list = [link.strip() for link in links.split(',') if link.strip()]
         scraped_data = {}
         
-        for link in link_list:
+        # A near-duplicate of a saved profile can reuse its scrape (and analysis) instead of recomputing
+        duplicate, duplicate_profile = None, None
+        if on_duplicate != 'ignore':
+            try:
+                duplicates = find_near_duplicates(cv_text, link_list, exclude_folder=sanitize_folder_name(person_name))
+            except Exception as e:
+                print(f"Error checking for duplicate candidates: {e}")
+                duplicates = []
+            if duplicates and on_duplicate == 'ask':
+                return jsonify({
+                    'error': 'This resume looks like a candidate that is already saved',
+                    'duplicate': True,
+                    'matches': duplicates
+                }), 409
+            if duplicates:
+                # reuse: the caller may pick a specific match, otherwise take the closest one
+                chosen = request.form.get('duplicateOf', '').strip()
+                duplicate = next((match for match in duplicates if match['folder'] == chosen), duplicates[0])
+                duplicate_profile = load_profile_data(duplicate['name'], fields=('analysis', 'scraped_data', 'job_description', 'metadata'))
+                if duplicate_profile is None:
+                    duplicate = None
+        
+        links_to_scrape = link_list
+        if duplicate_profile is not None:
+            # Only links the duplicate was not scraped from still need scraping
+            scraped_links = set((duplicate_profile.get('metadata') or {}).get('links') or [])
+            links_to_scrape = [link for link in link_list if link not in scraped_links]
+            scraped_data = dict(duplicate_profile.get('scraped_data') or {})
+        
+        for link in links_to_scrape:
             platform_info = extract_platform_info(link)
             if platform_info:
                 platform = platform_info['platform']
@@ -2118,17 +5754,16 @@ def upload_file():
                     domain_clean = domain.replace('.', '_').replace('-', '_')
                     scraped_data[domain_clean] = scrape_unknown_website(website_url)
         
-        # Generate summary using Gemini (with job description if provided)
-        analysis = generate_profile_summary(cv_text, scraped_data, job_description)
+        # Generate summary using Gemini (with job description if provided); a duplicate's analysis is
+        # reused when it was made against the same job description and no new links were scraped
+        same_job_description = duplicate_profile is not None and get_job_description_hash(duplicate_profile.get('job_description') or '') == get_job_description_hash(job_description)
+        if same_job_description and not links_to_scrape and duplicate_profile.get('analysis'):
+            analysis = duplicate_profile['analysis']
+        else:
+            analysis = generate_profile_summary(cv_text, scraped_data, job_description)
         
         # Save all data to filesystem
-        saved_dir = save_profile_data(person_name, cv_text, file_path, analysis, scraped_data, job_description)
-        
-        # Clean up uploaded file (but keep the saved copy)
-        try:
-            os.remove(file_path)
-        except:
-            pass
+        saved_dir = save_profile_data(person_name, cv_text, (filename, cv_bytes), analysis, scraped_data, job_description, link_list)
         
         return jsonify({
             'success': True,
@@ -2137,11 +5772,343 @@ def upload_file():
             'cv_preview': cv_text[:500] + '...' if len(cv_text) > 500 else cv_text,
             'has_job_description': bool(job_description and job_description.strip()),
             'person_name': person_name,
-            'saved': saved_dir is not None
+            'saved': saved_dir is not None,
+            'resume_sha256': resume_hash,
+            'identical_resume_of': [ref['folder'] for ref in resume_blobs.find_references(resume_hash) if ref['folder'] != sanitize_folder_name(person_name)],
+            'reused_from': dict(duplicate, reused_analysis=analysis is duplicate_profile.get('analysis')) if duplicate else None
         })
     
     return jsonify({'error': 'Invalid file type'}), 400
 
+def get_job_description_hash(job_description):
+    """Content hash of a job description, insensitive to whitespace and case"""
+    normalized = re.sub(r'\s+', ' ', job_description.strip().lower())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+def get_or_create_analysis_version(person_name, job_description, force=False, job_requirements=None):
+    """Analysis of a saved person against a JD, reusing the stored version when the profile hasn't changed.
+    Returns (record, cached, error)."""
+    profile = load_profile_data(person_name, fields=('resume_text', 'scraped_data', 'metadata'))
+    if not profile:
+        return None, False, f'No data found for {person_name}'
+    
+    folder_name = sanitize_folder_name(person_name)
+    job_description_hash = get_job_description_hash(job_description)
+    profile_saved_at = profile.get('metadata', {}).get('saved_at')
+    
+    # Same JD against the same saved profile: return the stored version
+    if not force:
+        existing = profile_repository.load_analysis_version(folder_name, job_description_hash)
+        if existing and existing.get('profile_saved_at') == profile_saved_at:
+            return existing, True, None
+    
+    # Only the analysis step runs: no text extraction or re-scraping
+    if job_requirements is None:
+        job_requirements, _ = get_job_requirements(job_description)
+    analysis = generate_profile_summary(profile.get('resume_text', ''), profile.get('scraped_data', {}), job_description, job_requirements)
+    if analysis.get('error'):
+        return None, False, analysis['error']
+    
+    record = {
+        'job_description_hash': job_description_hash,
+        'job_description': job_description,
+        'job_requirements': job_requirements,
+        'analysis': analysis,
+        'profile_saved_at': profile_saved_at,
+        'created_at': time.time()
+    }
+    try:
+        with profile_lock(folder_name):
+            profile_repository.save_analysis_version(folder_name, job_description_hash, record)
+    except Exception as e:
+        print(f"Error saving analysis version: {e}")
+    return record, False, None
+
+@app.route('/api/reanalyze', methods=['POST'])
+def reanalyze():
+    """Analyze a saved person against a new job description, reusing the stored resume and scraped data"""
+    data = request.json or {}
+    person_name = data.get('person_name', '').strip()
+    job_description = (data.get('job_description') or '').strip()
+    
+    if not person_name:
+        return jsonify({'error': 'Person name is required'}), 400
+    if not job_description:
+        return jsonify({'error': 'Job description is required'}), 400
+    
+    if profile_repository.profile_version(sanitize_folder_name(person_name)) is None:
+        return jsonify({'error': f'No data found for {person_name}'}), 404
+    
+    record, cached, error = get_or_create_analysis_version(person_name, job_description, force=bool(data.get('force')))
+    if error:
+        return jsonify({'error': error}), 502
+    return jsonify(dict(record, success=True, person_name=person_name, cached=cached))
+
+@app.route('/api/job-requirements', methods=['POST'])
+def parse_job_description():
+    """Structured requirements (must-have/nice-to-have skills, seniority, domain) of a job description"""
+    data = request.json or {}
+    job_description = (data.get('job_description') or '').strip()
+    if not job_description:
+        return jsonify({'error': 'Job description is required'}), 400
+    
+    requirements, cached = get_job_requirements(job_description)
+    if not requirements:
+        return jsonify({'error': 'Could not analyze job description'}), 502
+    return jsonify({'success': True, 'requirements': requirements, 'cached': cached})
+
+@app.route('/api/rank', methods=['POST'])
+def rank_candidates():
+    """Rank all saved candidates for a JD: local term prefilter, then Gemini on the shortlist, streamed as NDJSON"""
+    data = request.json or {}
+    job_description = (data.get('job_description') or '').strip()
+    if not job_description:
+        return jsonify({'error': 'Job description is required'}), 400
+    try:
+        shortlist_size = max(1, min(int(data.get('shortlist', 20)), RANK_MAX_SHORTLIST))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'shortlist must be a number'}), 400
+    analyze = data.get('analyze', True)
+    
+    started_at = time.time()
+    shortlist, scored, query_terms = prefilter_candidates(job_description, shortlist_size)
+    
+    def generate():
+        yield json.dumps({
+            'type': 'shortlist',
+            'job_description_hash': get_job_description_hash(job_description),
+            'candidates_scored': scored,
+            'query_terms': query_terms,
+            'candidates': shortlist,
+            'elapsed_ms': round((time.time() - started_at) * 1000, 1)
+        }, ensure_ascii=False) + '\n'
+        
+        if analyze:
+            # The JD is parsed once up front so every shortlisted analysis scores against the same requirements
+            job_requirements, requirements_cached = get_job_requirements(job_description)
+            yield json.dumps({'type': 'requirements', 'requirements': job_requirements, 'cached': requirements_cached}, ensure_ascii=False) + '\n'
+            
+            # Full analyses run in parallel and are streamed in completion order
+            futures = {
+                RANK_EXECUTOR.submit(get_or_create_analysis_version, candidate['name'], job_description, False, job_requirements): candidate
+                for candidate in shortlist
+            }
+            for future in as_completed(futures):
+                candidate = futures[future]
+                try:
+                    record, cached, error = future.result()
+                except Exception as e:
+                    record, cached, error = None, False, str(e)
+                if error:
+                    yield json.dumps({'type': 'error', 'name': candidate['name'], 'error': error}, ensure_ascii=False) + '\n'
+                    continue
+                yield json.dumps(dict(
+                    candidate,
+                    type='analysis',
+                    match_score=record['analysis'].get('match_score'),
+                    analysis=record['analysis'],
+                    cached=cached
+                ), ensure_ascii=False) + '\n'
+        
+        yield json.dumps({'type': 'done', 'elapsed_ms': round((time.time() - started_at) * 1000, 1)}) + '\n'
+    
+    return app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/resume-blobs/<digest>', methods=['GET'])
+def get_resume_blob_references(digest):
+    """Candidates whose original resume is the blob with this SHA-256"""
+    digest = digest.lower()
+    if not re.fullmatch(r'[0-9a-f]{64}', digest):
+        return jsonify({'error': 'Expected a SHA-256 hex digest'}), 400
+    references = resume_blobs.find_references(digest)
+    if not references and not os.path.exists(resume_blobs.blob_path(digest)):
+        return jsonify({'error': 'Unknown resume blob'}), 404
+    return jsonify({'success': True, 'sha256': digest, 'candidates': references})
+
+@app.route('/api/analyses', methods=['GET'])
+def list_analyses():
+    """List the stored job-description analysis versions for a person"""
+    person_name = request.args.get('person_name', '').strip()
+    if not person_name:
+        return jsonify({'error': 'Person name is required'}), 400
+    
+    folder_name = sanitize_folder_name(person_name)
+    if profile_repository.profile_version(folder_name) is None:
+        return jsonify({'error': f'No data found for {person_name}'}), 404
+    
+    versions = [{
+        'job_description_hash': record.get('job_description_hash'),
+        'job_description_preview': (record.get('job_description') or '')[:200],
+        'match_score': (record.get('analysis') or {}).get('match_score'),
+        'created_at': record.get('created_at')
+    } for record in profile_repository.list_analysis_versions(folder_name)]
+    return jsonify({'success': True, 'person_name': person_name, 'versions': versions})
+
+BENCH_COUNT_METRICS = ('llm_calls', 'iterations', 'prompt_tokens', 'output_tokens', 'http_calls')
+
+def measure_benchmark_step(run):
+    """Run one corpus step and return its LLM/HTTP/wall-clock cost"""
+    before = dict(cassette_state['stats'])
+    started_at = time.time()
+    iterations = run()
+    after = cassette_state['stats']
+    metrics = {key: after[key] - before[key] for key in before}
+    metrics['iterations'] = iterations
+    metrics['wall_clock_s'] = round(time.time() - started_at, 3)
+    return metrics
+
+BENCH_STORAGE_GLOBALS = (
+    'DATA_STORAGE_DIR', 'PROFILE_DB_PATH', 'RESUME_BLOB_DIR', 'PROFILE_LOCK_DIR',
+    'VECTOR_INDEX_DIR', 'VECTOR_DB_PATH', 'VECTOR_LOCK_PATH', 'MANIFEST_DB_PATH',
+    'CACHE_DIR', 'MEDIA_CACHE_DIR', 'JOB_DESCRIPTION_CACHE_DIR',
+    'profile_repository', 'resume_blobs'
+)
+
+def clear_process_caches():
+    """Forget every in-memory cache: profiles, term index, JD requirements, media analyses,
+    search results, fetched pages and per-person prompt contexts"""
+    with profile_cache['lock']:
+        for folder_name in list(profile_cache['entries']):
+            drop_cached_profile(folder_name)
+    with term_index_lock:
+        term_index['current'] = None
+    with job_requirements_lock:
+        job_requirements_cache.clear()
+    with media_cache_lock:
+        media_analysis_cache.clear()
+    for cache in (search_result_cache, page_content_cache):
+        with cache['lock']:
+            cache['entries'].clear()
+    with prompt_context_lock:
+        contexts = list(person_prompt_contexts.values())
+        person_prompt_contexts.clear()
+    for context in contexts:
+        release_prompt_context(context)
+
+@contextlib.contextmanager
+def benchmark_storage(root):
+    """Point profile storage, the resume blob store, the manifest/search indexes and the AI result caches at root
+    for a benchmark run, so recording a corpus doesn't write its candidates into profile_data/ and no call is
+    skipped (or left unrecorded) because this machine happened to have it cached"""
+    saved = {name: globals()[name] for name in BENCH_STORAGE_GLOBALS}
+    data_dir = os.path.join(root, 'profile_data')
+    index_dir = os.path.join(root, 'profile_index')
+    cache_dir = os.path.join(root, 'cache')
+    os.makedirs(data_dir, exist_ok=True)
+    os.makedirs(os.path.join(cache_dir, 'media'), exist_ok=True)
+    os.makedirs(os.path.join(cache_dir, 'job_descriptions'), exist_ok=True)
+    globals().update(
+        DATA_STORAGE_DIR=data_dir,
+        PROFILE_DB_PATH=os.path.join(data_dir, 'profiles.sqlite'),
+        RESUME_BLOB_DIR=os.path.join(data_dir, '.blobs'),
+        PROFILE_LOCK_DIR=os.path.join(data_dir, '.locks'),
+        VECTOR_INDEX_DIR=index_dir,
+        VECTOR_DB_PATH=os.path.join(index_dir, 'vectors.sqlite'),
+        VECTOR_LOCK_PATH=os.path.join(index_dir, 'vectors.lock'),
+        MANIFEST_DB_PATH=os.path.join(index_dir, 'manifest.sqlite'),
+        CACHE_DIR=cache_dir,
+        MEDIA_CACHE_DIR=os.path.join(cache_dir, 'media'),
+        JOB_DESCRIPTION_CACHE_DIR=os.path.join(cache_dir, 'job_descriptions')
+    )
+    globals().update(
+        resume_blobs=ResumeBlobStore(RESUME_BLOB_DIR),
+        profile_repository=SqliteProfileRepository(PROFILE_DB_PATH) if saved['profile_repository'].name == 'sqlite' else FileProfileRepository(DATA_STORAGE_DIR)
+    )
+    
+    clear_process_caches()
+    try:
+        yield
+    finally:
+        globals().update(saved)
+        clear_process_caches()
+
+def run_benchmark_corpus(corpus):
+    """Replay a fixed corpus of uploads and conversations through the app"""
+    client = app.test_client()
+    report = {'uploads': [], 'questions': []}
+    
+    for upload in corpus.get('uploads', []):
+        def run_upload():
+            with open(upload['file'], 'rb') as f:
+                client.post('/upload', data={
+                    'cv': (f, os.path.basename(upload['file'])),
+                    'links': upload.get('links', ''),
+                    'jobDescription': upload.get('job_description', ''),
+                    'personName': upload['person_name']
+                }, content_type='multipart/form-data')
+            return 0
+        report['uploads'].append(dict(measure_benchmark_step(run_upload), person_name=upload['person_name']))
+    
+    for conversation in corpus.get('conversations', []):
+        session = client.post('/api/chat/sessions', json={'person_name': conversation['person_name']}).get_json()
+        if not session.get('success'):
+            print(f"Skipping conversation for {conversation['person_name']}: {session.get('error')}")
+            continue
+        for message in conversation['messages']:
+            def run_question():
+                result = client.post('/api/chat', json={'session_id': session['session_id'], 'message': message}).get_json()
+                return result.get('iterations', 0)
+            report['questions'].append(dict(measure_benchmark_step(run_question), person_name=conversation['person_name'], message=message))
+    
+    steps = report['uploads'] + report['questions']
+    report['totals'] = {key: sum(step[key] for step in steps) for key in BENCH_COUNT_METRICS}
+    report['totals']['wall_clock_s'] = round(sum(step['wall_clock_s'] for step in steps), 3)
+    report['totals']['questions'] = len(report['questions'])
+    return report
+
+@app.cli.command('bench-agent')
+@click.option('--corpus', required=True, help='JSON file with "uploads" and "conversations" to run')
+@click.option('--baseline', default=None, help='Earlier report to compare against')
+@click.option('--output', default=None, help='Where to write the JSON report')
+@click.option('--tolerance', default=0.10, help='Allowed relative increase in calls/iterations/tokens')
+@click.option('--time-tolerance', default=0.50, help='Allowed relative increase in wall-clock time')
+def bench_agent_command(corpus, baseline, output, tolerance, time_tolerance):
+    """Benchmark uploads and the chat agent against a recorded cassette"""
+    if CASSETTE_MODE not in ('record', 'replay'):
+        raise click.ClickException('Set HIREGEM_CASSETTE_MODE=record (with network) or replay (offline) first')
+    
+    with open(corpus, 'r', encoding='utf-8') as f:
+        corpus_data = json.load(f)
+    with tempfile.TemporaryDirectory(prefix='hiregem-bench-') as root, benchmark_storage(root):
+        report = run_benchmark_corpus(corpus_data)
+    print(json.dumps(report['totals'], indent=2))
+    
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    
+    if baseline:
+        with open(baseline, 'r', encoding='utf-8') as f:
+            baseline_totals = json.load(f)['totals']
+        regressions = []
+        for key in BENCH_COUNT_METRICS + ('wall_clock_s',):
+            allowed = baseline_totals.get(key, 0) * (1 + (time_tolerance if key == 'wall_clock_s' else tolerance))
+            if report['totals'][key] > allowed:
+                regressions.append(f"{key}: {report['totals'][key]} > {baseline_totals.get(key, 0)} (+{allowed - baseline_totals.get(key, 0):.2f} allowed)")
+        if regressions:
+            raise click.ClickException('Performance regression:\n' + '\n'.join(regressions))
+        print('No regressions against baseline')
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness check for load balancers and process managers"""
+    return jsonify({'status': 'ok', 'storage_backend': profile_repository.name})
+
+def create_app(config=None):
+    """Configured application for WSGI/ASGI servers (wsgi.py, asgi.py); routes are registered on the module-level app"""
+    if config:
+        app.config.update(config)
+    # Behind nginx/a load balancer, trust that many X-Forwarded-* hops for client IP, scheme and host
+    trusted_proxies = int(os.getenv('TRUSTED_PROXY_COUNT', '0'))
+    if trusted_proxies and not isinstance(app.wsgi_app, ProxyFix):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies, x_host=trusted_proxies)
+    return app
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    # Development server only; use gunicorn (see gunicorn.conf.py) in production
+    create_app().run(
+        debug=os.getenv('FLASK_DEBUG', '0').lower() in ('1', 'true', 'yes'),
+        host=os.getenv('HOST', '127.0.0.1'),
+        port=int(os.getenv('PORT', '5000'))
+    )
 
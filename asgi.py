@@ -0,0 +1,10 @@
+"""ASGI entry point for uvicorn/hypercorn: uvicorn asgi:app
+
+The Flask app is synchronous; WsgiToAsgi runs each request on a thread pool, so this
+is an alternative to gunicorn's gthread workers, not a faster path.
+"""
+from asgiref.wsgi import WsgiToAsgi
+
+from app import create_app
+
+app = WsgiToAsgi(create_app())
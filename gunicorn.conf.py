@@ -0,0 +1,31 @@
+# Gunicorn configuration for Hire Gem: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Almost all request time is spent waiting on the network (Gemini, GitHub/Kaggle/DevPost,
+# Firecrawl, web search), so each worker process should hold many requests at once. Workers
+# are gthread: GUNICORN_THREADS threads per process, sized to the number of concurrent /upload
+# and /api/chat requests one process should carry.
+#
+# gthread is the only supported worker class. gevent/eventlet would need every wait to yield,
+# but profile locks (fcntl.flock) and SQLite calls block, stalling every greenlet in the process.
+#
+# Chat sessions (and the in-memory caches: profiles, term index, JD requirements) belong to the
+# process that created them, so a follow-up chat message sent to another worker gets a 404.
+# Run one process and scale with threads; only raise GUNICORN_WORKERS behind sticky sessions.
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
+
+# /upload scrapes and analyzes in one request and /api/rank streams for minutes
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))
+graceful_timeout = 60
+keepalive = 5
+
+# app.py starts thread pools and opens SQLite connections at import, which must not be
+# inherited across fork, so each worker imports the app itself
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
@@ -0,0 +1,50 @@
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+app = None
+
+
+def setUpModule():
+    """Import app.py from a scratch directory, since it creates its data folders in the working directory"""
+    global app
+    os.environ.setdefault('GEMINI_API_KEY', 'test-key')
+    sys.path.insert(0, ROOT)
+    os.chdir(tempfile.mkdtemp(prefix='hiregem-test-'))
+    import app as app_module
+    app = app_module
+
+
+class ParseAgentDecisionTest(unittest.TestCase):
+    def test_bare_json(self):
+        _, decision = app.parse_agent_decision('{"needs_tool": false, "final_answer": "Yes."}')
+        self.assertEqual(decision, {'needs_tool': False, 'final_answer': 'Yes.'})
+
+    def test_fenced_json(self):
+        _, decision = app.parse_agent_decision('```json\n{"needs_tool": true, "tool_calls": [{"tool": "lookup_resume", "tool_input": "go"}]}\n```')
+        self.assertEqual(decision['tool_calls'], [{'tool': 'lookup_resume', 'tool_input': 'go'}])
+
+    def test_prose_wrapped_tool_calls(self):
+        text = (
+            'I need more information first. Here is my plan:\n'
+            '{"needs_tool": true, "tool_calls": [{"tool": "search_website", "tool_input": "https://github.com/ann"}, '
+            '{"tool": "lookup_resume", "tool_input": "Kaggle medals"}]}\n'
+            'I will answer once the results are in.'
+        )
+        _, decision = app.parse_agent_decision(text)
+        self.assertTrue(decision['needs_tool'])
+        self.assertEqual([call['tool'] for call in decision['tool_calls']], ['search_website', 'lookup_resume'])
+
+    def test_braces_in_prose_before_json(self):
+        _, decision = app.parse_agent_decision('Using {placeholders} here. {"needs_tool": false, "final_answer": "Done"}')
+        self.assertEqual(decision['final_answer'], 'Done')
+
+    def test_plain_text_is_final_answer(self):
+        text, decision = app.parse_agent_decision('She has shipped two Flutter apps {see resume')
+        self.assertEqual(decision, {'needs_tool': False, 'final_answer': text})
+
+
+if __name__ == '__main__':
+    unittest.main()